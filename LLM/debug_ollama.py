@@ -4,11 +4,17 @@ Debug script for Ollama LLM integration
 This script helps diagnose and fix Ollama connection issues.
 """
 
-import requests
 import subprocess
 import sys
 import os
 import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import requests
+from endpoints.ollama_client import OllamaClient
+
+# shared keep-alive client (timeouts + retries) for every call to the local Ollama server
+client = OllamaClient("http://localhost:11434")
 
 def check_ollama_installed():
     """Check if Ollama is installed"""
@@ -27,7 +33,7 @@ def check_ollama_installed():
 def check_ollama_running():
     """Check if Ollama service is running"""
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
+        response = client.tags(timeout=5, retries=0)
         if response.status_code == 200:
             print("✅ Ollama service is running")
             return True
@@ -68,7 +74,7 @@ def start_ollama_service():
 def check_available_models():
     """Check what models are available"""
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
+        response = client.tags(timeout=5, retries=0)
         if response.status_code == 200:
             models = response.json().get("models", [])
             if models:
@@ -96,11 +102,7 @@ def test_model_response(model_name):
             "stream": False
         }
         
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json=payload,
-            timeout=30
-        )
+        response = client.generate(payload, timeout=30)
         
         if response.status_code == 200:
             result = response.json()
@@ -151,7 +153,7 @@ def test_game_integration():
         scorekeeper = ScoreKeeper(720, 10)
         
         # Test with text-only mode first
-        llm_agent = LLMInterface(data_parser, scorekeeper, data_fp, use_images=False, model_name="llama2:3b")
+        llm_agent = LLMInterface(data_parser, scorekeeper, data_fp, use_images=False, model_name="llama2:3b", client=client)
         
         # Get a test humanoid
         if len(data_parser.unvisited) > 0:
@@ -7,8 +7,14 @@ This script helps you install and configure Ollama for the zombie game LLM agent
 import subprocess
 import sys
 import os
-import requests
 import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import requests
+from endpoints.ollama_client import OllamaClient
+
+# shared keep-alive client (timeouts + retries) for every call to the local Ollama server
+client = OllamaClient("http://localhost:11434")
 
 def check_ollama_installed():
     """Check if Ollama is installed"""
@@ -70,7 +76,7 @@ def start_ollama_service():
         
         # Test if the service is running
         try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=5)
+            response = client.tags(timeout=5, retries=0)
             if response.status_code == 200:
                 print("Ollama service is running!")
                 return True
@@ -118,7 +124,7 @@ def download_models():
 def test_ollama_connection():
     """Test connection to Ollama API"""
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
+        response = client.tags(timeout=5, retries=0)
         if response.status_code == 200:
             print("✅ Ollama API is accessible!")
             return True
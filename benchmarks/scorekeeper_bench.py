@@ -0,0 +1,50 @@
+"""
+Microbenchmark: ScoreKeeper vs FastScoreKeeper on random map_do_action traces
+Usage: python3 benchmarks/scorekeeper_bench.py [-n 1000000]
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import random
+import time
+
+from gameplay.enums import State
+from gameplay.humanoid import Humanoid
+from gameplay.scorekeeper import ScoreKeeper, FastScoreKeeper
+
+
+def run(scorekeeper, actions, humanoids):
+    """
+    plays the action trace, starting a new shift whenever time runs out. returns elapsed seconds
+    """
+    start = time.perf_counter()
+    for idx, humanoid in zip(actions, humanoids):
+        scorekeeper.map_do_action(idx, humanoid)
+        scorekeeper.available_action_space()
+        if scorekeeper.remaining_time <= 0:
+            scorekeeper.reset()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='python3 benchmarks/scorekeeper_bench.py')
+    parser.add_argument('-n', '--num_calls', type=int, default=1000000)
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pool = [Humanoid(fp='', state=s.value) for s in State]
+    actions = [rng.randrange(4) for _ in range(args.num_calls)]
+    humanoids = [rng.choice(pool) for _ in range(args.num_calls)]
+
+    results = [
+        ("ScoreKeeper", run(ScoreKeeper(720, 10), actions, humanoids)),
+        ("FastScoreKeeper (logging)", run(FastScoreKeeper(720, 10), actions, humanoids)),
+        ("FastScoreKeeper (no logging)", run(FastScoreKeeper(720, 10, log=False), actions, humanoids)),
+    ]
+    baseline = results[0][1]
+    for name, elapsed in results:
+        print("{:<30} {:>8.3f}s  {:>8.2f} M calls/s  {:>5.2f}x".format(
+            name, elapsed, args.num_calls / elapsed / 1e6, baseline / elapsed))
@@ -0,0 +1,70 @@
+"""
+Startup-time benchmark: wall time of fresh interpreters for the CLI entry points and the imports each mode needs
+Also lists which heavy packages every entry point drags in, so a stray top-level import shows up immediately.
+Usage: python3 benchmarks/startup_bench.py [-r 5]
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import statistics
+import subprocess
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+HEAVY = ['torch', 'torchvision', 'gym', 'pandas', 'tkinter', 'requests', 'PIL']
+
+# (name, python code, whether the path needs torch)
+CASES = [
+    ("python -c pass", "pass", False),
+    ("main.py --help", "import runpy, sys\nsys.argv = ['main.py', '--help']\n"
+                       "try:\n    runpy.run_path('main.py', run_name='__main__')\nexcept SystemExit:\n    pass", False),
+    ("import main", "import main", False),
+    ("llm mode imports", "from endpoints.data_parser import DataParser; from gameplay.scorekeeper import ScoreKeeper; "
+                         "from endpoints.llm_interface import LLMInterface; "
+                         "from gameplay.performance_tracker import PerformanceTracker", False),
+    ("import models.PPO", "import models.PPO", True),
+    ("heuristic mode imports", "from endpoints.data_parser import DataParser; "
+                               "from endpoints.heuristic_interface import HeuristicInterface", True),
+]
+
+REPORT = "\nimport sys as _s; print('HEAVY=' + ','.join(m for m in {} if m in _s.modules))".format(HEAVY)
+
+
+def run_case(code, repeats):
+    """
+    returns the median wall time of a fresh interpreter running code, and the heavy modules it imported
+    """
+    times = []
+    heavy = ''
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', code + REPORT], cwd=ROOT, capture_output=True, text=True)
+        times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError("'{}' failed:\n{}".format(code, result.stderr))
+        heavy = [line for line in result.stdout.splitlines() if line.startswith('HEAVY=')][-1][len('HEAVY='):]
+    return statistics.median(times), heavy
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog='python3 benchmarks/startup_bench.py',
+        description='Measure interpreter startup plus import time of the CLI entry points')
+    parser.add_argument('-r', '--repeats', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=1.0, help='Seconds a non-torch path may take')
+    args = parser.parse_args()
+
+    over_budget = []
+    print("{:<26}{:>10}  {}".format("entry point", "median s", "heavy modules loaded"))
+    for name, code, needs_torch in CASES:
+        seconds, heavy = run_case(code, args.repeats)
+        flag = ''
+        if not needs_torch and seconds > args.budget:
+            flag = '  <-- over {:.1f}s budget'.format(args.budget)
+            over_budget.append(name)
+        print("{:<26}{:>10.3f}  {}{}".format(name, seconds, heavy or '-', flag))
+    if over_budget:
+        sys.exit(1)
@@ -1,8 +1,9 @@
-import random
-import pandas as pd
+import numpy as np
 from gameplay.humanoid import Humanoid
 from gameplay.enums import State
 import os
+import tempfile
+import zipfile
 
 
 class DataParser(object):
@@ -10,44 +11,134 @@ class DataParser(object):
     Parses the input data photos and assigns their file locations to a dictionary for later access
     """
 
-    def __init__(self, data_fp, metadata_fn = "consolidated_metadata.csv"):
+    def __init__(self, data_fp, metadata_fn = "consolidated_metadata.csv", seed=None, cache_metadata=False):
         """
         takes in a row of a pandas dataframe and returns the class of the humanoid in the dataframe
 
         data_fp : location of the folder in which the metadata csv file is located
         metadata_fn : name of the metadata csv file
+        seed : optional seed for the sampling RNG
+        cache_metadata : store the parsed columns as <metadata>.parsed.npz next to the csv (rebuilt when the csv changes)
         """
-        metadata_fp = os.path.join(data_fp, metadata_fn)
+        self.metadata_fp = os.path.join(data_fp, metadata_fn)
         self.fp = data_fp
-        self.df = pd.read_csv(metadata_fp)
-        self.unvisited = self.df.index.to_list()
-        self.visited = []
+        self._df = None
+
+        # columnar metadata: state code (see Humanoid.get_state_idx) and image filename per row
+        cache_fp = os.path.splitext(self.metadata_fp)[0] + ".parsed.npz"
+        if not (cache_metadata and self._load_parsed(cache_fp)):
+            self._parse()
+            if cache_metadata:
+                self._save_parsed(cache_fp)
+
+        # flyweight pool: each row's Humanoid is created on first draw and reused afterwards
+        self._humanoids = [None] * len(self.states)
+
+        self.rng = np.random.default_rng(seed)
+        # _order[:_cursor] are the visited indices (in draw order), _order[_cursor:] the unvisited ones
+        self._order = np.arange(len(self.states))
+        self._cursor = 0
+
+    @property
+    def df(self):
+        """
+        the raw metadata dataframe (only read from disk when asked for if the parsed columns were cached)
+        """
+        if self._df is None:
+            import pandas as pd
+            self._df = pd.read_csv(self.metadata_fp)
+        return self._df
+
+    def _parse(self):
+        """
+        converts every metadata row to its state code and filename once
+        """
+        df = self.df
+        self.states = np.array([Humanoid.get_state_idx(datarow_to_state(row)) for _, row in df.iterrows()],
+                               dtype=np.int8)
+        self.filenames = df['Filename'].astype(str).to_numpy(dtype=str)
+
+    def _load_parsed(self, cache_fp):
+        """
+        loads the cached columns. returns False if they are missing, unreadable or older than the csv
+        """
+        if not os.path.exists(cache_fp):
+            return False
+        try:
+            with np.load(cache_fp, allow_pickle=False) as cached:
+                if float(cached['csv_mtime']) != os.path.getmtime(self.metadata_fp):
+                    return False
+                states = cached['states']
+                filenames = cached['filenames']
+        except (OSError, EOFError, ValueError, KeyError, zipfile.BadZipFile):
+            return False
+        self.states = states
+        self.filenames = filenames
+        return True
+
+    def _save_parsed(self, cache_fp):
+        """
+        writes the parsed columns to a temporary file next to the cache and renames it into place,
+        so runs parsing the csv at the same time never leave a half written cache
+        """
+        fd, tmp_fp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(cache_fp)), suffix='.npz.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, states=self.states, filenames=self.filenames,
+                         csv_mtime=np.array(os.path.getmtime(self.metadata_fp)))
+            os.replace(tmp_fp, cache_fp)
+        except BaseException:
+            os.remove(tmp_fp)
+            raise
+
+    @property
+    def unvisited(self):
+        """
+        indices of the humanoids not drawn yet this episode (a view, do not modify)
+        """
+        return self._order[self._cursor:]
+
+    @property
+    def visited(self):
+        """
+        indices of the humanoids drawn this episode, in draw order (a view, do not modify)
+        """
+        return self._order[:self._cursor]
+
+    def seed(self, seed=None):
+        """
+        reseeds the sampling RNG and rewinds to the initial order, so a seed fixes the whole sequence of draws
+        """
+        self.rng = np.random.default_rng(seed)
+        self._order = np.arange(len(self.states))
+        self._cursor = 0
 
     def reset(self):
         """
         reset list of humanoids
         """
-        self.unvisited = self.df.index.to_list()
-        self.visited = []
+        # _order stays a permutation of all indices, so rewinding the cursor is enough
+        self._cursor = 0
 
     def get_random(self):
         """
         gets and returns a random humanoid object (without replacement)
         """
-        if len(self.unvisited) == 0:
+        n = len(self._order)
+        if self._cursor >= n:
             raise ValueError("No humanoids remain")
-        # index = random.randint(0, (len(self.unvisited)-1))  # Technically semirandom
-        index = random.choice(self.unvisited)
-        # h_index = self.unvisited.pop(index)
-        self.unvisited.remove(index)
-        self.visited.append(index)
-
-        datarow = self.df.iloc[index]
-
-        state = datarow_to_state(datarow)
+        # one step of a lazy Fisher-Yates shuffle: swap a uniformly chosen unvisited index into the cursor slot
+        j = self.rng.integers(self._cursor, n)
+        order = self._order
+        order[self._cursor], order[j] = order[j], order[self._cursor]
+        index = order[self._cursor]
+        self._cursor += 1
 
-        humanoid = Humanoid(fp=datarow['Filename'],
-                            state=state)
+        humanoid = self._humanoids[index]
+        if humanoid is None:
+            humanoid = Humanoid(fp=str(self.filenames[index]),
+                                state=int(self.states[index]))
+            self._humanoids[index] = humanoid
         return humanoid
 
 
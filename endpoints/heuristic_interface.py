@@ -10,16 +10,27 @@ from torchvision import transforms
 from gameplay.enums import ActionCost, State
 from gameplay.humanoid import Humanoid
 from models.DefaultCNN import DefaultCNN
+from models import CLASSIFIERS
 
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 
 
 class Predictor(object):
-    def __init__(self, classes=4, model_file=os.path.join('models', 'baseline.pth')):
+    def __init__(self, classes=4, model_file=os.path.join('models', 'baseline.pth'), arch='default'):
+        """
+        classes : number of humanoid classes
+        model_file : classifier weights
+        arch : name of the classifier architecture in models.CLASSIFIERS ('default' or 'slim')
+        """
+        if arch not in CLASSIFIERS:
+            raise ValueError("Unknown classifier architecture '{}', expected one of {}".format(arch, list(CLASSIFIERS)))
         self.classes = classes
+        self.arch = arch
         self.net = None
         self.device = torch.device('cuda:0') if torch.cuda.is_available() else torch.device('cpu')
-        self.transforms = transforms.Compose([
+        input_size = CLASSIFIERS[arch].input_size
+        self.transforms = transforms.Compose(([transforms.Resize((input_size, input_size))] if input_size != 512 else []) + [
             transforms.ToTensor(),
             transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
         ])
@@ -29,16 +40,20 @@ class Predictor(object):
 
     def _load_model(self, weights_path, num_classes=4):
         try:
-            self.net = DefaultCNN(num_classes)
-            self.net.load_state_dict(torch.load(weights_path))
+            self.net = CLASSIFIERS[self.arch](num_classes)
+            self.net.load_state_dict(torch.load(weights_path, map_location=self.device))
+            self.net.to(self.device).eval()
             return True
         except Exception as e:  # file not found, maybe others?
             print(e)
             return False
 
     def get_probs(self, img_):
+        """
+        returns the class probabilities of a PIL image or image path, preprocessed like get_probs_batch
+        """
         if self.is_model_loaded and self.net is not None:
-            img_ = self.transforms(img_).float().unsqueeze(0).to(self.device)
+            img_ = self._to_tensor(img_).unsqueeze(0).to(self.device)
             with torch.no_grad():
                 outputs = self.net(img_)
                 probs = torch.nn.functional.softmax(outputs, 1)[0].cpu().numpy()
@@ -46,6 +61,44 @@ class Predictor(object):
             probs = np.ones(self.classes) / self.classes
         return probs
 
+    def _to_tensor(self, img_):
+        """
+        decodes an image path (or takes a PIL image), converts it to RGB and applies the network transforms
+        """
+        if not isinstance(img_, Image.Image):
+            with Image.open(img_) as f:
+                img_ = f.convert('RGB')
+        elif img_.mode != 'RGB':
+            img_ = img_.convert('RGB')
+        return self.transforms(img_).float()
+
+    def get_probs_batch(self, imgs, batch_size=32, num_workers=4):
+        """
+        returns an (N, classes) array of class probabilities for a list of images or image paths.
+        images are decoded in a thread pool, one batch ahead of the network, and each batch is a single forward pass
+
+        imgs : list of PIL images or image file paths
+        batch_size : number of images per forward pass
+        num_workers : number of decoding threads
+        """
+        imgs = list(imgs)
+        if not (self.is_model_loaded and self.net is not None):
+            return np.ones((len(imgs), self.classes), dtype=np.float32) / self.classes
+
+        probs = np.zeros((len(imgs), self.classes), dtype=np.float32)
+        chunks = [imgs[i:i + batch_size] for i in range(0, len(imgs), batch_size)]
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            pending = [pool.submit(self._to_tensor, img_) for img_ in chunks[0]] if chunks else []
+            for n in range(len(chunks)):
+                batch = torch.stack([future.result() for future in pending]).to(self.device)
+                if n + 1 < len(chunks):
+                    pending = [pool.submit(self._to_tensor, img_) for img_ in chunks[n + 1]]
+                with torch.inference_mode():
+                    outputs = self.net(batch)
+                    start = n * batch_size
+                    probs[start:start + len(batch)] = torch.nn.functional.softmax(outputs, 1).cpu().numpy()
+        return probs
+
 
 class HeuristicInterface(object):
     def __init__(self, root, w, h, display=False, model_file=os.path.join('models', 'baseline.pth'),
@@ -102,8 +155,7 @@ class HeuristicInterface(object):
         return random.choice(list(ActionCost))
 
     def get_model_suggestion(self, humanoid, is_capacity_full) -> ActionCost:
-        img_ = Image.open(os.path.join(self.img_data_root, humanoid.fp))
-        probs: np.ndarray = self.predictor.get_probs(img_)
+        probs: np.ndarray = self.predictor.get_probs(os.path.join(self.img_data_root, humanoid.fp))
 
         predicted_ind: int = np.argmax(probs, 0)
         class_string = Humanoid.get_all_states()[predicted_ind]
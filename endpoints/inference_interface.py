@@ -2,7 +2,6 @@ import os
 import math
 import random
 import tkinter as tk
-from PIL import Image
 import torch
 import numpy as np
 from torchvision import transforms
@@ -11,11 +10,12 @@ from gameplay.enums import ActionCost, State
 from gameplay.scorekeeper import ScoreKeeper
 from gameplay.humanoid import Humanoid
 
-from models.PPO import ActorCritic, PPO
+from models.PPO import ActorCritic, PPO, pack_observation
 from endpoints.heuristic_interface import Predictor
 
 from gym import Env, spaces
 from endpoints.data_parser import DataParser
+from gameplay.observation import ObservationLayout
 
 import warnings
 
@@ -36,29 +36,35 @@ class RLPredictor(object):
             warnings.warn("Model not loaded, resorting to random prediction")
     def _load_model(self, weights_path, num_classes=4):
         try:
-            self.net = PPO(0,0,0,0,0,False,0.6)
+            self.net = PPO(0,0,0,0,0,False,0.6, buffer_size=1)
             self.net.load(weights_path)
             return True
         except Exception as e:  # file not found, maybe others?
             print(e)
             return False
     def get_action(self, observation_space):
+        """
+        observation_space : flat observation vector, or an observation dict
+        """
         if self.is_model_loaded:
-            action = self.net.select_action(observation_space)
+            # actor only, and nothing is kept in the rollout buffer
+            action = int(self.net.select_action_packed(pack_observation(observation_space), inference=True)[0])
         else:
             action = np.random.randint(0, self.actions)
         return action
     
 class InferInterface(Env):
-    def __init__(self, root, w, h, data_parser, scorekeeper, classifier_model_file=os.path.join('models', 'baseline.pth'), rl_model_file=os.path.join('models', 'baselineRL.pth'), img_data_root='data', display=False, ):
+    def __init__(self, root, w, h, data_parser, scorekeeper, classifier_model_file=os.path.join('models', 'baseline.pth'), rl_model_file=os.path.join('models', 'baselineRL.pth'), img_data_root='data', display=False, prob_cache=None):
         """
         initializes RL training interface
         
         dataparser : stores humanoid information needed to retreive humanoid images and rewards
         scorekeeper : keeps track of actions being done on humanoids, score, and is needed for reward calculations
         classifier_model_file : backbone model weights used in RL observation state
+        prob_cache : optional ProbabilityCache; if given, class probabilities are looked up instead of running the classifier
         """
         self.img_data_root = img_data_root
+        self.prob_cache = prob_cache
         self.data_parser = data_parser
         self.scorekeeper = scorekeeper
         self.display = display
@@ -68,15 +74,16 @@ class InferInterface(Env):
             "num_classes" : len(Humanoid.get_all_states()),
             "num_actions" : self.scorekeeper.actions,
         }
-        self.observation_space = {"variables": np.zeros(3),
-                                  "vehicle_storage_class_probs" : np.zeros((self.environment_params['car_capacity'],self.environment_params['num_classes'])),
-                                    "humanoid_class_probs":np.zeros(self.environment_params['num_classes']),
-                                    "doable_actions":np.ones(self.environment_params['num_actions'],np.int64),
-                                    }
+        # the observation is one preallocated flat vector, observation_space holds named views into it
+        self.layout = ObservationLayout(self.environment_params['car_capacity'],
+                                        self.environment_params['num_classes'],
+                                        self.environment_params['num_actions'])
+        self.observation = self.layout.new()
+        self.observation_space = self.layout.views(self.observation)
 
         self.action_space = spaces.Discrete(self.environment_params['num_actions'],)
         
-        self.prob_predictor = Predictor(classifier_model_file)
+        self.prob_predictor = Predictor(model_file=classifier_model_file) if prob_cache is None else None
         self.action_predictor = RLPredictor(rl_model_file)
         
         #helper variables
@@ -94,38 +101,42 @@ class InferInterface(Env):
     def reset(self):
         """
         resets game for a new episode to run.
-        returns observation space
+        returns the flat observation vector
         """
-        self.observation_space = {"variables": np.zeros(3),
-                                  "vehicle_storage_class_probs" : np.zeros((self.environment_params['car_capacity'],self.environment_params['num_classes'])),
-                                    "humanoid_class_probs":np.zeros(self.environment_params['num_classes']),
-                                    "doable_actions":np.ones(self.environment_params['num_actions'],np.int64),
-                                    }
+        self.layout.reset(self.observation)
         self.previous_cum_reward = 0
         self.data_parser.reset()
         self.scorekeeper.reset()
-        return self.observation_space
+        return self.observation
     
     def get_observation_space(self):
         """
-        updates the observation space
+        updates the observation space (in place).
+        returns the flat observation vector
         """
-        self.observation_space['variables'] = np.array([self.scorekeeper.remaining_time, 
-                                                        self.previous_cum_reward,
-                                                        sum(self.scorekeeper.ambulance.values()),
-                                                        ])
-        self.observation_space["doable_actions"] = self.scorekeeper.available_action_space()
-        return self.observation_space
+        self.observation_space['variables'][:] = (self.scorekeeper.remaining_time,
+                                                  self.previous_cum_reward,
+                                                  sum(self.scorekeeper.ambulance.values()))
+        self.observation_space["doable_actions"][:] = self.scorekeeper.available_action_space()
+        return self.observation
     
+    def get_humanoid_probs(self, humanoid):
+        """
+        returns the classifier probabilities for a humanoid, from the cache if one was given
+        """
+        if self.prob_cache is not None:
+            return self.prob_cache.get_probs(humanoid)
+        # decoded and converted the same way get_probs_batch does (which built the cache)
+        return self.prob_predictor.get_probs(os.path.join(self.img_data_root, humanoid.fp))
+
     def act(self, humanoid):
         """
         Acts on the environment according the the humanoid given and its observation state
         
         humanoid : the humanoid being presented
         """
-        img_ = Image.open(os.path.join(self.img_data_root, humanoid.fp))
-        humanoid_probs = self.prob_predictor.get_probs(img_)
-        self.observation_space["humanoid_class_probs"] = humanoid_probs
+        humanoid_probs = self.get_humanoid_probs(humanoid)
+        self.observation_space["humanoid_class_probs"][:] = humanoid_probs
         
         action_idx = self.action_predictor.get_action(self.get_observation_space())
         action = ScoreKeeper.get_action_string(action_idx)
@@ -134,7 +145,7 @@ class InferInterface(Env):
         if action == "save":
             self.observation_space["vehicle_storage_class_probs"][self.scorekeeper.get_current_capacity()-1] = humanoid_probs
         elif action == "scram":
-            self.observation_space["vehicle_storage_class_probs"] = np.zeros((self.environment_params['car_capacity'],self.environment_params['num_classes']))
+            self.observation_space["vehicle_storage_class_probs"].fill(0)
     
     def suggest(self, humanoid):
         """
@@ -142,9 +153,8 @@ class InferInterface(Env):
         
         humanoid : the humanoid being presented
         """
-        img_ = Image.open(os.path.join(self.img_data_root, humanoid.fp))
-        humanoid_probs = self.prob_predictor.get_probs(img_)
-        self.observation_space["humanoid_class_probs"] = humanoid_probs
+        humanoid_probs = self.get_humanoid_probs(humanoid)
+        self.observation_space["humanoid_class_probs"][:] = humanoid_probs
         
         action_idx = self.action_predictor.get_action(self.get_observation_space())
         action = ScoreKeeper.get_action_string(action_idx)
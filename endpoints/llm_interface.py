@@ -4,13 +4,70 @@ from pyexpat.errors import messages
 import string
 import requests
 import json
-from PIL import Image
-import io
+import time
+from collections import OrderedDict
+from endpoints.ollama_client import OllamaClient
 from gameplay.enums import ActionCost, ActionState, State
 from gameplay.humanoid import Humanoid
 from gameplay.scorekeeper import ScoreKeeper
 from LLM.promptEnums import *
 
+# few-shot example images sent with every multimodal request: HEALTHY, INJURED, CORPSE, ZOMBIE
+EXAMPLE_IMAGES = ('consolidated_dataset/test_00000.png', 'consolidated_dataset/test_00147.png',
+                  'consolidated_dataset/test_00173.png', 'consolidated_dataset/test_00177.png')
+
+
+# reply words (the first word of the LLM's reply) and the actions they map to
+ACTION_MAPPING = {
+    "SAVE": ActionCost.SAVE,
+    "SQUISH": ActionCost.SQUISH,
+    "SKIP": ActionCost.SKIP,
+    "SCRAM": ActionCost.SCRAM,
+    "KILL": ActionCost.SQUISH,
+    "LEAVE": ActionCost.SKIP,
+    "RUN": ActionCost.SCRAM,
+    "RESCUE": ActionCost.SAVE,
+    "HELP": ActionCost.SAVE,
+    "IGNORE": ActionCost.SKIP
+}
+
+
+class ImageCache:
+    """
+    Bounded LRU cache of base64-encoded images, keyed by path and modification time
+    so an image that changes on disk is read again.
+    """
+
+    def __init__(self, encode, max_entries=256):
+        """
+        encode: function reading an image path into a base64 string (None on failure)
+        max_entries: number of encoded images kept, least recently used ones are dropped first
+        """
+        self.encode = encode
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, image_path):
+        """Return the base64 string of image_path, encoding it only if it is new or changed"""
+        try:
+            key = (image_path, os.stat(image_path).st_mtime_ns)
+        except OSError:
+            return self.encode(image_path)  # reports the error
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        encoded = self.encode(image_path)
+        if encoded is not None:
+            self.entries[key] = encoded
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return encoded
+
 
 class LLMInterface:
     """
@@ -19,7 +76,9 @@ class LLMInterface:
     """
     
     def __init__(self, data_parser, scorekeeper, img_data_root='data', use_images=True, role=None,
-                 ollama_url="http://localhost:11434", model_name="llava"):
+                 ollama_url="http://localhost:11434", model_name="llava", image_cache_size=256,
+                 client=None, image_cache=None, response_cache=None, temperature0=False,
+                 stream=False):
         """
         Initialize LLM interface
         
@@ -30,6 +89,12 @@ class LLMInterface:
             use_images: Whether to use image-based prompts (True) or text-based (False)
             ollama_url: URL for Ollama API (default: localhost)
             model_name: Ollama model to use (llava for multimodal, llama2 for text-only)
+            image_cache_size: Number of base64-encoded images kept in memory between decisions
+            client: OllamaClient to send requests with (default: a new pooled client for ollama_url)
+            image_cache: ImageCache shared with other interfaces (default: a new one of image_cache_size)
+            response_cache: ResponseCache replies are looked up in and stored to (default: no caching)
+            temperature0: Sample with temperature 0 and a fixed seed so identical prompts get identical replies
+            stream: Stream the reply and stop reading once its first word (the action) is complete
         """
         self.data_parser = data_parser
         self.scorekeeper = scorekeeper
@@ -38,6 +103,20 @@ class LLMInterface:
         self.role = role
         self.ollama_url = ollama_url
         self.model_name = model_name
+        # one keep-alive connection pool (with timeouts and retries) for every request of every decision
+        self.client = client if client is not None else OllamaClient(ollama_url)
+        self.response_cache = response_cache
+        self.temperature0 = temperature0
+        self.stream = stream
+        # latency of the last reply: time to the action word, time to the end of the response, and how it was served
+        self.last_timing = None
+
+        # encoded images are reused across decisions (and games); the examples are encoded once, up front
+        self.image_cache = image_cache if image_cache is not None else ImageCache(self._encode_image_to_base64, max_entries=image_cache_size)
+        self.example_paths = [os.path.join(self.img_data_root, image) for image in EXAMPLE_IMAGES]
+        if self.use_images:
+            for image_path in self.example_paths:
+                self.image_cache.get(image_path)
         
         # Test connection to Ollama
         self._test_connection()
@@ -45,16 +124,17 @@ class LLMInterface:
     def _test_connection(self):
         """Test if Ollama is running and accessible"""
         try:
-            response = requests.get(f"{self.ollama_url}/api/tags") 
+            response = self.client.tags(retries=0)
             if response.status_code != 200:
                 print(f"Warning: Ollama API not accessible at {self.ollama_url}")
                 print("Please install and run Ollama: https://ollama.ai/")
                 print("For multimodal support, pull llava: ollama pull llava")
-        except requests.exceptions.ConnectionError:
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             print(f"Warning: Cannot connect to Ollama at {self.ollama_url}")
             print("Please install and run Ollama: https://ollama.ai/")
     
-    def _encode_image_to_base64(self, image_path):
+    @staticmethod
+    def _encode_image_to_base64(image_path):
         """Convert image to base64 string for API"""
         try:
             with open(image_path, "rb") as image_file:
@@ -64,14 +144,8 @@ class LLMInterface:
             return None
     
     def _create_image_prompt(self, humanoid, identify=False):
-        # example images for llm context
-        healthy_path = os.path.join(self.img_data_root, 'consolidated_dataset/test_00000.png')
-        #168
-        injured_path = os.path.join(self.img_data_root, 'consolidated_dataset/test_00147.png')
-        corpse_path = os.path.join(self.img_data_root, 'consolidated_dataset/test_00173.png')
-        zombie_path = os.path.join(self.img_data_root, 'consolidated_dataset/test_00177.png')
-
-        example_images = [self._encode_image_to_base64(image) for image in (healthy_path, injured_path, corpse_path, zombie_path)]
+        # example images for llm context, served from the image cache
+        example_images = [self.image_cache.get(image) for image in self.example_paths]
         #print(example_images[0][:10] if (example_images[0] != None) else "")
 
         """Create a multimodal prompt with image and text"""
@@ -84,7 +158,7 @@ class LLMInterface:
             return Prompt.TEXT.value.format(time=self.scorekeeper.remaining_time, capacity=self.scorekeeper.capacity, filled=self.scorekeeper.get_current_capacity(),humanoid=humanoid)
         
         # Encode image to base64
-        image_base64 = self._encode_image_to_base64(image_path)
+        image_base64 = self.image_cache.get(image_path)
         
         if not (image_base64):
             print(f"Warning: Image not found at {image_base64}, falling back to text prompt")
@@ -97,74 +171,187 @@ class LLMInterface:
             "example_images" : example_images
         }
     
-    def _call_ollama_api(self, prompt_data):
-        """Call Ollama API and get response"""
-        try:
-            if self.use_images and isinstance(prompt_data, dict):
-                # Multimodal request with image
-                #length = len(prompt_data["image"])
-                #print(prompt_data["image"][length//2:length//2+10])
-
-                payload = {
-                    "model": self.model_name, 
-                    "messages": [
-                        {"role": "system", "content": prompt_data["context"]},
-                        {"role": "user", "content": "This image is classified as HEALTHY.", "images": [prompt_data["example_images"][0]]},
-                        {"role": "user", "content": "This image is classified as INJURED.", "images": [prompt_data["example_images"][1]]},
-                        {"role": "user", "content": "This image is classified as CORPSE.", "images": [prompt_data["example_images"][2]]},
-                        {"role": "user", "content": "This image is classified as ZOMBIE.", "images": [prompt_data["example_images"][3]]},
-                        
-                        #{"role": "system", "content": prompt_data["context"] + "These are examples of HEALTHY then INJURED then CORPSE then ZOMBIE", "images": prompt_data["example_images"]},
-                        
-                        {"role": "user", "content": prompt_data["prompt"], "images": [prompt_data["image"]]}
-                    ],
-                    "stream": False,
-                    "options": {
-                        "num_predict": 30,
-                    }
+    def _build_payload(self, prompt_data):
+        """Build the /api/chat request body for a prompt"""
+        if self.use_images and isinstance(prompt_data, dict):
+            # Multimodal request with image
+            #length = len(prompt_data["image"])
+            #print(prompt_data["image"][length//2:length//2+10])
+
+            payload = {
+                "model": self.model_name, 
+                "messages": [
+                    {"role": "system", "content": prompt_data["context"]},
+                    {"role": "user", "content": "This image is classified as HEALTHY.", "images": [prompt_data["example_images"][0]]},
+                    {"role": "user", "content": "This image is classified as INJURED.", "images": [prompt_data["example_images"][1]]},
+                    {"role": "user", "content": "This image is classified as CORPSE.", "images": [prompt_data["example_images"][2]]},
+                    {"role": "user", "content": "This image is classified as ZOMBIE.", "images": [prompt_data["example_images"][3]]},
+                    
+                    #{"role": "system", "content": prompt_data["context"] + "These are examples of HEALTHY then INJURED then CORPSE then ZOMBIE", "images": prompt_data["example_images"]},
+                    
+                    {"role": "user", "content": prompt_data["prompt"], "images": [prompt_data["image"]]}
+                ],
+                "stream": False,
+                "options": {
+                    "num_predict": 30,
                 }
+            }
 
-               
-            else:
-                # Text-only request, yes prompt_data is a string, yes that could be a bad idea
-                payload = {
-                    "model": self.model_name,
-                    "messages": [
-                        {"role": "system", "content": prompt_data["context"]},
-                        {"role": "user", "content": prompt_data["prompt"]}
-                    ],
-                    "stream": False,
-                    "options":  {
-                        "num_predict": 50,
-                    }
+           
+        else:
+            # Text-only request, yes prompt_data is a string, yes that could be a bad idea
+            payload = {
+                "model": self.model_name,
+                "messages": [
+                    {"role": "system", "content": prompt_data["context"]},
+                    {"role": "user", "content": prompt_data["prompt"]}
+                ],
+                "stream": False,
+                "options":  {
+                    "num_predict": 50,
                 }
-            
-            response = requests.post(
-                f"{self.ollama_url}/api/chat",
-                json=payload,
-                timeout=100
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                response_text = result.get("message", {}).get("content", "").strip()
-                return response_text
-            else:
-                print(f"❌ Error calling Ollama API: {response.status_code}")
-                print(f"Response text: {response.text}")
-                return None
-                
-        except requests.exceptions.ConnectionError as e:
+            }
+        if self.temperature0:
+            payload["options"].update(temperature=0, seed=0)
+        payload["stream"] = self.stream
+        return payload
+
+    def _read_response(self, response):
+        """Extract the reply text from an /api/chat response, None on an error status"""
+        if response.status_code == 200:
+            result = response.json()
+            response_text = result.get("message", {}).get("content", "").strip()
+            return response_text
+        else:
+            print(f"❌ Error calling Ollama API: {response.status_code}")
+            print(f"Response text: {response.text}")
+            return None
+
+    @staticmethod
+    def _first_word(text):
+        """
+        The reply's first word as _parse_action_response reads it (split on spaces only),
+        and whether it is complete, i.e. a space has been generated after it
+        """
+        text = text.lstrip().upper()
+        return text.split(" ")[0], " " in text
+
+    @staticmethod
+    def _action_decided(text):
+        """True once the (partial) reply's first word is complete and contains an action keyword"""
+        word, complete = LLMInterface._first_word(text)
+        return complete and any(key in word for key in ACTION_MAPPING)
+
+    def _read_stream(self, response, start, stop_at_action):
+        """
+        Read the NDJSON chunks of a streamed /api/chat response. With stop_at_action the response is
+        closed (and Ollama stops generating) as soon as the action is decided: the first word is complete and
+        contains an action keyword, so parsing the partial reply gives the same action as the full one
+        """
+        if response.status_code != 200:
+            return self._read_response(response), None, False
+        text = ""
+        decision_time = None
+        stopped_early = False
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                text += chunk.get("message", {}).get("content", "")
+                if decision_time is None and self._action_decided(text):
+                    decision_time = time.perf_counter() - start
+                    if stop_at_action:
+                        stopped_early = not chunk.get("done", False)
+                        break
+                if chunk.get("done", False):
+                    break
+        finally:
+            response.close()
+        return text.strip(), decision_time, stopped_early
+
+    def _request_reply(self, payload, client, stop_at_action=True):
+        """
+        Send one chat request and read the reply, recording its latency in last_timing.
+        Returns the reply text and whether it was cut short at the action
+        """
+        start = time.perf_counter()
+        if self.stream:
+            response_text, decision_time, stopped_early = self._read_stream(
+                client.chat(payload, stream=True), start, stop_at_action)
+        else:
+            response_text, decision_time, stopped_early = self._read_response(client.chat(payload)), None, False
+        generation_time = time.perf_counter() - start
+        self.last_timing = {
+            "decision_s": decision_time if decision_time is not None else generation_time,
+            "generation_s": generation_time,
+            "stopped_early": stopped_early,
+            "cached": False,
+        }
+        return response_text, stopped_early
+
+    def _report_error(self, e):
+        """Print why an Ollama call failed"""
+        if isinstance(e, requests.exceptions.ConnectionError):
             print(f"❌ Connection error: Cannot connect to Ollama at {self.ollama_url}")
             print("💡 Make sure Ollama is running: ollama serve")
-            return None
-        except requests.exceptions.Timeout as e:
+        elif isinstance(e, requests.exceptions.Timeout):
             print(f"❌ Timeout error: Ollama took too long to respond")
             print("💡 Try using a smaller model or restart Ollama")
-            return None
-        except Exception as e:
+        else:
             print(f"❌ Error calling Ollama API: {e}")
             print(f"💡 Check if Ollama is running and the model '{self.model_name}' is available")
+
+    def _cached(self, payload, stop_at_action):
+        """
+        (cache keys, cached reply) of a request, both None without a response cache.
+        The keys address the full reply and the reply cut short at its action; the latter only serves
+        requests that stop at the action too, as its action parses the same as the full reply's
+        """
+        if self.response_cache is None:
+            return None, None
+        start = time.perf_counter()
+        keys = (self.response_cache.key(payload), self.response_cache.key(payload, truncated=True))
+        cached = self.response_cache.get(*keys) if stop_at_action else self.response_cache.get(keys[0])
+        if cached is not None:
+            lookup_time = time.perf_counter() - start
+            self.last_timing = {"decision_s": lookup_time, "generation_s": lookup_time, "stopped_early": False,
+                                "cached": True}
+        return keys, cached
+
+    def _store(self, keys, reply):
+        """Cache a (reply text, cut short) pair from _request_reply under the full or the cut short reply's key"""
+        response_text, truncated = reply
+        if keys is not None and response_text is not None:
+            self.response_cache.put(keys[1] if truncated else keys[0], self.model_name, response_text)
+        return response_text
+
+    def _call_ollama_api(self, prompt_data, stop_at_action=True):
+        """Call Ollama API and get response"""
+        self.last_timing = None
+        try:
+            payload = self._build_payload(prompt_data)
+            keys, cached = self._cached(payload, stop_at_action)
+            if cached is not None:
+                return cached
+            return self._store(keys, self._request_reply(payload, self.client, stop_at_action))
+        except Exception as e:
+            self._report_error(e)
+            return None
+
+    async def _call_ollama_api_async(self, prompt_data, async_client, stop_at_action=True):
+        """_call_ollama_api through an AsyncOllamaClient, so other games run while this one waits"""
+        self.last_timing = None
+        try:
+            payload = self._build_payload(prompt_data)
+            keys, cached = self._cached(payload, stop_at_action)
+            if cached is not None:
+                return cached
+            # the request and the (streamed) read both run on the client's threads
+            return self._store(keys, await async_client.call(self._request_reply, payload, async_client.client,
+                                                            stop_at_action))
+        except Exception as e:
+            self._report_error(e)
             return None
     
     def _parse_action_response(self, response):
@@ -175,22 +362,10 @@ class LLMInterface:
         
         # Clean and normalize response
         # print(response)
-        response = response.strip().upper().split(" ")
-        response = response[0]
+        response, _ = self._first_word(response.strip())
         
         # Map common variations to actions
-        action_mapping = {
-            "SAVE": ActionCost.SAVE,
-            "SQUISH": ActionCost.SQUISH,
-            "SKIP": ActionCost.SKIP,
-            "SCRAM": ActionCost.SCRAM,
-            "KILL": ActionCost.SQUISH,
-            "LEAVE": ActionCost.SKIP,
-            "RUN": ActionCost.SCRAM,
-            "RESCUE": ActionCost.SAVE,
-            "HELP": ActionCost.SAVE,
-            "IGNORE": ActionCost.SKIP
-        }
+        action_mapping = ACTION_MAPPING
         
         # Try exact match first
         if response in action_mapping:
@@ -217,8 +392,27 @@ class LLMInterface:
             ActionCost enum value
         """
         # Create appropriate prompt based on mode
+        prompt_data = self._create_prompt(humanoid, identify)
+        
+        # Get LLM response (identification guesses are read in full)
+        response = self._call_ollama_api(prompt_data, stop_at_action=not identify)
+        return self._response_to_suggestion(response, humanoid, at_capacity, identify)
+
+    async def get_model_suggestion_async(self, humanoid, async_client, at_capacity=False, identify=False):
+        """
+        get_model_suggestion for games played concurrently on one event loop
+
+        Args:
+            async_client: AsyncOllamaClient shared by the games
+        """
+        prompt_data = self._create_prompt(humanoid, identify)
+        response = await self._call_ollama_api_async(prompt_data, async_client, stop_at_action=not identify)
+        return self._response_to_suggestion(response, humanoid, at_capacity, identify)
+
+    def _create_prompt(self, humanoid, identify=False):
+        """Image prompt, or the role's text prompt when images are off"""
         if self.use_images:
-            prompt_data = self._create_image_prompt(humanoid, identify)
+            return self._create_image_prompt(humanoid, identify)
 
         else:
             if(self.role == 'doctor'):
@@ -239,9 +433,10 @@ class LLMInterface:
                 "context": context + Context.TEXT.value,
                 "prompt": Prompt.TEXT.value.format(time=self.scorekeeper.remaining_time, capacity=self.scorekeeper.capacity-self.scorekeeper.get_current_capacity(),humanoid=humanoid)
             }
-        
-        # Get LLM response
-        response = self._call_ollama_api(prompt_data)
+        return prompt_data
+
+    def _response_to_suggestion(self, response, humanoid, at_capacity, identify):
+        """Turn the LLM reply into an ActionCost (or the raw guess when identifying)"""
         if response is None:
             print("❌ LLM API call failed or returned no response.")
             return "UNKNOWN"
@@ -306,7 +501,8 @@ class LLMInterface:
             # Attach the image if available
             if "images" in prompt_data and prompt_data["images"]:
                 messages["images"] = prompt_data["images"]
-            response_text = self._call_ollama_api(messages)
+            # free text, read in full
+            response_text = self._call_ollama_api(messages, stop_at_action=False)
             if response_text:
                 print(f"✅ Got reasoning response: {response_text}...")
                 return response_text
@@ -0,0 +1,128 @@
+import asyncio
+import functools
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# statuses Ollama returns while it is loading a model or overloaded, worth retrying
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class OllamaClient(object):
+    """
+    HTTP client for the Ollama API: one pooled keep-alive requests.Session shared by every call,
+    separate connect / read timeouts, and retries with jittered exponential backoff on transient failures.
+    """
+
+    def __init__(self, url="http://localhost:11434", connect_timeout=3.05, read_timeout=100, retries=3,
+                 backoff=0.5, max_backoff=8.0, pool_size=10):
+        """
+        url : Ollama server
+        connect_timeout : seconds to wait for the TCP connection
+        read_timeout : seconds to wait for the server between bytes of the response (generation time)
+        retries : attempts after the first on a connection error, connect timeout or retryable status
+        backoff : base delay of the exponential backoff, attempt n sleeps uniform(0, min(max_backoff, backoff * 2**n))
+        pool_size : connections kept alive (one per thread calling the client concurrently)
+        """
+        self.url = url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, path, timeout=None, retries=None, **kwargs):
+        """
+        sends one request, retrying transient failures: failing to connect and retryable statuses. returns the
+        response (also a final retryable error response), raises the last requests exception if every attempt
+        failed to connect. a read timeout is raised at once, a generation that stalled is not started again
+
+        timeout : seconds or (connect, read), default the client's timeouts
+        retries : overrides the client's retry count
+        """
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            try:
+                response = self.session.request(method, self.url + path, timeout=timeout, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+                response.close()
+            except requests.exceptions.ConnectionError:   # includes ConnectTimeout, but not ReadTimeout
+                if attempt == retries:
+                    raise
+            time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def tags(self, **kwargs):
+        """GET /api/tags, the locally available models"""
+        return self.get('/api/tags', **kwargs)
+
+    def chat(self, payload, **kwargs):
+        """POST /api/chat"""
+        return self.post('/api/chat', json=payload, **kwargs)
+
+    def generate(self, payload, **kwargs):
+        """POST /api/generate"""
+        return self.post('/api/generate', json=payload, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncOllamaClient(object):
+    """
+    Awaitable front end of an OllamaClient for games played concurrently on one event loop.
+    At most `concurrency` requests are in flight at once (match OLLAMA_NUM_PARALLEL on the server);
+    the blocking requests run on a thread pool of that size and share the client's connection pool.
+    """
+
+    def __init__(self, client=None, concurrency=4):
+        """
+        client : OllamaClient to send requests with (default: a new one with a pool of `concurrency` connections)
+        concurrency : maximum requests in flight
+        """
+        self.client = client if client is not None else OllamaClient(pool_size=concurrency)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ollama')
+
+    async def call(self, fn, *args, **kwargs):
+        """
+        runs fn(*args, **kwargs) on the client's threads as one of the `concurrency` requests in flight
+        (for work that must stay on the thread, like reading a streamed response)
+        """
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    async def request(self, method, path, **kwargs):
+        return await self.call(self.client.request, method, path, **kwargs)
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request('POST', path, **kwargs)
+
+    async def tags(self, **kwargs):
+        """GET /api/tags, the locally available models"""
+        return await self.get('/api/tags', **kwargs)
+
+    async def chat(self, payload, **kwargs):
+        """POST /api/chat"""
+        return await self.post('/api/chat', json=payload, **kwargs)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.client.close()
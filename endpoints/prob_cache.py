@@ -0,0 +1,119 @@
+import os
+import hashlib
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+from endpoints.heuristic_interface import Predictor
+
+
+def hash_file(fp, chunk_size=1 << 20):
+    """
+    returns the sha256 hex digest of a file, or "untrained" if the file does not exist
+    (the predictor falls back to uniform probabilities without weights)
+    """
+    if not os.path.exists(fp):
+        return "untrained"
+    digest = hashlib.sha256()
+    with open(fp, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ProbabilityCache(object):
+    """
+    Classifier probabilities for every image in a metadata file, computed once and looked up afterwards
+    """
+
+    def __init__(self, data_fp, metadata_fn="consolidated_metadata.csv",
+                 model_file=os.path.join('models', 'baseline.pth'), cache_fp=None, predictor=None, rebuild=False):
+        """
+        loads the probability table from disk, rebuilding it if it is missing or was made with other weights
+
+        data_fp : location of the folder in which the metadata csv file is located
+        metadata_fn : name of the metadata csv file
+        model_file : classifier weights the probabilities are computed with
+        cache_fp : where the table is stored (defaults to <metadata>.probs.npz next to the csv)
+        predictor : optional already loaded Predictor to build the table with
+        rebuild : recompute the table even if the cached one is up to date
+        """
+        self.data_fp = data_fp
+        self.model_file = model_file
+        self.predictor = predictor
+        if cache_fp is None:
+            cache_fp = os.path.join(data_fp, os.path.splitext(metadata_fn)[0] + ".probs.npz")
+        self.cache_fp = cache_fp
+
+        df = pd.read_csv(os.path.join(data_fp, metadata_fn))
+        self.filenames = df['Filename'].astype(str).to_numpy(dtype=str)
+        self.index_of = {fn: i for i, fn in enumerate(self.filenames)}
+        self.weights_hash = hash_file(model_file)
+
+        if rebuild or not self.load():
+            self.build()
+            self.save()
+
+    def load(self):
+        """
+        loads the table from disk. returns False if it is missing or stale
+        """
+        if not os.path.exists(self.cache_fp):
+            return False
+        with np.load(self.cache_fp, allow_pickle=False) as cached:
+            if str(cached['weights_hash']) != self.weights_hash:
+                return False
+            if not np.array_equal(cached['filenames'], self.filenames):
+                return False
+            self.probs = cached['probs'].astype(np.float32)
+        return True
+
+    def build(self):
+        """
+        runs the classifier once over every row of the metadata file
+        """
+        if self.predictor is None:
+            self.predictor = Predictor(model_file=self.model_file)
+        paths = [os.path.join(self.data_fp, fn) for fn in self.filenames]
+        self.probs = self.predictor.get_probs_batch(paths).astype(np.float32)
+
+    def save(self):
+        """
+        writes the table to a temporary file next to the cache and renames it into place, so processes
+        building the cache at the same time never leave (or load) a half written file
+        """
+        fd, tmp_fp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.cache_fp)), suffix='.npz.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, probs=self.probs, filenames=self.filenames, weights_hash=np.array(self.weights_hash))
+            os.replace(tmp_fp, self.cache_fp)
+        except BaseException:
+            os.remove(tmp_fp)
+            raise
+
+    def get_probs_idx(self, index):
+        """
+        returns the class probabilities of the humanoid at a metadata index
+        """
+        return self.probs[index]
+
+    def get_probs(self, humanoid):
+        """
+        returns the class probabilities of a humanoid, looked up by its image filename
+        """
+        return self.probs[self.index_of[humanoid.fp]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog='python3 -m endpoints.prob_cache',
+        description='Precompute classifier probabilities for every image in a metadata file')
+    parser.add_argument('-d', '--data_fp', type=str, default='data')
+    parser.add_argument('--metadata', type=str, default='consolidated_metadata.csv')
+    parser.add_argument('--model_file', type=str, default=os.path.join('models', 'baseline.pth'))
+    parser.add_argument('-f', '--force', action='store_true', help='Rebuild even if the cached table is up to date')
+    args = parser.parse_args()
+
+    cache = ProbabilityCache(args.data_fp, args.metadata, args.model_file, rebuild=args.force)
+    print("cached probabilities for {} images at {}".format(len(cache.probs), cache.cache_fp))
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache(object):
+    """
+    On-disk cache of LLM replies, addressed by the request: model, options, the message list and the
+    digests of its images. Keeps at most max_entries replies, evicting the least recently used ones.
+    Safe to share between threads, and between processes through SQLite's file locking.
+    """
+
+    def __init__(self, path, max_entries=100000):
+        """
+        path : sqlite database file (created if missing)
+        max_entries : replies kept, least recently used ones are deleted first
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS responses "
+                        "(key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL, last_used REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.db.commit()
+
+    @staticmethod
+    def key(payload, truncated=False):
+        """
+        content address of an /api/chat request: images are replaced by their sha256 digests,
+        everything else (model, options, roles and texts) is hashed as canonical json
+
+        truncated : address of the reply cut short once its action was decided, kept apart from the full reply
+                    so only requests that just parse the action are served from it
+        """
+        messages = [dict(message, images=[hashlib.sha256(image.encode()).hexdigest() for image in message["images"]])
+                    if message.get("images") else message for message in payload["messages"]]
+        request = {"model": payload["model"], "options": payload.get("options", {}), "messages": messages}
+        if truncated:
+            request["truncated"] = True
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key, *fallbacks):
+        """the cached reply of the first of the keys that is stored, or None (one hit or miss either way)"""
+        with self.lock:
+            for key in (key,) + fallbacks:
+                row = self.db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    break
+            else:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+            return row[0]
+
+    def put(self, key, model, response):
+        with self.lock:
+            now = time.time()
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (key, model, response, now, now))
+            excess = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.db.execute("DELETE FROM responses WHERE key IN "
+                                "(SELECT key FROM responses ORDER BY last_used LIMIT ?)", (excess,))
+            self.db.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM responses")
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+def default_cache_path(data_fp):
+    """the response cache kept next to the game data"""
+    return os.path.join(data_fp, "llm_responses.cache.sqlite")
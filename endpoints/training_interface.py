@@ -15,36 +15,46 @@ from endpoints.heuristic_interface import Predictor
 
 from gym import Env, spaces
 from endpoints.data_parser import DataParser
+from gameplay.observation import ObservationLayout
+from gameplay.phase_timer import NULL_TIMER
 
 
 class TrainInterface(Env):
-    def __init__(self, root, w, h, data_parser, scorekeeper, classifier_model_file=os.path.join('models', 'baseline.pth'), img_data_root='data', display=False, ):
+    def __init__(self, root, w, h, data_parser, scorekeeper, classifier_model_file=os.path.join('models', 'baseline.pth'), img_data_root='data', display=False, predictor=None, prob_cache=None):
         """
         initializes RL training interface
         
         dataparser : stores humanoid information needed to retreive humanoid images and rewards
         scorekeeper : keeps track of actions being done on humanoids, score, and is needed for reward calculations
         classifier_model_file : backbone model weights used in RL observation state
+        predictor : optional already loaded Predictor (lets several environments share one classifier)
+        prob_cache : optional ProbabilityCache; if given, class probabilities are looked up instead of running the classifier
         """
         self.img_data_root = img_data_root
+        self.prob_cache = prob_cache
         self.data_parser = data_parser
         self.scorekeeper = scorekeeper
         self.display = display
+        # phase timings (image load, CNN probs) are recorded here when training is instrumented
+        self.timer = NULL_TIMER
 
         self.environment_params = {
             "car_capacity" : self.scorekeeper.capacity,
             "num_classes" : len(Humanoid.get_all_states()),
             "num_actions" : self.scorekeeper.actions,
         }
-        self.observation_space = {"variables": np.zeros(3),
-                                  "vehicle_storage_class_probs" : np.zeros((self.environment_params['car_capacity'],self.environment_params['num_classes'])),
-                                    "humanoid_class_probs":np.zeros(self.environment_params['num_classes']),
-                                    "doable_actions":np.ones(self.environment_params['num_actions'],np.int64),
-                                    }
+        # the observation is one preallocated flat vector, observation_space holds named views into it
+        self.layout = ObservationLayout(self.environment_params['car_capacity'],
+                                        self.environment_params['num_classes'],
+                                        self.environment_params['num_actions'])
+        self.observation = self.layout.new()
+        self.observation_space = self.layout.views(self.observation)
 
         self.action_space = spaces.Discrete(self.environment_params['num_actions'],)
         
-        self.predictor = Predictor(classifier_model_file)
+        if predictor is None and prob_cache is None:
+            predictor = Predictor(model_file=classifier_model_file)
+        self.predictor = predictor
         
         #helper variables
         self.reset()
@@ -61,37 +71,65 @@ class TrainInterface(Env):
     def reset(self):
         """
         resets game for a new episode to run.
-        returns observation space
+        returns the flat observation vector
         """
-        self.observation_space = {"variables": np.zeros(3),
-                                  "vehicle_storage_class_probs" : np.zeros((self.environment_params['car_capacity'],self.environment_params['num_classes'])),
-                                    "humanoid_class_probs":np.zeros(self.environment_params['num_classes']),
-                                    "doable_actions":np.ones(self.environment_params['num_actions'],np.int64),
-                                    }
+        self.layout.reset(self.observation)
         self.previous_cum_reward = 0
         self.data_parser.reset()
         self.scorekeeper.reset()
         self.get_humanoid()
-        return self.observation_space
+        return self.observation
     
+    def seed(self, seed=None):
+        """
+        reseeds the humanoid sampling
+        """
+        self.data_parser.seed(seed)
+
+    def state_dict(self):
+        """
+        everything needed to continue the current episode exactly (used in training checkpoints)
+        """
+        return {"data_parser": self.data_parser,
+                "scorekeeper": self.scorekeeper,
+                "humanoid": self.humanoid,
+                "humanoid_probs": self.humanoid_probs,
+                "previous_cum_reward": self.previous_cum_reward,
+                "observation": self.observation.copy()}
+
+    def load_state_dict(self, state):
+        self.data_parser = state["data_parser"]
+        self.scorekeeper = state["scorekeeper"]
+        self.humanoid = state["humanoid"]
+        self.humanoid_probs = state["humanoid_probs"]
+        self.previous_cum_reward = state["previous_cum_reward"]
+        # copy in place so observation_space keeps viewing the same vector
+        self.observation[:] = state["observation"]
+
     def get_humanoid(self):
         """
         gets a random humanoid from the dataparser
         """
         self.humanoid = self.data_parser.get_random()
-        img_ = Image.open(os.path.join(self.img_data_root, self.humanoid.fp))
-        self.humanoid_probs = self.predictor.get_probs(img_) 
+        if self.prob_cache is not None:
+            with self.timer.time('cnn_probs'):
+                self.humanoid_probs = self.prob_cache.get_probs(self.humanoid)
+        else:
+            with self.timer.time('image_load'):
+                img_ = Image.open(os.path.join(self.img_data_root, self.humanoid.fp))
+                img_.load()
+            with self.timer.time('cnn_probs'):
+                self.humanoid_probs = self.predictor.get_probs(img_)
     
     def get_observation_space(self):
         """
-        updates the observation space
+        updates the observation space (in place)
         """
-        self.observation_space['variables'] = np.array([self.scorekeeper.remaining_time, 
-                                                        self.previous_cum_reward,
-                                                        sum(self.scorekeeper.ambulance.values()),
-                                                        ])
-        self.observation_space["doable_actions"] = self.scorekeeper.available_action_space()
-        self.observation_space["humanoid_class_probs"] = self.humanoid_probs
+        self.observation_space['variables'][:] = (self.scorekeeper.remaining_time,
+                                                  self.previous_cum_reward,
+                                                  sum(self.scorekeeper.ambulance.values()))
+        self.observation_space["doable_actions"][:] = self.scorekeeper.available_action_space()
+        self.observation_space["humanoid_class_probs"][:] = self.humanoid_probs
         
     def step(self, action_idx):
         """
@@ -112,7 +150,7 @@ class TrainInterface(Env):
             if action == "save":
                 self.observation_space["vehicle_storage_class_probs"][self.scorekeeper.get_current_capacity()-1] = self.humanoid_probs
             elif action == "scram":
-                self.observation_space["vehicle_storage_class_probs"] = np.zeros((self.environment_params['car_capacity'],self.environment_params['num_classes']))
+                self.observation_space["vehicle_storage_class_probs"].fill(0)
             self.get_humanoid()
         else:
             reward-=0.5
@@ -122,4 +160,76 @@ class TrainInterface(Env):
             self.reset()
             
         self.get_observation_space()
-        return self.observation_space, reward, finished, False, {} #self.observation_space, reward, finished, False, {} 
\ No newline at end of file
+        return self.observation, reward, finished, False, {}
+
+
+class VecTrainInterface(object):
+    def __init__(self, data_parsers, scorekeepers, classifier_model_file=os.path.join('models', 'baseline.pth'), img_data_root='data', prob_cache=None):
+        """
+        runs several independent TrainInterface environments behind one object, for batched rollouts
+
+        data_parsers : one DataParser per sub-environment
+        scorekeepers : one ScoreKeeper per sub-environment
+        classifier_model_file : backbone model weights used in RL observation state (loaded once, shared)
+        prob_cache : optional ProbabilityCache shared by all sub-environments instead of the classifier
+        """
+        if len(data_parsers) != len(scorekeepers):
+            raise ValueError("need exactly one scorekeeper per data parser")
+        self.num_envs = len(data_parsers)
+        self.predictor = Predictor(model_file=classifier_model_file) if prob_cache is None else None
+        self.envs = [TrainInterface(None, None, None, data_parser, scorekeeper,
+                                    img_data_root=img_data_root, display=False,
+                                    predictor=self.predictor, prob_cache=prob_cache)
+                     for data_parser, scorekeeper in zip(data_parsers, scorekeepers)]
+        self.environment_params = self.envs[0].environment_params
+        self.action_space = self.envs[0].action_space
+        self.layout = self.envs[0].layout
+        # (num_envs, observation size) block the sub-environment observations are copied into
+        self.observation = np.zeros((self.num_envs, self.layout.size), dtype=np.float32)
+
+    def seed(self, seed=None):
+        """
+        reseeds every sub-environment (sub-environment i gets seed + i)
+        """
+        for i, env in enumerate(self.envs):
+            env.seed(None if seed is None else seed + i)
+
+    def state_dict(self):
+        return {"envs": [env.state_dict() for env in self.envs]}
+
+    def load_state_dict(self, state):
+        for i, (env, env_state) in enumerate(zip(self.envs, state["envs"])):
+            env.load_state_dict(env_state)
+            self.observation[i] = env.observation
+
+    def reset(self):
+        """
+        resets every sub-environment.
+        returns the (num_envs, observation size) observation block
+        """
+        for i, env in enumerate(self.envs):
+            self.observation[i] = env.reset()
+        return self.observation
+
+    def reset_envs(self, mask):
+        """
+        resets the sub-environments selected by a boolean mask (e.g. episodes cut off at a maximum length).
+        returns the (num_envs, observation size) observation block
+        """
+        for i in np.flatnonzero(mask):
+            self.observation[i] = self.envs[i].reset()
+        return self.observation
+
+    def step(self, actions):
+        """
+        Acts on every sub-environment. Sub-environments whose episode finished are reset automatically,
+        so the returned observation for them is the first observation of their next episode.
+
+        actions : array of action indices, one per sub-environment
+        """
+        actions = np.asarray(actions).reshape(self.num_envs)
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        dones = np.zeros(self.num_envs, dtype=bool)
+        for i, (env, action_idx) in enumerate(zip(self.envs, actions)):
+            self.observation[i], rewards[i], dones[i], _, _ = env.step(int(action_idx))
+        return self.observation, rewards, dones, False, {}
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Headless batch evaluation of the heuristic, RL (infer) and random agents
+Plays N seeded episodes per agent in this process (or across a process pool), loading every model once,
+and reports the mean, variance and confidence interval of get_cumulative_reward.
+Episode i of every agent uses seed + i, so agents are compared on the same humanoid draws.
+
+Usage: python3 evaluate_agents.py -a heuristic infer random -n 200 -w 4 --prob_cache
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+AGENTS = ['heuristic', 'infer', 'random']
+
+SHIFT_LENGTH = 720
+CAPACITY = 10
+
+
+class HeuristicAgent(object):
+    """
+    the classifier + rule policy of main.py's heuristic mode
+    """
+
+    def __init__(self, data_fp, data_parser, scorekeeper, prob_cache=None):
+        from endpoints.heuristic_interface import HeuristicInterface
+        self.interface = HeuristicInterface(None, None, None, display=False, img_data_root=data_fp)
+        self.prob_cache = prob_cache
+        self.scorekeeper = scorekeeper
+
+    def reset(self):
+        pass
+
+    def act(self, humanoid):
+        from endpoints.heuristic_interface import HeuristicInterface
+        from gameplay.enums import ActionCost, State
+        from gameplay.humanoid import Humanoid
+
+        if self.prob_cache is not None:
+            predicted_state = State(Humanoid.get_all_states()[int(np.argmax(self.prob_cache.get_probs(humanoid)))])
+            action = HeuristicInterface._map_class_to_action_default(predicted_state, self.scorekeeper.at_capacity())
+        else:
+            action = self.interface.get_model_suggestion(humanoid, self.scorekeeper.at_capacity())
+        if action == ActionCost.SKIP:
+            self.scorekeeper.skip(humanoid)
+        elif action == ActionCost.SQUISH:
+            self.scorekeeper.squish(humanoid)
+        elif action == ActionCost.SAVE:
+            self.scorekeeper.save(humanoid)
+        elif action == ActionCost.SCRAM:
+            self.scorekeeper.scram(humanoid)
+        else:
+            raise ValueError("Invalid action suggested")
+
+
+class InferAgent(object):
+    """
+    the PPO policy of main.py's infer mode
+    """
+
+    def __init__(self, data_fp, data_parser, scorekeeper, prob_cache=None):
+        from endpoints.inference_interface import InferInterface
+        self.interface = InferInterface(None, None, None, data_parser, scorekeeper, img_data_root=data_fp,
+                                        display=False, prob_cache=prob_cache)
+
+    def reset(self):
+        self.interface.reset()
+
+    def act(self, humanoid):
+        self.interface.act(humanoid)
+
+
+class RandomAgent(object):
+    """
+    uniformly random choice among the currently doable actions
+    """
+
+    def __init__(self, data_fp, data_parser, scorekeeper, prob_cache=None):
+        self.scorekeeper = scorekeeper
+        self.rng = np.random.default_rng()
+
+    def reset(self):
+        pass
+
+    def act(self, humanoid):
+        self.scorekeeper.map_do_action(int(self.rng.choice(np.flatnonzero(self.scorekeeper.available_action_space()))),
+                                       humanoid)
+
+
+AGENT_CLASSES = {'heuristic': HeuristicAgent, 'infer': InferAgent, 'random': RandomAgent}
+
+
+class Evaluator(object):
+    """
+    Owns one game (DataParser + ScoreKeeper) and the agents playing it; models are loaded once, on first use
+    """
+
+    def __init__(self, data_fp='data', prob_cache=False):
+        """
+        data_fp : data folder
+        prob_cache : look up precomputed classifier probabilities instead of running the CNN
+        """
+        from endpoints.data_parser import DataParser
+        from endpoints.prob_cache import ProbabilityCache
+        from gameplay.scorekeeper import FastScoreKeeper
+
+        self.data_fp = data_fp
+        self.data_parser = DataParser(data_fp)
+        self.scorekeeper = FastScoreKeeper(SHIFT_LENGTH, CAPACITY, log=False)
+        self.prob_cache = ProbabilityCache(data_fp) if prob_cache else None
+        self.agents = {}
+
+    def get_agent(self, name):
+        if name not in self.agents:
+            self.agents[name] = AGENT_CLASSES[name](self.data_fp, self.data_parser, self.scorekeeper, self.prob_cache)
+        return self.agents[name]
+
+    def play(self, name, seed):
+        """
+        plays one seeded episode and returns its cumulative reward
+        """
+        import torch
+
+        agent = self.get_agent(name)
+        # every source of randomness an agent may use: humanoid draws, the RL policy's sampling, random fallbacks
+        self.data_parser.seed(seed)
+        torch.manual_seed(seed)
+        random.seed(seed)
+        if isinstance(agent, RandomAgent):
+            agent.rng = np.random.default_rng(seed)
+        self.data_parser.reset()
+        self.scorekeeper.reset()
+        agent.reset()
+
+        while len(self.data_parser.unvisited) > 0:
+            if self.scorekeeper.remaining_time <= 0:
+                break
+            agent.act(self.data_parser.get_random())
+        return self.scorekeeper.get_cumulative_reward()
+
+    def play_many(self, name, seeds):
+        return [self.play(name, seed) for seed in seeds]
+
+
+_evaluator = None
+
+
+def _init_worker(data_fp, prob_cache):
+    global _evaluator
+    import torch
+    torch.set_num_threads(1)
+    _evaluator = Evaluator(data_fp, prob_cache)
+
+
+def _play_chunk(name, seeds):
+    return _evaluator.play_many(name, seeds)
+
+
+def evaluate(agents=AGENTS, num_episodes=100, seed=0, num_workers=0, data_fp='data', prob_cache=False,
+             chunk_size=10):
+    """
+    plays num_episodes seeded episodes per agent.
+    returns {agent name: array of cumulative rewards}
+
+    num_workers : 0 plays every episode in this process, otherwise episodes are spread over a process pool
+                  (each worker loads its models once)
+    """
+    for name in agents:
+        if name not in AGENT_CLASSES:
+            raise ValueError("Unknown agent '{}', expected one of {}".format(name, AGENTS))
+    seeds = list(range(seed, seed + num_episodes))
+
+    if num_workers <= 0:
+        evaluator = Evaluator(data_fp, prob_cache)
+        return {name: np.array(evaluator.play_many(name, seeds)) for name in agents}
+
+    chunks = [seeds[i:i + chunk_size] for i in range(0, len(seeds), chunk_size)]
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(data_fp, prob_cache)) as pool:
+        futures = {name: [pool.submit(_play_chunk, name, chunk) for chunk in chunks] for name in agents}
+        return {name: np.array([reward for future in futures[name] for reward in future.result()])
+                for name in agents}
+
+
+def summarize(rewards, confidence=0.95):
+    """
+    mean, variance and a normal-approximation confidence interval of the mean for each agent
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    rows = []
+    for name, r in rewards.items():
+        r = np.asarray(r, dtype=np.float64)
+        variance = r.var(ddof=1) if len(r) > 1 else 0.0
+        half_width = z * np.sqrt(variance / len(r))
+        rows.append({"agent": name, "episodes": len(r), "mean": r.mean(), "variance": variance,
+                     "std": np.sqrt(variance), "ci_low": r.mean() - half_width, "ci_high": r.mean() + half_width,
+                     "min": r.min(), "max": r.max()})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog='python3 evaluate_agents.py',
+        description='Play seeded headless episodes with the heuristic, RL and random agents and compare rewards')
+    parser.add_argument('-a', '--agents', type=str, nargs='+', default=AGENTS, choices=AGENTS)
+    parser.add_argument('-n', '--num_episodes', type=int, default=100)
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Episode i is played with seed + i')
+    parser.add_argument('-w', '--num_workers', type=int, default=0, help='Worker processes (0 = play in this process)')
+    parser.add_argument('-d', '--data_fp', type=str, default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+    parser.add_argument('--prob_cache', action='store_true', default=False, help='Look up precomputed classifier probabilities instead of running the CNN')
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('-o', '--output', type=str, default=None, help='Optional csv of per-episode rewards')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rewards = evaluate(args.agents, args.num_episodes, args.seed, args.num_workers, args.data_fp, args.prob_cache)
+    elapsed = time.perf_counter() - start
+
+    print(summarize(rewards, args.confidence).to_string(index=False, float_format=lambda v: "{:.3f}".format(v)))
+    print("{} episodes per agent in {:.1f}s ({:.0f}% confidence intervals)".format(
+        args.num_episodes, elapsed, 100 * args.confidence))
+    if args.output:
+        pd.DataFrame({"seed": range(args.seed, args.seed + args.num_episodes), **rewards}).to_csv(args.output, index=False)
+        print("per-episode rewards written to " + args.output)
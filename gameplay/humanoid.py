@@ -3,27 +3,49 @@ from gameplay.enums import State
 MAP_CLASS_STR_TO_INT = {s.value:i for i,s in enumerate(State)}
 MAP_CLASS_INT_TO_STR = [s.value for s in State]
 
+ZOMBIE_IDX = MAP_CLASS_STR_TO_INT[State.ZOMBIE.value]
+HEALTHY_IDX = MAP_CLASS_STR_TO_INT[State.HEALTHY.value]
+INJURED_IDX = MAP_CLASS_STR_TO_INT[State.INJURED.value]
+CORPSE_IDX = MAP_CLASS_STR_TO_INT[State.CORPSE.value]
+
 class Humanoid(object):
     """
     Are they a human or a zombie???
     """
-    
+    # slotted, and the state is kept as an integer code (see get_state_idx) so humanoids are cheap to create and compare
+    __slots__ = ('fp', 'state_idx')
+
     def __init__(self, fp, state, value = 0):
+        """
+        fp : image file path, relative to the data folder
+        state : state string (e.g. "zombie") or integer state code
+        """
         self.fp = fp
         self.state = state
         # self.value = value
 
+    @property
+    def state(self):
+        return MAP_CLASS_INT_TO_STR[self.state_idx]
+
+    @state.setter
+    def state(self, state):
+        self.state_idx = MAP_CLASS_STR_TO_INT[state] if isinstance(state, str) else int(state)
+
     def is_zombie(self):
-        return self.state == State.ZOMBIE.value
+        return self.state_idx == ZOMBIE_IDX
 
     def is_injured(self):
-        return self.state == State.INJURED.value
+        return self.state_idx == INJURED_IDX
 
     def is_healthy(self):
-        return self.state == State.HEALTHY.value
+        return self.state_idx == HEALTHY_IDX
 
     def is_corpse(self):
-        return self.state == State.CORPSE.value
+        return self.state_idx == CORPSE_IDX
+
+    def __repr__(self):
+        return "Humanoid(fp={!r}, state={!r})".format(self.fp, self.state)
     
     @staticmethod
     def get_state_idx(class_string):
@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class ObservationLayout(object):
+    """
+    Layout of the RL observation as one flat float32 vector:
+    [variables | humanoid class probs | vehicle storage class probs (capacity x classes) | doable actions]
+    """
+
+    def __init__(self, capacity=10, num_classes=4, num_actions=4, num_variables=3):
+        """
+        capacity : ambulance capacity (rows of the vehicle storage block)
+        num_classes : number of humanoid classes
+        num_actions : number of actions
+        num_variables : remaining time, previous cumulative reward, ambulance occupancy
+        """
+        self.capacity = capacity
+        self.num_classes = num_classes
+        self.num_actions = num_actions
+        self.num_variables = num_variables
+
+        self.shapes = {"variables": (num_variables,),
+                       "humanoid_class_probs": (num_classes,),
+                       "vehicle_storage_class_probs": (capacity, num_classes),
+                       "doable_actions": (num_actions,)}
+        self.slices = {}
+        offset = 0
+        for key, shape in self.shapes.items():
+            size = int(np.prod(shape))
+            self.slices[key] = slice(offset, offset + size)
+            offset += size
+        self.size = offset
+
+        # size of the features the policy actually uses (vehicle storage summed over its rows)
+        self.feature_size = num_variables + num_classes + num_classes + num_actions
+
+    def new(self):
+        """
+        returns a zeroed observation vector
+        """
+        return np.zeros(self.size, dtype=np.float32)
+
+    def views(self, observation):
+        """
+        returns a dict of writable views into an observation vector, with the shapes of the old observation dict
+        """
+        return {key: observation[..., sl].reshape(observation.shape[:-1] + self.shapes[key])
+                for key, sl in self.slices.items()}
+
+    def reset(self, observation):
+        """
+        zeroes an observation vector in place, with every action marked doable
+        """
+        observation.fill(0)
+        observation[..., self.slices["doable_actions"]] = 1
+
+    def pack(self, observation_dict):
+        """
+        builds observation vector(s) from an observation dict (single, or stacked along a leading axis)
+        """
+        return np.concatenate([np.asarray(observation_dict[key], dtype=np.float32).reshape(
+                                   np.shape(observation_dict["variables"])[:-1] + (-1,))
+                               for key in self.shapes], axis=-1)
+
+
+# layout of the default game (capacity 10, 4 classes, 4 actions)
+OBS_LAYOUT = ObservationLayout()
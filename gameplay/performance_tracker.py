@@ -1,4 +1,3 @@
-import pandas as pd
 import os
 import json
 from datetime import datetime
@@ -9,7 +8,11 @@ class PerformanceTracker:
     Tracks and graphs performance metrics for LLM agents
     """
     
-    def __init__(self, save_dir="performance_logs"):
+    def __init__(self, save_dir="performance_logs", load_history=True):
+        """
+        save_dir : folder performance_history.json is kept in
+        load_history : load earlier runs (workers that only record single runs skip this)
+        """
         self.save_dir = save_dir
         self.performance_data = []
         self.current_run_data = []
@@ -19,7 +22,8 @@ class PerformanceTracker:
         os.makedirs(save_dir, exist_ok=True)
         
         # Load existing data
-        self.load_existing_data()
+        if load_history:
+            self.load_existing_data()
     
     def load_existing_data(self):
         """Load existing performance data from files"""
@@ -43,8 +47,8 @@ class PerformanceTracker:
         self.current_role = role
         print(f"🎮 Starting new performance tracking for mode: {mode} (role: {role})")
     
-    def log_decision(self, humanoid, action, scorekeeper, llm_calls=None, total_decisions=None):
-        """Log a single decision"""
+    def log_decision(self, humanoid, action, scorekeeper, llm_calls=None, total_decisions=None, timing=None):
+        """Log a single decision (timing: the LLM's latency for it, see LLMInterface.last_timing)"""
         decision_data = {
             "timestamp": datetime.now().isoformat(),
             "humanoid_state": humanoid.state,
@@ -56,15 +60,17 @@ class PerformanceTracker:
             "killed_count": scorekeeper.scorekeeper["killed"],
             "total_decisions": total_decisions
         }
+        if timing is not None:
+            decision_data["llm_timing"] = timing
         self.current_run_data.append(decision_data)
         action_name = getattr(action, 'name', str(action)).upper()
         if action_name in self.action_counts:
             self.action_counts[action_name] += 1
     
-    def end_run(self, final_scorekeeper, stats=None):
-        """End the current run and save data"""
+    def end_run(self, final_scorekeeper, stats=None, save=True):
+        """End the current run and save data (save=False only keeps it in memory). Returns the run summary"""
         if not self.current_run_data:
-            return
+            return None
         
         # Calculate final metrics
         final_reward = final_scorekeeper.get_cumulative_reward()
@@ -86,14 +92,46 @@ class PerformanceTracker:
             "action_frequencies": dict(self.action_counts),
             "role": getattr(self, 'current_role', '')
         }
+        latency = self.latency_summary(self.current_run_data)
+        if latency is not None:
+            run_summary["llm_latency"] = latency
         
         # Add to performance data
         self.performance_data.append(run_summary)
         
         # Save to file
-        self.save_data()
+        if save:
+            self.save_data()
         
         print(f"📈 Run completed: Reward={final_reward}, Saved={final_saved}, Killed={final_killed}")
+        if latency is not None:
+            print(f"⏱️  LLM latency: time-to-decision p50 {latency['decision_ms_p50']:.0f}ms p95 {latency['decision_ms_p95']:.0f}ms | "
+                  f"full generation p50 {latency['generation_ms_p50']:.0f}ms p95 {latency['generation_ms_p95']:.0f}ms | "
+                  f"{latency['stopped_early']} stopped early, {latency['cached']} cached")
+        return run_summary
+
+    @staticmethod
+    def latency_summary(decisions):
+        """Percentiles of the LLM time-to-decision and full-generation time over a run's decisions"""
+        timings = [d["llm_timing"] for d in decisions if d.get("llm_timing")]
+        if not timings:
+            return None
+        decision_ms = [1000 * t["decision_s"] for t in timings]
+        generation_ms = [1000 * t["generation_s"] for t in timings]
+        return {
+            "decision_ms_p50": float(np.percentile(decision_ms, 50)),
+            "decision_ms_p95": float(np.percentile(decision_ms, 95)),
+            "generation_ms_p50": float(np.percentile(generation_ms, 50)),
+            "generation_ms_p95": float(np.percentile(generation_ms, 95)),
+            "stopped_early": sum(t["stopped_early"] for t in timings),
+            "cached": sum(t["cached"] for t in timings),
+        }
+
+    def add_run(self, run_summary):
+        """Add a run recorded by another tracker (e.g. in a worker process); call save_data to write"""
+        run_summary = dict(run_summary, run_id=len(self.performance_data) + 1)
+        self.performance_data.append(run_summary)
+        return run_summary
     
     def save_data(self):
         """Save performance data to file"""
@@ -124,6 +162,7 @@ class PerformanceTracker:
         if not self.performance_data:
             return
         
+        import pandas as pd
         summary_data = []
         for run in self.performance_data:
             summary_data.append({
@@ -0,0 +1,69 @@
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class PhaseTimer(object):
+    """
+    Accumulates wall-clock time and call counts per named phase (env step, policy forward, ...).
+    A phase timed inside another one is recorded under the outer phase's name, e.g. "env_reset/image_load"
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+        self.active = []
+
+    @contextmanager
+    def time(self, phase):
+        if self.active:
+            phase = self.active[-1] + '/' + phase
+        self.active.append(phase)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active.pop()
+            self.add(phase, time.perf_counter() - start)
+
+    def add(self, phase, seconds, count=1):
+        self.totals[phase] = self.totals.get(phase, 0.0) + seconds
+        self.counts[phase] = self.counts.get(phase, 0) + count
+
+    def merge(self, snapshot, prefix=''):
+        """
+        adds a snapshot from another timer (e.g. one in a worker process)
+        """
+        for phase, (seconds, count) in snapshot.items():
+            self.add(prefix + phase, seconds, count)
+
+    def snapshot(self, reset=False):
+        """
+        returns {phase: (seconds, count)}
+        """
+        snapshot = {phase: (self.totals[phase], self.counts[phase]) for phase in self.totals}
+        if reset:
+            self.totals = {}
+            self.counts = {}
+        return snapshot
+
+
+class NullTimer(object):
+    """
+    Stand-in for PhaseTimer when nothing is being measured
+    """
+    _context = nullcontext()
+
+    def time(self, phase):
+        return self._context
+
+    def add(self, phase, seconds, count=1):
+        pass
+
+    def merge(self, snapshot, prefix=''):
+        pass
+
+    def snapshot(self, reset=False):
+        return {}
+
+
+NULL_TIMER = NullTimer()
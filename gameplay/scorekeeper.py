@@ -1,5 +1,4 @@
 from gameplay.enums import ActionCost, ActionState
-import pandas as pd
 
 MAP_ACTION_STR_TO_INT = {s.value:i for i,s in enumerate(ActionState)}
 MAP_ACTION_INT_TO_STR = [s.value for s in ActionState]
@@ -54,6 +53,7 @@ class ScoreKeeper(object):
         Saves a single log.csv file containing the actions that were taken,and the humanoids presented at the time. 
         Note: will overwrite previous logs
         """
+        import pandas as pd
         if len(self.logger) > 0:
             self.all_logs.append(self.logger)
         logs = []
@@ -197,3 +197,133 @@ class ScoreKeeper(object):
     @staticmethod
     def get_all_actions():
         return MAP_ACTION_INT_TO_STR
+
+
+# per-state lookup tables for FastScoreKeeper, indexed by Humanoid.state_idx (zombie, healthy, injured, corpse)
+_AMBULANCE_SLOT = [0, 2, 1, 2]        # ambulance slot a saved humanoid occupies (zombie, injured, healthy)
+_SQUISH_KILLS = [0, 1, 1, 0]          # squishing anything but a zombie or corpse is a kill
+_SKIP_KILLS = [0, 0, 1, 0]            # skipping an injured humanoid is a kill
+
+_SAVE_COST = ActionCost.SAVE.value
+_SQUISH_COST = ActionCost.SQUISH.value
+_SKIP_COST = ActionCost.SKIP.value
+_SCRAM_COST = ActionCost.SCRAM.value
+
+# action masks (save, squish, skip, scram) indexed by [time remaining][at capacity]
+# as in ScoreKeeper.available_action_space, SAVE is left available at capacity; map_do_action rejects it
+_ACTION_MASKS = (((False, False, False, True), (False, False, False, True)),
+                 ((True, True, True, True), (True, True, True, True)))
+
+
+class FastScoreKeeper(ScoreKeeper):
+    """
+    Drop-in ScoreKeeper for RL training: counters are plain ints in a small list, action masks are precomputed
+    and per-action logging can be turned off. ambulance and scorekeeper are still available as (read-only) dicts.
+    """
+    def __init__(self, shift_len, capacity, log=True):
+        """
+        shift_len : minutes in a shift
+        capacity : ambulance capacity
+        log : keep a per-action log like ScoreKeeper (turn off in training loops)
+        """
+        self.log_actions = log
+        super(FastScoreKeeper, self).__init__(shift_len, capacity)
+
+    def reset(self):
+        """
+        resets scorekeeper on new environment
+        """
+        self._ambulance = [0, 0, 0]   # zombie, injured, healthy
+        self._occupancy = 0
+        self.killed = 0
+        self.saved = 0
+        self.remaining_time = self.shift_len
+
+        if self.log_actions:
+            self.all_logs.append(self.logger)
+            self.logger = []
+
+    @property
+    def ambulance(self):
+        return {"zombie": self._ambulance[0], "injured": self._ambulance[1], "healthy": self._ambulance[2]}
+
+    @property
+    def scorekeeper(self):
+        return {"killed": self.killed, "saved": self.saved}
+
+    def log(self, humanoid, action):
+        if self.log_actions:
+            super(FastScoreKeeper, self).log(humanoid, action)
+
+    def save(self, humanoid):
+        if self.log_actions:
+            self.log(humanoid, 'save')
+        self.remaining_time -= _SAVE_COST
+        self._ambulance[_AMBULANCE_SLOT[humanoid.state_idx]] += 1
+        self._occupancy += 1
+
+    def squish(self, humanoid):
+        if self.log_actions:
+            self.log(humanoid, 'squish')
+        self.remaining_time -= _SQUISH_COST
+        self.killed += _SQUISH_KILLS[humanoid.state_idx]
+
+    def skip(self, humanoid):
+        if self.log_actions:
+            self.log(humanoid, 'skip')
+        self.remaining_time -= _SKIP_COST
+        self.killed += _SKIP_KILLS[humanoid.state_idx]
+
+    def scram(self, humanoid = None):
+        if humanoid and self.log_actions:
+            self.log(humanoid, 'scram')
+        self.remaining_time -= _SCRAM_COST
+        ambulance = self._ambulance
+        if ambulance[0] > 0:
+            self.killed += ambulance[1] + ambulance[2]
+        else:
+            self.saved += ambulance[1] + ambulance[2]
+        ambulance[0] = ambulance[1] = ambulance[2] = 0
+        self._occupancy = 0
+
+    def available_action_space(self):
+        """
+        returns available action space as a (shared, immutable) tuple of bools
+        """
+        return _ACTION_MASKS[self.remaining_time > 0][self._occupancy >= self.capacity]
+
+    def map_do_action(self, idx, humanoid):
+        """
+        does an action on a humanoid. Intended for RL use.
+
+        idx : the action index
+        """
+        if idx == 3:
+            self.scram(humanoid)
+            return True
+        if idx > 3 or idx < 0:
+            raise ValueError("action index range exceeded")
+        if self.remaining_time <= 0:
+            return False
+        if idx == 0:
+            if self._occupancy >= self.capacity:
+                return False
+            self.save(humanoid)
+        elif idx == 1:
+            self.squish(humanoid)
+        else:
+            self.skip(humanoid)
+        return True
+
+    def get_cumulative_reward(self):
+        return self.saved - self.killed
+
+    def get_current_capacity(self):
+        return self._occupancy
+
+    def at_capacity(self):
+        return self._occupancy >= self.capacity
+
+    def get_final_score(self):
+        self.scram()
+        return self.scorekeeper
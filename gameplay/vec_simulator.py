@@ -0,0 +1,201 @@
+import argparse
+import numpy as np
+
+from gameplay.enums import ActionCost
+
+# per-state lookup tables, indexed by Humanoid state code (zombie, healthy, injured, corpse)
+AMBULANCE_SLOT = np.array([0, 2, 1, 2])        # ambulance slot a saved humanoid occupies (zombie, injured, healthy)
+SQUISH_KILLS = np.array([0, 1, 1, 0])          # squishing anything but a zombie or corpse is a kill
+SKIP_KILLS = np.array([0, 0, 1, 0])            # skipping an injured humanoid is a kill
+
+SAVE, SQUISH, SKIP, SCRAM = range(4)           # action indices, as in ScoreKeeper.map_do_action
+
+
+class VecGameSimulator(object):
+    """
+    Runs many independent episodes of the ScoreKeeper game in lockstep as NumPy arrays
+    """
+
+    def __init__(self, states, num_episodes, shift_len=720, capacity=10, seed=None, auto_reset=False,
+                 invalid_action_penalty=0.5):
+        """
+        states : state code of every humanoid in the dataset (e.g. DataParser.states)
+        num_episodes : number of episodes B simulated at once
+        shift_len : minutes in a shift
+        capacity : ambulance capacity
+        seed : optional seed for the humanoid draws
+        auto_reset : start a new episode in place as soon as one finishes
+        invalid_action_penalty : reward subtracted for an action that could not be executed (as in TrainInterface)
+        """
+        self.states = np.asarray(states, dtype=np.int8)
+        self.num_episodes = num_episodes
+        self.shift_len = int(shift_len)
+        self.capacity = capacity
+        self.auto_reset = auto_reset
+        self.invalid_action_penalty = invalid_action_penalty
+        self.rng = np.random.default_rng(seed)
+
+        B = num_episodes
+        self.remaining_time = np.zeros(B, dtype=np.int64)
+        self.ambulance = np.zeros((B, 3), dtype=np.int64)     # zombie, injured, healthy
+        self.killed = np.zeros(B, dtype=np.int64)
+        self.saved = np.zeros(B, dtype=np.int64)
+        self.order = np.zeros((B, len(self.states)), dtype=np.int32 if len(self.states) > 32767 else np.int16)
+        self.cursor = np.zeros(B, dtype=np.int64)
+        self._arange = np.arange(B)
+        self.reset()
+
+    def reset(self, mask=None):
+        """
+        starts new episodes (all of them, or those where mask is True).
+        returns the observation
+        """
+        if mask is None:
+            mask = np.ones(self.num_episodes, dtype=bool)
+        n = int(mask.sum())
+        if n > 0:
+            self.remaining_time[mask] = self.shift_len
+            self.ambulance[mask] = 0
+            self.killed[mask] = 0
+            self.saved[mask] = 0
+            self.cursor[mask] = 0
+            # each episode draws humanoids without replacement in its own random order
+            self.order[mask] = self.rng.permuted(np.broadcast_to(np.arange(len(self.states), dtype=self.order.dtype),
+                                                                 (n, len(self.states))), axis=1)
+        return self.observation()
+
+    @property
+    def current_index(self):
+        """
+        metadata index of the humanoid currently presented in each episode
+        """
+        return self.order[self._arange, np.minimum(self.cursor, len(self.states) - 1)].astype(np.int64)
+
+    @property
+    def current_state(self):
+        """
+        state code of the humanoid currently presented in each episode
+        """
+        return self.states[self.current_index]
+
+    def occupancy(self):
+        return self.ambulance.sum(1)
+
+    def cumulative_reward(self):
+        return self.saved - self.killed
+
+    def action_mask(self):
+        """
+        (B, 4) bool mask of doable actions, matching ScoreKeeper.available_action_space
+        """
+        mask = np.ones((self.num_episodes, 4), dtype=bool)
+        mask[:, :SCRAM] = (self.remaining_time > 0)[:, None]
+        return mask
+
+    def dones(self):
+        return (self.remaining_time <= 0) | (self.cursor >= len(self.states))
+
+    def observation(self):
+        return {
+            "state": self.current_state,
+            "index": self.current_index,
+            "remaining_time": self.remaining_time.copy(),
+            "occupancy": self.occupancy(),
+            "cumulative_reward": self.cumulative_reward(),
+            "doable_actions": self.action_mask(),
+        }
+
+    def step(self, actions):
+        """
+        applies one action per episode.
+        returns observation, rewards, dones, and whether each action was executed
+
+        actions : (B,) array of action indices
+        """
+        actions = np.asarray(actions)
+        if actions.shape != (self.num_episodes,):
+            raise ValueError("expected one action per episode")
+        if np.any((actions < 0) | (actions > SCRAM)):
+            raise ValueError("action index range exceeded")
+
+        state = self.current_state
+        occupancy = self.occupancy()
+        has_time = self.remaining_time > 0
+        previous_reward = self.cumulative_reward()
+
+        do_save = (actions == SAVE) & has_time & (occupancy < self.capacity)
+        do_squish = (actions == SQUISH) & has_time
+        do_skip = (actions == SKIP) & has_time
+        do_scram = actions == SCRAM
+        executed = do_save | do_squish | do_skip | do_scram
+
+        # save: humanoid goes into its ambulance slot
+        idx = np.flatnonzero(do_save)
+        self.ambulance[idx, AMBULANCE_SLOT[state[idx]]] += 1
+        self.remaining_time[idx] -= ActionCost.SAVE.value
+
+        # squish / skip: kill accounting
+        self.killed += np.where(do_squish, SQUISH_KILLS[state], 0) + np.where(do_skip, SKIP_KILLS[state], 0)
+        self.remaining_time[do_squish] -= ActionCost.SQUISH.value
+        self.remaining_time[do_skip] -= ActionCost.SKIP.value
+
+        # scram: a zombie in the ambulance kills everyone else in it, otherwise they are saved
+        passengers = self.ambulance[:, 1] + self.ambulance[:, 2]
+        contaminated = self.ambulance[:, 0] > 0
+        self.killed += np.where(do_scram & contaminated, passengers, 0)
+        self.saved += np.where(do_scram & ~contaminated, passengers, 0)
+        self.ambulance[do_scram] = 0
+        self.remaining_time[do_scram] -= ActionCost.SCRAM.value
+
+        # executed actions move on to the next humanoid
+        self.cursor += executed
+
+        rewards = np.where(executed, self.cumulative_reward() - previous_reward,
+                           -self.invalid_action_penalty).astype(np.float32)
+        dones = self.dones()
+        if self.auto_reset and dones.any():
+            self.reset(dones)
+        return self.observation(), rewards, dones, executed
+
+    def evaluate(self, policy, max_steps=10000):
+        """
+        plays every episode to the end with a policy and returns the final cumulative rewards
+
+        policy : function mapping an observation dict to a (B,) array of action indices
+        """
+        # finished episodes must keep their final score until every episode is done
+        auto_reset, self.auto_reset = self.auto_reset, False
+        obs = self.reset()
+        finished = np.zeros(self.num_episodes, dtype=bool)
+        final_reward = np.zeros(self.num_episodes, dtype=np.int64)
+        try:
+            for _ in range(max_steps):
+                obs, _, dones, _ = self.step(policy(obs))
+                newly_done = dones & ~finished
+                final_reward[newly_done] = obs["cumulative_reward"][newly_done]
+                finished |= dones
+                if finished.all():
+                    break
+        finally:
+            self.auto_reset = auto_reset
+        return final_reward
+
+
+if __name__ == "__main__":
+    import time
+    from endpoints.data_parser import DataParser
+
+    parser = argparse.ArgumentParser(
+        prog='python3 -m gameplay.vec_simulator',
+        description='Time a random policy on VecGameSimulator')
+    parser.add_argument('-d', '--data_fp', type=str, default='data')
+    parser.add_argument('-b', '--num_episodes', type=int, default=100000)
+    args = parser.parse_args()
+
+    states = DataParser(args.data_fp).states
+    sim = VecGameSimulator(states, args.num_episodes, seed=0)
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    rewards = sim.evaluate(lambda obs: rng.integers(0, 4, sim.num_episodes))
+    print("random policy over {} episodes: mean reward {:.2f} (std {:.2f}) in {:.2f}s".format(
+        args.num_episodes, rewards.mean(), rewards.std(), time.perf_counter() - start))
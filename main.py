@@ -1,15 +1,9 @@
 import argparse
 import os
 from endpoints.data_parser import DataParser
-from endpoints.heuristic_interface import HeuristicInterface
-from endpoints.training_interface import TrainInterface
-from endpoints.inference_interface import InferInterface
-from endpoints.llm_interface import LLMInterface
-from gameplay.scorekeeper import ScoreKeeper
-from gameplay.ui import UI
+from gameplay.scorekeeper import ScoreKeeper, FastScoreKeeper
 from gameplay.enums import ActionCost
-from model_training.rl_training import train
-from gameplay.performance_tracker import PerformanceTracker
+# each mode imports its own dependencies (torch, gym, requests, tkinter, ...) when it is selected
 
 def action_cost_to_string(action_cost):
     """Convert ActionCost enum to string representation"""
@@ -26,14 +20,21 @@ class Main(object):
     """
     Base class for the SGAI 2023 game
     """
-    def __init__(self, mode, log, role):
+    def __init__(self, mode, log, role, num_envs=1, prob_cache=False, num_workers=0, config=None, resume=None,
+                 llm_cache=False, temperature0=False, stream=False):
         self.data_fp = os.path.join(os.path.dirname(__file__), 'data')
         self.data_parser = DataParser(self.data_fp)
         shift_length = 720
         capacity = 10
         self.scorekeeper = ScoreKeeper(shift_length, capacity)
+        # look up precomputed classifier probabilities instead of running the CNN on every humanoid
+        self.prob_cache = None
+        if prob_cache and mode in ('train', 'infer'):
+            from endpoints.prob_cache import ProbabilityCache
+            self.prob_cache = ProbabilityCache(self.data_fp)
 
         if mode == 'heuristic':   # Run in background until all humanoids are processed
+            from endpoints.heuristic_interface import HeuristicInterface
             simon = HeuristicInterface(None, None, None, display = False)
             while len(self.data_parser.unvisited) > 0:
                 if self.scorekeeper.remaining_time <= 0:
@@ -57,10 +58,25 @@ class Main(object):
             print("RL equiv reward:",self.scorekeeper.get_cumulative_reward())
             print(self.scorekeeper.get_score())
         elif mode == 'train':  # RL training script
-            env = TrainInterface(None, None, None, self.data_parser, self.scorekeeper, display=False,)
-            train(env)
+            from model_training.rl_training import train
+            # per-action logs are never saved in training, so use the allocation-free scorekeeper without them
+            self.scorekeeper = FastScoreKeeper(shift_length, capacity, log=False)
+            if num_workers > 0:
+                from model_training.parallel_rollouts import RolloutWorkers
+                # worker processes each run their own environment
+                env = RolloutWorkers(num_workers, self.data_fp, shift_length, capacity, prob_cache=prob_cache)
+            elif num_envs > 1:
+                from endpoints.training_interface import VecTrainInterface
+                data_parsers = [self.data_parser] + [DataParser(self.data_fp) for _ in range(num_envs - 1)]
+                scorekeepers = [self.scorekeeper] + [FastScoreKeeper(shift_length, capacity, log=False) for _ in range(num_envs - 1)]
+                env = VecTrainInterface(data_parsers, scorekeepers, prob_cache=self.prob_cache)
+            else:
+                from endpoints.training_interface import TrainInterface
+                env = TrainInterface(None, None, None, self.data_parser, self.scorekeeper, display=False, prob_cache=self.prob_cache)
+            train(env, config, resume)
         elif mode == 'infer':  # RL training script
-            simon = InferInterface(None, None, None, self.data_parser, self.scorekeeper, display=False,)
+            from endpoints.inference_interface import InferInterface
+            simon = InferInterface(None, None, None, self.data_parser, self.scorekeeper, display=False, prob_cache=self.prob_cache)
             while len(simon.data_parser.unvisited) > 0:
                 if simon.scorekeeper.remaining_time <= 0:
                     break
@@ -73,11 +89,16 @@ class Main(object):
             print("RL equiv reward:",self.scorekeeper.get_cumulative_reward())
             print(self.scorekeeper.get_score())
         elif mode == 'llm':  # LLM agent (multimodal LLaVA by default)
+            from endpoints.llm_interface import LLMInterface
+            from endpoints.response_cache import ResponseCache, default_cache_path
+            from gameplay.performance_tracker import PerformanceTracker
             print("Starting LLM agent (LLaVA multimodal)...")
             
             # Initialize performance tracker (will load existing data)
             tracker = PerformanceTracker()
-            llm_agent = LLMInterface(self.data_parser, self.scorekeeper, self.data_fp, use_images=args.images, role=role)
+            response_cache = ResponseCache(default_cache_path(self.data_fp)) if llm_cache else None
+            llm_agent = LLMInterface(self.data_parser, self.scorekeeper, self.data_fp, use_images=args.images, role=role,
+                                     response_cache=response_cache, temperature0=temperature0, stream=stream)
             tracker.start_new_run(mode, images=args.images, role=role)
             
             while len(self.data_parser.unvisited) > 0:
@@ -89,7 +110,7 @@ class Main(object):
                     humanoid = self.data_parser.get_random()
                     action = llm_agent.get_model_suggestion(humanoid, self.scorekeeper.at_capacity(), identify=False)
                     # Log the decision
-                    tracker.log_decision(humanoid, action, self.scorekeeper)
+                    tracker.log_decision(humanoid, action, self.scorekeeper, timing=llm_agent.last_timing)
                     
                     if action == ActionCost.SKIP:
                         self.scorekeeper.skip(humanoid)
@@ -113,9 +134,12 @@ class Main(object):
             
             # Print performance summary
             tracker.print_summary()
+            if response_cache is not None:
+                print(f"LLM response cache: {response_cache.hits} hits, {response_cache.misses} misses, {len(response_cache)} stored")
             print("\nTo evaluate LLM image classification accuracy, run: python3 Enhanced/test_llm_identification.py --data_dir <dir> --metadata <csv>")
         
         else: # Launch UI gameplay
+            from gameplay.ui import UI
             self.ui = UI(self.data_parser, self.scorekeeper, self.data_fp, log = log, suggest = False)
 
 
@@ -130,6 +154,15 @@ if __name__ == "__main__":
     parser.add_argument('-r', '--role', type=str, default='default', help='Optional role/label for this run (for graphing, e.g., "doctor")')
     parser.add_argument('--images', action='store_true', default=True, help='Use images (multimodal) for LLM agent (default: True)')
     parser.add_argument('--no_images', action='store_false', dest='images', help='Disable images (multimodal) for LLM agent')
+    parser.add_argument('--llm_cache', action='store_true', default=False, help='Reuse LLM replies to identical requests from an on-disk cache (data/llm_responses.cache.sqlite)')
+    parser.add_argument('--temperature0', action='store_true', default=False, help='Ask the LLM for deterministic (temperature 0, fixed seed) replies')
+    parser.add_argument('--stream', action='store_true', default=False, help='Stream LLM replies and stop as soon as the action word is complete')
+    parser.add_argument('-n', '--num_envs', type=int, default=1, help='Number of parallel environments to collect rollouts from in train mode')
+    parser.add_argument('--prob_cache', action='store_true', default=False, help='Look up precomputed classifier probabilities in train/infer mode instead of running the CNN')
+    parser.add_argument('-w', '--num_workers', type=int, default=0, help='Number of worker processes to collect rollouts with in train mode (0 = collect in this process)')
+    parser.add_argument('-c', '--config', type=str, default=None, help='Training config json file (see model_training.rl_training.TrainConfig)')
+    parser.add_argument('--resume', type=str, default=None, help='Resume training from a checkpoint file, or the latest checkpoint in a directory')
     args = parser.parse_args()
-    Main(args.mode, args.log, args.role)
+    Main(args.mode, args.log, args.role, args.num_envs, args.prob_cache, args.num_workers, args.config, args.resume,
+         args.llm_cache, args.temperature0, args.stream)
  
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+Compares classifier architectures on the held-out test set
+Reports single-image latency, batched throughput, peak RSS and accuracy for each architecture.
+Each architecture is measured in a fresh process so peak RSS is not shared between them.
+
+Usage: python3 model_training/benchmark_classifiers.py --weights default=models/baseline.pth slim=models/slim.pth
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import multiprocessing
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def benchmark_arch(arch, weights_path, data_dir, metadata_fn, num_latency=50, batch_size=32):
+    """
+    measures one classifier architecture. meant to run in its own process
+    """
+    import torch
+    from PIL import Image
+    from endpoints.heuristic_interface import Predictor
+    from endpoints.data_parser import datarow_to_state
+    from gameplay.humanoid import Humanoid
+
+    torch.set_num_threads(max(1, os.cpu_count() or 1))
+    df = pd.read_csv(os.path.join(data_dir, metadata_fn))
+    paths = [os.path.join(data_dir, fn) for fn in df['Filename']]
+    labels = np.array([Humanoid.get_state_idx(datarow_to_state(row)) for _, row in df.iterrows()])
+
+    predictor = Predictor(model_file=weights_path, arch=arch)
+    if predictor.net is not None:
+        num_params = sum(p.numel() for p in predictor.net.parameters())
+    else:
+        num_params = 0
+
+    # single image latency (decode excluded, this is the per-step cost inside the environments)
+    images = [Image.open(p).convert('RGB') for p in paths[:num_latency]]
+    predictor.get_probs(images[0])  # warm up
+    latencies = []
+    for img_ in images:
+        start = time.perf_counter()
+        predictor.get_probs(img_)
+        latencies.append(time.perf_counter() - start)
+
+    # batched pass over the whole test set (decode included)
+    start = time.perf_counter()
+    probs = predictor.get_probs_batch(paths, batch_size=batch_size)
+    batch_time = time.perf_counter() - start
+
+    return {
+        "arch": arch,
+        "weights_loaded": predictor.is_model_loaded,
+        "params": num_params,
+        "latency_ms_p50": 1000 * float(np.percentile(latencies, 50)),
+        "latency_ms_p95": 1000 * float(np.percentile(latencies, 95)),
+        "batch_images_per_s": len(paths) / batch_time,
+        "peak_rss_mb": _peak_rss_mb(),
+        "accuracy": float(np.mean(np.argmax(probs, 1) == labels)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog='python3 model_training/benchmark_classifiers.py',
+        description='Compare latency, peak RSS and accuracy of classifier architectures')
+    parser.add_argument('--data_dir', type=str, default=os.path.join('model_training', 'data'))
+    parser.add_argument('--metadata', type=str, default='test_metadata.csv')
+    parser.add_argument('--weights', type=str, nargs='+', default=['default=' + os.path.join('models', 'baseline.pth')],
+                        help='arch=weights_path pairs, e.g. default=models/baseline.pth slim=models/slim.pth')
+    parser.add_argument('--batch_size', type=int, default=32)
+    args = parser.parse_args()
+
+    results = []
+    for pair in args.weights:
+        arch, weights_path = pair.split('=', 1)
+        # fresh process per architecture so peak RSS is measured independently
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results.append(pool.submit(benchmark_arch, arch, weights_path, args.data_dir,
+                                       args.metadata, batch_size=args.batch_size).result())
+
+    print(pd.DataFrame(results).to_string(index=False, float_format=lambda v: "{:.3f}".format(v)))
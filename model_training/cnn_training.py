@@ -0,0 +1,192 @@
+"""
+Trains the humanoid classifier used by Predictor
+Script version of cnn_training.ipynb: streams batches through a multi-worker DataLoader from images that are
+decoded once up front, reports per-epoch throughput and latency, and keeps the weights with the best validation loss.
+
+Usage: python3 model_training/cnn_training.py --arch default --output models/baseline.pth
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import torch
+from PIL import Image
+
+from endpoints.data_parser import datarow_to_state
+from gameplay.humanoid import Humanoid
+from models import CLASSIFIERS
+
+# same normalization as Predictor.transforms
+MEAN = torch.tensor([0.485, 0.456, 0.406]).view(3, 1, 1)
+STD = torch.tensor([0.229, 0.224, 0.225]).view(3, 1, 1)
+
+
+class Dataset(torch.utils.data.Dataset):
+    def __init__(self, df, base_dir, input_size=512, cache_images=True, num_decode_workers=8):
+        """
+        humanoid images and class indices from a metadata dataframe
+
+        df : metadata dataframe (Filename, Class, Injured, ...)
+        base_dir : folder the Filename column is relative to
+        input_size : images are resized to input_size x input_size (as Predictor does for the chosen arch)
+        cache_images : decode every image once into memory as uint8 instead of on every access
+        """
+        self.paths = [os.path.join(base_dir, fn) for fn in df['Filename']]
+        self.targets = np.array([Humanoid.get_state_idx(datarow_to_state(row)) for _, row in df.iterrows()])
+        self.input_size = input_size
+        self.images = None
+        if cache_images:
+            with ThreadPoolExecutor(max_workers=num_decode_workers) as pool:
+                self.images = list(pool.map(self._decode, self.paths))
+
+    def _decode(self, path):
+        with Image.open(path) as img_:
+            img_ = img_.convert('RGB')
+            if img_.size != (self.input_size, self.input_size):
+                img_ = img_.resize((self.input_size, self.input_size), Image.BILINEAR)
+            return torch.from_numpy(np.asarray(img_, dtype=np.uint8).copy()).permute(2, 0, 1)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, i):
+        image = self.images[i] if self.images is not None else self._decode(self.paths[i])
+        image = (image.float() / 255 - MEAN) / STD
+        return image, torch.tensor(self.targets[i]).long()
+
+
+def evaluate(model, loader_val, criterion, device):
+    """
+    returns mean validation loss and accuracy
+    """
+    was_training = model.training
+    model.eval()
+    loss_sum = 0.0
+    correct = 0
+    n_sum = 0
+    with torch.inference_mode():
+        for img, y in loader_val:
+            img = img.to(device, non_blocking=True)
+            y = y.to(device, non_blocking=True)
+            y_pred = model(img)
+            loss_sum += y.size(0) * criterion(y_pred, y).item()
+            correct += (y_pred.argmax(1) == y).sum().item()
+            n_sum += y.size(0)
+    model.train(was_training)
+    return loss_sum / n_sum, correct / n_sum
+
+
+def train(arch='default', data_dir=os.path.join('model_training', 'data'), train_metadata='train_metadata.csv',
+          val_metadata='test_metadata.csv', output=None, epochs=5, batch_size=16, learning_rate=2e-4,
+          weight_decay=1e-8, max_grad_norm=100, epochs_warmup=1, num_workers=4, cache_images=True):
+    """
+    trains a classifier architecture from models.CLASSIFIERS and saves the state dict with the best validation
+    loss, in the format Predictor._load_model expects
+    """
+    if output is None:
+        output = os.path.join('models', 'baseline.pth' if arch == 'default' else arch + '.pth')
+    device = torch.device('cuda:0') if torch.cuda.is_available() else torch.device('cpu')
+    input_size = CLASSIFIERS[arch].input_size
+
+    start = time.perf_counter()
+    train_ds = Dataset(pd.read_csv(os.path.join(data_dir, train_metadata)), data_dir, input_size, cache_images)
+    val_ds = Dataset(pd.read_csv(os.path.join(data_dir, val_metadata)), data_dir, input_size, cache_images)
+    print("loaded {} train / {} val images in {:.1f}s".format(len(train_ds), len(val_ds), time.perf_counter() - start))
+
+    pin_memory = device.type == 'cuda'
+    loader_train = torch.utils.data.DataLoader(train_ds, batch_size=batch_size, shuffle=True, drop_last=True,
+                                               num_workers=num_workers, pin_memory=pin_memory,
+                                               persistent_workers=num_workers > 0)
+    loader_val = torch.utils.data.DataLoader(val_ds, batch_size=batch_size, num_workers=num_workers,
+                                             pin_memory=pin_memory, persistent_workers=num_workers > 0)
+
+    # use class weights since this is imbalanced classification
+    counts = np.bincount(train_ds.targets, minlength=len(Humanoid.get_all_states())).astype(np.float64)
+    class_weights = len(train_ds.targets) / (len(counts) * np.maximum(counts, 1))
+    criterion = torch.nn.CrossEntropyLoss(weight=torch.tensor(class_weights, dtype=torch.float).to(device))
+
+    model = CLASSIFIERS[arch](len(Humanoid.get_all_states())).to(device)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=learning_rate, weight_decay=weight_decay)
+
+    # linear warmup followed by cosine decay, stepped every batch
+    nbatch = len(loader_train)
+    warmup = epochs_warmup * nbatch
+    nsteps = epochs * nbatch
+    min_lr = 1e-6 / learning_rate
+
+    def lr_lambda(step):
+        if step < warmup:
+            return min_lr + (1 - min_lr) * step / max(1, warmup)
+        progress = (step - warmup) / max(1, nsteps - warmup)
+        return min_lr + (1 - min_lr) * 0.5 * (1 + math.cos(math.pi * progress))
+    scheduler = torch.optim.lr_scheduler.LambdaLR(optimizer, lr_lambda)
+
+    best_loss = float('inf')
+    for iepoch in range(epochs):
+        model.train()
+        epoch_start = time.perf_counter()
+        wait_time = 0.0
+        step_times = []
+        n_images = 0
+        loss_sum = 0.0
+
+        batch_start = time.perf_counter()
+        for img, y in loader_train:
+            step_start = time.perf_counter()
+            wait_time += step_start - batch_start
+
+            img = img.to(device, non_blocking=True)
+            y = y.to(device, non_blocking=True)
+
+            optimizer.zero_grad()
+            loss = criterion(model(img), y)
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(model.parameters(), max_grad_norm)
+            optimizer.step()
+            scheduler.step()
+
+            loss_sum += loss.item() * y.size(0)
+            n_images += y.size(0)
+            batch_start = time.perf_counter()
+            step_times.append(batch_start - step_start)
+
+        epoch_time = time.perf_counter() - epoch_start
+        val_loss, val_acc = evaluate(model, loader_val, criterion, device)
+        print("epoch {}/{} | train loss {:.4f} | val loss {:.4f} | val acc {:.3f} | {:.1f} img/s | "
+              "step p50 {:.1f}ms p95 {:.1f}ms | data wait {:.1f}s".format(
+                  iepoch + 1, epochs, loss_sum / max(1, n_images), val_loss, val_acc, n_images / epoch_time,
+                  1000 * np.percentile(step_times, 50), 1000 * np.percentile(step_times, 95), wait_time))
+
+        if val_loss < best_loss:
+            best_loss = val_loss
+            torch.save(model.state_dict(), output)
+            print("saved best model to " + output)
+
+    return best_loss
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog='python3 model_training/cnn_training.py',
+        description='Train the humanoid classifier used by Predictor')
+    parser.add_argument('--arch', type=str, default='default', choices=list(CLASSIFIERS))
+    parser.add_argument('--data_dir', type=str, default=os.path.join('model_training', 'data'))
+    parser.add_argument('--train_metadata', type=str, default='train_metadata.csv')
+    parser.add_argument('--val_metadata', type=str, default='test_metadata.csv')
+    parser.add_argument('-o', '--output', type=str, default=None, help='Checkpoint path (default models/baseline.pth for the default arch)')
+    parser.add_argument('-e', '--epochs', type=int, default=5)
+    parser.add_argument('-b', '--batch_size', type=int, default=16)
+    parser.add_argument('--lr', type=float, default=2e-4)
+    parser.add_argument('-w', '--num_workers', type=int, default=4)
+    parser.add_argument('--no_cache', action='store_false', dest='cache_images', help='Decode images on every access instead of once up front')
+    args = parser.parse_args()
+    train(arch=args.arch, data_dir=args.data_dir, train_metadata=args.train_metadata, val_metadata=args.val_metadata,
+          output=args.output, epochs=args.epochs, batch_size=args.batch_size, learning_rate=args.lr,
+          num_workers=args.num_workers, cache_images=args.cache_images)
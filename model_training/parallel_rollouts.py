@@ -0,0 +1,256 @@
+"""
+Parallel rollout collection for rl_training.train
+W worker processes each own a TrainInterface (with its own DataParser and ScoreKeeper) and step it with the
+learner's current policy. The policy and the rollout buffer both live in shared memory: after every PPO update the
+new weights are visible to every worker without being sent anywhere, and workers write their transitions straight
+into their own column of the learner's buffer.
+
+Usage: python3 model_training/parallel_rollouts.py --num_workers 1 2 4 --prob_cache   (env-steps/s per worker count)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+import traceback
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from gameplay.phase_timer import NULL_TIMER, PhaseTimer
+
+
+def _make_env(data_fp, worker_id, seed, shift_len, capacity, prob_cache, classifier_model_file):
+    from endpoints.data_parser import DataParser
+    from endpoints.prob_cache import ProbabilityCache
+    from endpoints.training_interface import TrainInterface
+    from gameplay.scorekeeper import FastScoreKeeper
+
+    data_parser = DataParser(data_fp, seed=None if seed is None else seed + worker_id)
+    scorekeeper = FastScoreKeeper(shift_len, capacity, log=False)
+    cache = ProbabilityCache(data_fp, model_file=classifier_model_file) if prob_cache else None
+    return TrainInterface(None, None, None, data_parser, scorekeeper, classifier_model_file=classifier_model_file,
+                          img_data_root=data_fp, display=False, prob_cache=cache)
+
+
+def _rollout_worker(worker_id, env_kwargs, max_ep_len, policy, buffers, conn):
+    """
+    worker process: waits for commands from RolloutWorkers; "collect" fills column worker_id of the shared buffers.
+    episodes longer than max_ep_len steps are cut off (marked terminal) and the environment is reset
+    """
+    torch.set_num_threads(1)
+    # every spawned process starts from the same torch seed, so give each worker its own action sampling stream
+    seed = env_kwargs['seed']
+    torch.manual_seed(int.from_bytes(os.urandom(4), 'little') if seed is None else seed + worker_id)
+    try:
+        env = _make_env(worker_id=worker_id, **env_kwargs)
+        timer = PhaseTimer()
+        env.timer = timer
+        states, actions, logprobs = buffers['states'], buffers['actions'], buffers['logprobs']
+        state_values, rewards, is_terminals = buffers['state_values'], buffers['rewards'], buffers['is_terminals']
+        (key,) = states.keys()
+        states = states[key]
+        capacity = states.shape[0]
+
+        obs = env.reset()
+        ep_reward = 0
+        ep_len = 0
+        conn.send(('ready', None))
+        while True:
+            command, payload = conn.recv()
+            if command == 'state':
+                conn.send(('done', {'env': env.state_dict(), 'ep_reward': ep_reward, 'ep_len': ep_len,
+                                    'torch_rng': torch.get_rng_state()}))
+                continue
+            if command == 'load':
+                env.load_state_dict(payload['env'])
+                obs = env.observation
+                ep_reward = payload['ep_reward']
+                ep_len = payload.get('ep_len', 0)
+                torch.set_rng_state(payload['torch_rng'])
+                conn.send(('done', None))
+                continue
+            if command != 'collect':
+                break
+            start = time.perf_counter()
+            finished = []
+            for t in range(capacity):
+                states[t, worker_id] = torch.from_numpy(obs)
+                with timer.time('policy_forward'), torch.no_grad():
+                    action, action_logprob, state_val = policy.act(states[t, worker_id:worker_id + 1])
+                actions[t, worker_id] = action[0]
+                logprobs[t, worker_id] = action_logprob[0]
+                state_values[t, worker_id] = state_val.view(-1)[0]
+
+                # TrainInterface starts its next episode by itself when one finishes
+                with timer.time('env_step'):
+                    obs, reward, done, _, _ = env.step(int(action[0]))
+                ep_len += 1
+                if not done and max_ep_len is not None and ep_len >= max_ep_len:
+                    # cut off like the single environment training loop
+                    with timer.time('env_reset'):
+                        obs = env.reset()
+                    done = True
+                rewards[t, worker_id] = reward
+                is_terminals[t, worker_id] = done
+                ep_reward += reward
+                if done:
+                    finished.append(ep_reward)
+                    ep_reward = 0
+                    ep_len = 0
+            conn.send(('done', (finished, time.perf_counter() - start, timer.snapshot(reset=True))))
+    except Exception:
+        conn.send(('error', traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+class RolloutWorkers(object):
+    """
+    Pool of rollout worker processes that fills a PPO agent's rollout buffer in parallel
+    """
+
+    def __init__(self, num_workers, data_fp, shift_len=720, capacity=10, prob_cache=False,
+                 classifier_model_file=os.path.join('models', 'baseline.pth'), seed=None):
+        """
+        num_workers : number of worker processes (each one is a column of the rollout buffer)
+        data_fp : data folder the workers' DataParsers read from
+        prob_cache : workers look up classifier probabilities in the ProbabilityCache instead of running the CNN
+        seed : optional base seed, worker w seeds its DataParser with seed + w
+        """
+        self.num_envs = num_workers
+        self.env_kwargs = dict(data_fp=data_fp, seed=seed, shift_len=shift_len, capacity=capacity,
+                               prob_cache=prob_cache, classifier_model_file=classifier_model_file)
+        self.processes = []
+        self.conns = []
+        self.buffer = None
+        self.steps_per_s = 0.0
+        # the workers' phase timings are merged into this timer (as "worker/<phase>") after every rollout
+        self.timer = NULL_TIMER
+
+    def start(self, ppo_agent, max_ep_len=None):
+        """
+        moves the agent's old policy and rollout buffer into shared memory and starts the workers.
+        the agent must have been built with num_envs=num_workers
+
+        max_ep_len : episodes are cut off after this many steps (default: only when the shift ends)
+        """
+        buffer = ppo_agent.buffer
+        if buffer.num_envs != self.num_envs:
+            raise ValueError("rollout buffer has {} columns, expected one per worker ({})".format(
+                buffer.num_envs, self.num_envs))
+        if buffer.actions.device.type != 'cpu':
+            raise ValueError("parallel rollouts need the rollout buffer on the cpu")
+
+        # PPO.update copies the new weights into policy_old in place, so sharing it once broadcasts every update
+        ppo_agent.policy_old.share_memory()
+        buffers = {'states': buffer.states, 'actions': buffer.actions, 'logprobs': buffer.logprobs,
+                   'state_values': buffer.state_values, 'rewards': buffer.rewards,
+                   'is_terminals': buffer.is_terminals}
+        for tensor in list(buffer.states.values()) + [buffer.actions, buffer.logprobs, buffer.state_values,
+                                                      buffer.rewards, buffer.is_terminals]:
+            tensor.share_memory_()
+        self.buffer = buffer
+
+        ctx = mp.get_context('spawn')
+        for worker_id in range(self.num_envs):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=_rollout_worker, daemon=True,
+                                  args=(worker_id, self.env_kwargs, max_ep_len, ppo_agent.policy_old, buffers,
+                                        child_conn))
+            process.start()
+            child_conn.close()
+            self.processes.append(process)
+            self.conns.append(parent_conn)
+        self._gather()
+
+    def _gather(self):
+        results = []
+        for conn in self.conns:
+            status, payload = conn.recv()
+            if status == 'error':
+                self.close()
+                raise RuntimeError("rollout worker failed:\n" + payload)
+            results.append(payload)
+        return results
+
+    def collect(self):
+        """
+        fills the whole rollout buffer (capacity steps from every worker).
+        returns the rewards of the episodes that finished during the rollout
+        """
+        if self.buffer is None:
+            raise ValueError("call RolloutWorkers.start(ppo_agent) first")
+        start = time.perf_counter()
+        for conn in self.conns:
+            conn.send(('collect', None))
+        results = self._gather()
+        self.buffer.ptr = self.buffer.capacity
+        self.steps_per_s = self.buffer.capacity * self.num_envs / (time.perf_counter() - start)
+        for _, _, snapshot in results:
+            self.timer.merge(snapshot, prefix='worker/')
+        return [reward for finished, _, _ in results for reward in finished]
+
+    def seed(self, seed=None):
+        """
+        sets the base seed of the workers (worker w uses seed + w). only affects workers started afterwards
+        """
+        self.env_kwargs['seed'] = seed
+
+    def state_dict(self):
+        """
+        environment, episode and RNG state of every worker, for training checkpoints
+        """
+        for conn in self.conns:
+            conn.send(('state', None))
+        return {"workers": self._gather()}
+
+    def load_state_dict(self, state):
+        if len(state["workers"]) != self.num_envs:
+            raise ValueError("checkpoint has {} workers, expected {}".format(len(state["workers"]), self.num_envs))
+        for conn, worker_state in zip(self.conns, state["workers"]):
+            conn.send(('load', worker_state))
+        self._gather()
+
+    def close(self):
+        for conn in self.conns:
+            try:
+                conn.send(('close', None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        self.conns = []
+
+
+if __name__ == "__main__":
+    from models.PPO import PPO
+
+    parser = argparse.ArgumentParser(
+        prog='python3 model_training/parallel_rollouts.py',
+        description='Measure rollout throughput (env-steps/s) for different numbers of worker processes')
+    parser.add_argument('-d', '--data_fp', type=str, default='data')
+    parser.add_argument('-w', '--num_workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('-s', '--steps', type=int, default=800, help='Steps per worker per rollout')
+    parser.add_argument('-r', '--rollouts', type=int, default=5)
+    parser.add_argument('--prob_cache', action='store_true', default=False)
+    args = parser.parse_args()
+
+    for num_workers in args.num_workers:
+        agent = PPO(0.0003, 0.001, 0.99, 1, 0.2, False, buffer_size=args.steps, num_envs=num_workers)
+        workers = RolloutWorkers(num_workers, args.data_fp, prob_cache=args.prob_cache, seed=0)
+        workers.start(agent)
+        try:
+            rates = []
+            for _ in range(args.rollouts):
+                workers.collect()
+                rates.append(workers.steps_per_s)
+                agent.buffer.clear()
+        finally:
+            workers.close()
+        print("{} workers: {:.0f} env-steps/s (median of {} rollouts)".format(num_workers, np.median(rates), args.rollouts))
@@ -3,51 +3,202 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 import glob
+import json
+import random
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import torch
 import numpy as np
 
 import gym
 
-from Enhanced.models.PPO import PPO
-
-def train(env):
-    print("============================================================================================")
-
-
-    env_name = "RL-logs"
+from Enhanced.models.PPO import PPO, print_device
+from Enhanced.gameplay.phase_timer import PhaseTimer
+from Enhanced.model_training.training_metrics import MetricsWriter
+
+def _crossed(time_step, step_size, freq):
+    """
+    true if advancing the timestep counter by step_size just passed a multiple of freq
+    """
+    return time_step // freq != (time_step - step_size) // freq
+
+
+def _log_row_step(line):
+    """
+    timestep of a complete episode,timestep,reward,elapsed log row, None for an empty row or one cut off
+    when the run was killed mid-write
+    """
+    fields = line.split(',')
+    if not line.endswith('\n') or len(fields) != 4:
+        return None
+    try:
+        return int(fields[1])
+    except ValueError:
+        return None
+
+
+class TrainConfig(object):
+    """
+    Hyperparameters and run settings for train. The defaults are the original hardcoded values
+    """
+    defaults = {
+        "env_name": "RL-logs",
+        "has_continuous_action_space": False,  # continuous action space; else discrete
+
+        "max_ep_len": 200,                      # max timesteps in one episode
+        "max_training_timesteps": int(1e5),     # break training loop if timeteps > max_training_timesteps
+
+        "print_freq": 200 * 10,                 # print avg reward in the interval (in num timesteps)
+        "log_freq": 200 * 2,                    # log avg reward in the interval (in num timesteps)
+        "save_model_freq": int(1e5),            # save model frequency (in num timesteps)
+        "checkpoint_freq": int(1e4),            # save a full (resumable) checkpoint every n timesteps
+        "keep_checkpoints": 2,                  # number of most recent checkpoints kept on disk
+        "checkpoint_dir": None,                 # default: model_training/<env_name>/checkpoints/run_<run_num>
+
+        "action_std": 0.6,                      # starting std for action distribution (Multivariate Normal)
+        "action_std_decay_rate": 0.05,          # linearly decay action_std (action_std = action_std - action_std_decay_rate)
+        "min_action_std": 0.1,                  # minimum action_std (stop decay after action_std <= min_action_std)
+        "action_std_decay_freq": int(2.5e5),    # action_std decay frequency (in num timesteps)
+
+        "update_timestep": 200 * 4,             # update policy every n timesteps
+        "update_method": "mc",                  # "mc": K_epochs full-batch passes on Monte Carlo returns, "gae": minibatched GAE updates
+        "K_epochs": None,                       # update policy for K epochs in one PPO update (default 80 for mc, 10 for gae)
+        "gae_lambda": 0.95,                     # GAE lambda (gae only)
+        "minibatch_size": 64,                   # minibatch size (gae only)
+        "target_kl": 0.02,                      # stop an update early once approx KL exceeds this (gae only)
+
+        "eps_clip": 0.2,                        # clip parameter for PPO
+        "gamma": 0.99,                          # discount factor
+
+        "lr_actor": 0.0003,                     # learning rate for actor network
+        "lr_critic": 0.001,                     # learning rate for critic network
+
+        "random_seed": 0,                       # set random seed if required (0 = no random seed)
+    }
+
+    def __init__(self, **kwargs):
+        unknown = set(kwargs) - set(self.defaults)
+        if unknown:
+            raise ValueError("unknown training config keys: " + ", ".join(sorted(unknown)))
+        self.__dict__.update(self.defaults)
+        self.__dict__.update(kwargs)
+        if self.K_epochs is None:
+            self.K_epochs = 80 if self.update_method == "mc" else 10
+
+    @classmethod
+    def load(cls, config=None):
+        """
+        builds a config from None (defaults), a dict, a json file path, or another TrainConfig
+        """
+        if config is None:
+            return cls()
+        if isinstance(config, TrainConfig):
+            return config
+        if isinstance(config, str):
+            with open(config) as f:
+                config = json.load(f)
+        return cls(**config)
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.defaults}
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def latest_checkpoint(directory):
+    """
+    returns the most recent checkpoint in a directory, or None
+    """
+    checkpoints = sorted(glob.glob(os.path.join(directory, "checkpoint_*.pt")))
+    return checkpoints[-1] if checkpoints else None
+
+
+def save_checkpoint(directory, ppo_agent, env, progress, config, keep=2):
+    """
+    writes a full training checkpoint (agent, optimizer, buffer, environment, RNG states, counters)
+    and deletes all but the keep most recent ones. returns the checkpoint path
+    """
+    checkpoint = {
+        "config": config.to_dict(),
+        "progress": progress,
+        "agent": ppo_agent.training_state(),
+        "env": env.state_dict(),
+        "rng": {"torch": torch.get_rng_state(),
+                "cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None,
+                "numpy": np.random.get_state(),
+                "python": random.getstate()},
+    }
+    path = os.path.join(directory, "checkpoint_{:010d}.pt".format(progress["time_step"]))
+    # write then rename, so a run pre-empted mid-save still has its previous checkpoint intact
+    torch.save(checkpoint, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    for old in sorted(glob.glob(os.path.join(directory, "checkpoint_*.pt")))[:-keep]:
+        os.remove(old)
+    return path
+
+
+def load_checkpoint(path):
+    """
+    loads a checkpoint file, or the latest checkpoint in a directory
+    """
+    if os.path.isdir(path):
+        directory, path = path, latest_checkpoint(path)
+        if path is None:
+            raise FileNotFoundError("no checkpoints in " + directory)
+    return torch.load(path, map_location=lambda storage, loc: storage, weights_only=False)
+
+
+def train(env, config=None, resume=None):
+    """
+    env : TrainInterface, VecTrainInterface or RolloutWorkers
+    config : TrainConfig, dict or json file path (default: TrainConfig defaults, or the resumed run's config)
+    resume : checkpoint file, or checkpoint directory to resume from its latest checkpoint
+    """
+    print_device()
+
+    checkpoint = load_checkpoint(resume) if resume is not None else None
+    if config is None and checkpoint is not None:
+        config = checkpoint["config"]
+    config = TrainConfig.load(config)
+
+    env_name = config.env_name
     
-    has_continuous_action_space = False  # continuous action space; else discrete
+    has_continuous_action_space = config.has_continuous_action_space
 
-    max_ep_len = 200                   # max timesteps in one episode
-    # max_ep_len = 2                   # max timesteps in one episode
-    max_training_timesteps = int(1e5)   # break training loop if timeteps > max_training_timesteps
+    max_ep_len = config.max_ep_len
+    max_training_timesteps = config.max_training_timesteps
 
-    print_freq = max_ep_len * 10        # print avg reward in the interval (in num timesteps)
-    log_freq = max_ep_len * 2           # log avg reward in the interval (in num timesteps)
-    save_model_freq = int(1e5)          # save model frequency (in num timesteps)
+    print_freq = config.print_freq
+    log_freq = config.log_freq
+    save_model_freq = config.save_model_freq
+    checkpoint_freq = config.checkpoint_freq
 
-    action_std = 0.6                    # starting std for action distribution (Multivariate Normal)
-    action_std_decay_rate = 0.05        # linearly decay action_std (action_std = action_std - action_std_decay_rate)
-    min_action_std = 0.1                # minimum action_std (stop decay after action_std <= min_action_std)
-    action_std_decay_freq = int(2.5e5)  # action_std decay frequency (in num timesteps)
+    action_std = config.action_std
+    action_std_decay_rate = config.action_std_decay_rate
+    min_action_std = config.min_action_std
+    action_std_decay_freq = config.action_std_decay_freq
     #####################################################
 
     ## Note : print/log frequencies should be > than max_ep_len
  
     ################ PPO hyperparameters ################
-    update_timestep = max_ep_len * 4      # update policy every n timesteps
-    K_epochs = 80               # update policy for K epochs in one PPO update
+    update_timestep = config.update_timestep
+    update_method = config.update_method
+    K_epochs = config.K_epochs
+    gae_lambda = config.gae_lambda
+    minibatch_size = config.minibatch_size
+    target_kl = config.target_kl
 
-    eps_clip = 0.2          # clip parameter for PPO
-    gamma = 0.99            # discount factor
+    eps_clip = config.eps_clip
+    gamma = config.gamma
 
-    lr_actor = 0.0003       # learning rate for actor network
-    lr_critic = 0.001       # learning rate for critic network
+    lr_actor = config.lr_actor
+    lr_critic = config.lr_critic
 
-    random_seed = 0         # set random seed if required (0 = no random seed)
+    random_seed = config.random_seed
     #####################################################
 
 
@@ -63,20 +214,25 @@ def train(env):
     if not os.path.exists(log_dir):
           os.makedirs(log_dir)
 
-    #### get number of log files in log directory
-    run_num = 0
-    current_num_files = next(os.walk(log_dir))[2]
-    run_num = len(current_num_files)
+    if checkpoint is None:
+        #### get number of log files in log directory
+        run_num = 0
+        current_num_files = next(os.walk(log_dir))[2]
+        run_num = len(current_num_files)
 
-    #### create new log file for each run
-    log_f_name = log_dir + '/PPO_' + env_name + "_log_" + str(run_num) + ".csv"
+        #### create new log file for each run
+        log_f_name = log_dir + '/PPO_' + env_name + "_log_" + str(run_num) + ".csv"
+    else:
+        #### a resumed run keeps appending to its own log file
+        run_num = checkpoint["progress"]["run_num"]
+        log_f_name = checkpoint["progress"]["log_f_name"]
 
     print("current logging run number for " + env_name + " : ", run_num)
     print("logging at : " + log_f_name)
     #####################################################
 
     ################### checkpointing ###################
-    run_num_pretrained = 0      #### change this to prevent overwriting weights in same env_name folder
+    run_num_pretrained = run_num      #### weights of different runs no longer overwrite each other
 
     directory = "model_training"
     if not os.path.exists(directory):
@@ -89,6 +245,18 @@ def train(env):
 
     checkpoint_path = directory + "PPO_{}_{}_{}.pth".format(env_name, random_seed, run_num_pretrained)
     print("save checkpoint path : " + checkpoint_path)
+
+    checkpoint_dir = config.checkpoint_dir or os.path.join(directory, "checkpoints", "run_" + str(run_num))
+    if not os.path.exists(checkpoint_dir):
+          os.makedirs(checkpoint_dir)
+    config.save(os.path.join(checkpoint_dir, "config.json"))
+    print("full training checkpoints : " + checkpoint_dir)
+
+    metrics_dir = directory + "metrics/"
+    if not os.path.exists(metrics_dir):
+          os.makedirs(metrics_dir)
+    metrics_f_name = metrics_dir + "PPO_{}_metrics_{}.jsonl".format(env_name, run_num)
+    print("metrics stream : " + metrics_f_name)
     #####################################################
 
 
@@ -97,6 +265,7 @@ def train(env):
     print("max training timesteps : ", max_training_timesteps)
     print("max timesteps per episode : ", max_ep_len)
     print("model saving frequency : " + str(save_model_freq) + " timesteps")
+    print("checkpoint frequency : " + str(checkpoint_freq) + " timesteps")
     print("log frequency : " + str(log_freq) + " timesteps")
     print("printing average reward over episodes in last : " + str(print_freq) + " timesteps")
     print("--------------------------------------------------------------------------------------------")
@@ -112,18 +281,24 @@ def train(env):
         print("Initializing a discrete action space policy")
     print("--------------------------------------------------------------------------------------------")
     print("PPO update frequency : " + str(update_timestep) + " timesteps")
+    print("PPO update method : ", update_method)
     print("PPO K epochs : ", K_epochs)
+    if update_method == "gae":
+        print("GAE lambda : ", gae_lambda)
+        print("minibatch size : ", minibatch_size)
+        print("target KL : ", target_kl)
     print("PPO epsilon clip : ", eps_clip)
     print("discount factor (gamma) : ", gamma)
     print("--------------------------------------------------------------------------------------------")
     print("optimizer learning rate actor : ", lr_actor)
     print("optimizer learning rate critic : ", lr_critic)
-    if random_seed:
+    if random_seed and checkpoint is None:
         print("--------------------------------------------------------------------------------------------")
         print("setting random seed to ", random_seed)
         torch.manual_seed(random_seed)
         env.seed(random_seed)
         np.random.seed(random_seed)
+        random.seed(random_seed)
     #####################################################
 
     print("============================================================================================")
@@ -131,7 +306,14 @@ def train(env):
     ################# training procedure ################
 
     # initialize a PPO agent
-    ppo_agent = PPO(lr_actor, lr_critic, gamma, K_epochs, eps_clip, has_continuous_action_space, action_std)
+    # the rollout buffer holds exactly one update's worth of steps (split across sub-environments if vectorized)
+    num_envs = getattr(env, 'num_envs', 1)
+    ppo_agent = PPO(lr_actor, lr_critic, gamma, K_epochs, eps_clip, has_continuous_action_space, action_std,
+                    buffer_size=-(-update_timestep // num_envs), num_envs=num_envs, update_method=update_method,
+                    gae_lambda=gae_lambda, minibatch_size=minibatch_size, target_kl=target_kl)
+    if hasattr(env, 'start'):
+        # worker processes share the agent's policy and buffer, so they can only start once it exists
+        env.start(ppo_agent, max_ep_len)
 
     # track total training time
     start_time = datetime.now().replace(microsecond=0)
@@ -139,10 +321,6 @@ def train(env):
 
     print("============================================================================================")
 
-    # logging file
-    log_f = open(log_f_name,"w+")
-    log_f.write('episode,timestep,reward\n')
-
     # printing and logging variables
     print_running_reward = 0
     print_running_episodes = 0
@@ -152,53 +330,286 @@ def train(env):
 
     time_step = 0
     i_episode = 0
+    current_ep_reward = np.zeros(num_envs)
+    # steps into the current episode of every sub-environment (vectorized loop, which truncates them itself)
+    current_ep_len = np.zeros(num_envs, dtype=np.int64)
+    last_checkpoint_step = 0
+
+    if checkpoint is None:
+        # logging file
+        log_f = open(log_f_name,"w+")
+        log_f.write('episode,timestep,reward,elapsed\n')
+    else:
+        # restore agent, environments, counters and RNG states exactly as they were when the checkpoint was written
+        ppo_agent.load_training_state(checkpoint["agent"])
+        env.load_state_dict(checkpoint["env"])
+        progress = checkpoint["progress"]
+        time_step = progress["time_step"]
+        i_episode = progress["i_episode"]
+        print_running_reward, print_running_episodes = progress["print_running"]
+        log_running_reward, log_running_episodes = progress["log_running"]
+        current_ep_reward = np.asarray(progress["current_ep_reward"], dtype=np.float64)
+        current_ep_len = np.asarray(progress.get("current_ep_len", current_ep_len), dtype=np.int64)
+        last_checkpoint_step = time_step
+        start_time = start_time - timedelta(seconds=progress["elapsed"])
+        torch.set_rng_state(checkpoint["rng"]["torch"])
+        if checkpoint["rng"]["cuda"] is not None and torch.cuda.is_available():
+            torch.cuda.set_rng_state_all(checkpoint["rng"]["cuda"])
+        np.random.set_state(checkpoint["rng"]["numpy"])
+        random.setstate(checkpoint["rng"]["python"])
+
+        # drop log rows written after the checkpoint, they will be written again
+        log_f = open(log_f_name, "r+")
+        lines = log_f.readlines()
+        keep = []
+        for line in lines[1:]:
+            step = _log_row_step(line)
+            if step is not None and step <= time_step:
+                keep.append(line)
+        log_f.seek(0)
+        log_f.writelines(lines[:1] + keep)
+        log_f.truncate()
+        print("resumed from timestep " + str(time_step) + " (episode " + str(i_episode) + ")")
+
+    # per-phase timings, recorded by the loops below and by the environments
+    timer = PhaseTimer()
+    for sub_env in getattr(env, 'envs', [env]):
+        sub_env.timer = timer
+    metrics = MetricsWriter(metrics_f_name, timer, time_step, resume=checkpoint is not None)
+
+    def timed_update():
+        update_start = time.perf_counter()
+        ppo_agent.update()
+        metrics.record_update(time.perf_counter() - update_start)
+
+    def write_metrics():
+        metrics.write(time_step, i_episode, (datetime.now() - start_time).total_seconds())
+
+    def write_checkpoint():
+        nonlocal last_checkpoint_step
+        last_checkpoint_step = time_step
+        progress = {"run_num": run_num,
+                    "log_f_name": log_f_name,
+                    "time_step": time_step,
+                    "i_episode": i_episode,
+                    "print_running": (print_running_reward, print_running_episodes),
+                    "log_running": (log_running_reward, log_running_episodes),
+                    "current_ep_reward": np.array(current_ep_reward, dtype=np.float64),
+                    "current_ep_len": np.array(current_ep_len, dtype=np.int64),
+                    "elapsed": (datetime.now() - start_time).total_seconds()}
+        path = save_checkpoint(checkpoint_dir, ppo_agent, env, progress, config, config.keep_checkpoints)
+        print("saved training checkpoint at : " + path)
 
     # training loop
-    while time_step <= max_training_timesteps:
+    if hasattr(env, 'collect'):
+        # worker processes fill the whole buffer in parallel, then the learner updates
+        print("collecting rollouts from " + str(num_envs) + " worker processes")
+        rollout_steps = ppo_agent.buffer.capacity * num_envs
+        try:
+            while time_step <= max_training_timesteps:
+
+                with timer.time('collect'):
+                    episode_rewards = env.collect()
+                time_step += rollout_steps
+
+                for ep_reward in episode_rewards:
+                    print_running_reward += ep_reward
+                    print_running_episodes += 1
+
+                    log_running_reward += ep_reward
+                    log_running_episodes += 1
+
+                    i_episode += 1
+
+                # update PPO agent (policy_old is shared with the workers, so this also broadcasts the weights)
+                timed_update()
+
+                # structured metrics
+                if _crossed(time_step, rollout_steps, log_freq):
+                    write_metrics()
+
+                # log in logging file
+                if _crossed(time_step, rollout_steps, log_freq) and log_running_episodes > 0:
+                    log_avg_reward = round(log_running_reward / log_running_episodes, 4)
+
+                    log_f.write('{},{},{},{}\n'.format(i_episode, time_step, log_avg_reward, (datetime.now() - start_time).total_seconds()))
+                    log_f.flush()
+
+                    log_running_reward = 0
+                    log_running_episodes = 0
+
+                # printing average reward
+                if _crossed(time_step, rollout_steps, print_freq) and print_running_episodes > 0:
+                    print_avg_reward = round(print_running_reward / print_running_episodes, 2)
+
+                    print("Episode : {} \t\t Timestep : {} \t\t Average Reward : {} \t\t Env-steps/s : {:.0f}".format(i_episode, time_step, print_avg_reward, env.steps_per_s))
+
+                    print_running_reward = 0
+                    print_running_episodes = 0
+
+                # save model weights
+                if _crossed(time_step, rollout_steps, save_model_freq):
+                    print("--------------------------------------------------------------------------------------------")
+                    print("saving model at : " + checkpoint_path)
+                    ppo_agent.save(checkpoint_path)
+                    print("model saved")
+                    print("Elapsed Time  : ", datetime.now().replace(microsecond=0) - start_time)
+                    print("--------------------------------------------------------------------------------------------")
+
+                # save full training state (buffer is empty right after the update)
+                if _crossed(time_step, rollout_steps, checkpoint_freq):
+                    write_checkpoint()
+
+            if last_checkpoint_step != time_step:
+                write_checkpoint()
+        finally:
+            env.close()
+    elif num_envs == 1:
+        while time_step <= max_training_timesteps:
+
+            with timer.time('env_reset'):
+                state = env.reset()
+            current_ep_reward = 0
+
+            for t in range(1, max_ep_len+1):
 
-        state = env.reset()
-        current_ep_reward = 0
+                # select action with policy
+                with timer.time('policy_forward'):
+                    action = ppo_agent.select_action(state)
+                with timer.time('env_step'):
+                    state, reward, done, _, _ = env.step(action)
 
-        for t in range(1, max_ep_len+1):
+                # saving reward and is_terminals (an episode cut off at max_ep_len ends here too)
+                ppo_agent.buffer.add_outcome(reward, done or t == max_ep_len)
 
-            # select action with policy
-            action = ppo_agent.select_action(state)
-            state, reward, done, _, _ = env.step(action)
+                time_step +=1
+                current_ep_reward += reward
 
-            # saving reward and is_terminals
-            ppo_agent.buffer.rewards.append(reward)
-            ppo_agent.buffer.is_terminals.append(done)
+                # update PPO agent
+                if ppo_agent.buffer.is_full():
+                    timed_update()
 
-            time_step +=1
+                # if continuous action space; then decay action std of ouput action distribution
+                if has_continuous_action_space and time_step % action_std_decay_freq == 0:
+                    ppo_agent.decay_action_std(action_std_decay_rate, min_action_std)
+
+                # structured metrics
+                if time_step % log_freq == 0:
+                    write_metrics()
+
+                # log in logging file
+                if time_step % log_freq == 0:
+
+                    # log average reward till last episode
+                    log_avg_reward = log_running_reward / log_running_episodes
+                    log_avg_reward = round(log_avg_reward, 4)
+
+                    log_f.write('{},{},{},{}\n'.format(i_episode, time_step, log_avg_reward, (datetime.now() - start_time).total_seconds()))
+                    log_f.flush()
+
+                    log_running_reward = 0
+                    log_running_episodes = 0
+
+                # printing average reward
+                if time_step % print_freq == 0:
+
+                    # print average reward till last episode
+                    print_avg_reward = print_running_reward / print_running_episodes
+                    print_avg_reward = round(print_avg_reward, 2)
+
+                    print("Episode : {} \t\t Timestep : {} \t\t Average Reward : {}".format(i_episode, time_step, print_avg_reward))
+
+                    print_running_reward = 0
+                    print_running_episodes = 0
+
+                # save model weights
+                if time_step % save_model_freq == 0:
+                    print("--------------------------------------------------------------------------------------------")
+                    print("saving model at : " + checkpoint_path)
+                    ppo_agent.save(checkpoint_path)
+                    print("model saved")
+                    print("Elapsed Time  : ", datetime.now().replace(microsecond=0) - start_time)
+                    print("--------------------------------------------------------------------------------------------")
+
+                # break; if the episode is over
+                if done:
+                    break
+
+            print_running_reward += current_ep_reward
+            print_running_episodes += 1
+
+            log_running_reward += current_ep_reward
+            log_running_episodes += 1
+
+            i_episode += 1
+
+            # save full training state between episodes
+            if time_step - last_checkpoint_step >= checkpoint_freq:
+                write_checkpoint()
+
+        if last_checkpoint_step != time_step:
+            write_checkpoint()
+    else:
+        # vectorized environment: every env.step advances num_envs sub-environments at once
+        print("collecting rollouts from " + str(num_envs) + " environments")
+        state = env.reset() if checkpoint is None else env.observation
+
+        while time_step <= max_training_timesteps:
+
+            # select one action per sub-environment with policy
+            with timer.time('policy_forward'):
+                action = ppo_agent.select_action_batch(state)
+            with timer.time('env_step'):
+                state, reward, done, _, _ = env.step(action)
+            current_ep_len += 1
+
+            # sub-environments reset themselves when their episode finishes, the ones that reached max_ep_len
+            # are cut off and reset here, like the single environment loop does
+            truncated = (current_ep_len >= max_ep_len) & ~done
+            if truncated.any():
+                with timer.time('env_reset'):
+                    state = env.reset_envs(truncated)
+            done = done | truncated
+
+            # saving rewards and is_terminals
+            ppo_agent.buffer.add_outcome(reward, done)
+
+            time_step += num_envs
             current_ep_reward += reward
 
+            # close out the finished episodes
+            for i in np.flatnonzero(done):
+                print_running_reward += current_ep_reward[i]
+                print_running_episodes += 1
+
+                log_running_reward += current_ep_reward[i]
+                log_running_episodes += 1
+
+                current_ep_reward[i] = 0
+                current_ep_len[i] = 0
+                i_episode += 1
+
             # update PPO agent
-            if time_step % update_timestep == 0:
-                ppo_agent.update()
+            if ppo_agent.buffer.is_full():
+                timed_update()
 
-            # if continuous action space; then decay action std of ouput action distribution
-            if has_continuous_action_space and time_step % action_std_decay_freq == 0:
-                ppo_agent.decay_action_std(action_std_decay_rate, min_action_std)
+            # structured metrics
+            if _crossed(time_step, num_envs, log_freq):
+                write_metrics()
 
             # log in logging file
-            if time_step % log_freq == 0:
-
-                # log average reward till last episode
-                log_avg_reward = log_running_reward / log_running_episodes
-                log_avg_reward = round(log_avg_reward, 4)
+            if _crossed(time_step, num_envs, log_freq) and log_running_episodes > 0:
+                log_avg_reward = round(log_running_reward / log_running_episodes, 4)
 
-                log_f.write('{},{},{}\n'.format(i_episode, time_step, log_avg_reward))
+                log_f.write('{},{},{},{}\n'.format(i_episode, time_step, log_avg_reward, (datetime.now() - start_time).total_seconds()))
                 log_f.flush()
 
                 log_running_reward = 0
                 log_running_episodes = 0
 
             # printing average reward
-            if time_step % print_freq == 0:
-
-                # print average reward till last episode
-                print_avg_reward = print_running_reward / print_running_episodes
-                print_avg_reward = round(print_avg_reward, 2)
+            if _crossed(time_step, num_envs, print_freq) and print_running_episodes > 0:
+                print_avg_reward = round(print_running_reward / print_running_episodes, 2)
 
                 print("Episode : {} \t\t Timestep : {} \t\t Average Reward : {}".format(i_episode, time_step, print_avg_reward))
 
@@ -206,7 +617,7 @@ def train(env):
                 print_running_episodes = 0
 
             # save model weights
-            if time_step % save_model_freq == 0:
+            if _crossed(time_step, num_envs, save_model_freq):
                 print("--------------------------------------------------------------------------------------------")
                 print("saving model at : " + checkpoint_path)
                 ppo_agent.save(checkpoint_path)
@@ -214,18 +625,16 @@ def train(env):
                 print("Elapsed Time  : ", datetime.now().replace(microsecond=0) - start_time)
                 print("--------------------------------------------------------------------------------------------")
 
-            # break; if the episode is over
-            if done:
-                break
-
-        print_running_reward += current_ep_reward
-        print_running_episodes += 1
-
-        log_running_reward += current_ep_reward
-        log_running_episodes += 1
+            # save full training state
+            if _crossed(time_step, num_envs, checkpoint_freq):
+                write_checkpoint()
 
-        i_episode += 1
+        if last_checkpoint_step != time_step:
+            write_checkpoint()
 
+    if metrics.last_step != time_step:
+        write_metrics()
+    metrics.close()
     log_f.close()
     # env.close()
 
@@ -0,0 +1,167 @@
+"""
+Structured training metrics for rl_training.train
+Every log interval one JSON line is appended with the time spent per phase (env step, image load, CNN probs,
+policy forward, PPO update, ...), env-steps per second and the PPO update latencies of that interval.
+Running this file summarizes where the time goes in one or more metrics files.
+
+Usage: python3 model_training/training_metrics.py model_training/RL-logs/metrics/PPO_RL-logs_metrics_0.jsonl
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class MetricsWriter(object):
+    """
+    Appends one JSON record per log interval to a metrics file
+    """
+
+    def __init__(self, path, timer, time_step=0, resume=False):
+        """
+        path : jsonl file the records are written to
+        timer : PhaseTimer the training loop records its phases in (it is reset after every record)
+        time_step : timestep training starts from
+        resume : keep the records up to time_step from an earlier run instead of starting a new file
+        """
+        self.path = path
+        self.timer = timer
+        self.update_latencies = []
+        self.last_step = time_step
+        self.last_time = time.perf_counter()
+
+        if resume and os.path.exists(path):
+            # records written after the checkpoint being resumed from will be written again
+            records = [r for r in read_records(path) if r["time_step"] <= time_step]
+            self.f = open(path, "w")
+            self.f.writelines(json.dumps(r) + "\n" for r in records)
+            self.f.flush()
+        else:
+            self.f = open(path, "w")
+
+    def record_update(self, seconds):
+        self.update_latencies.append(seconds)
+        self.timer.add('ppo_update', seconds)
+
+    def write(self, time_step, i_episode, elapsed, **extra):
+        now = time.perf_counter()
+        interval = now - self.last_time
+        steps = time_step - self.last_step
+        latencies_ms = [1000 * seconds for seconds in self.update_latencies]
+        record = {
+            "time_step": time_step,
+            "episode": i_episode,
+            "elapsed": elapsed,
+            "interval_s": interval,
+            "steps": steps,
+            "steps_per_s": steps / interval if interval > 0 else 0.0,
+            "phases": {phase: {"seconds": seconds, "count": count}
+                       for phase, (seconds, count) in self.timer.snapshot(reset=True).items()},
+            "update_ms": latencies_ms,
+            "update_ms_p50": float(np.percentile(latencies_ms, 50)) if latencies_ms else None,
+            "update_ms_p95": float(np.percentile(latencies_ms, 95)) if latencies_ms else None,
+        }
+        record.update(extra)
+        self.f.write(json.dumps(record) + "\n")
+        self.f.flush()
+
+        self.update_latencies = []
+        self.last_step = time_step
+        self.last_time = now
+
+    def close(self):
+        self.f.close()
+
+
+def summarize(records):
+    """
+    aggregates metrics records into a per-phase table and overall throughput / update latency figures
+    """
+    wall = sum(r["interval_s"] for r in records)
+    steps = sum(r["steps"] for r in records)
+    totals = {}
+    counts = {}
+    for r in records:
+        for phase, p in r["phases"].items():
+            totals[phase] = totals.get(phase, 0.0) + p["seconds"]
+            counts[phase] = counts.get(phase, 0) + p["count"]
+
+    # phases timed inside another one are named "<outer>/<phase>" (see PhaseTimer) and shown as its breakdown
+    top_level = [p for p in totals if '/' not in p]
+    rows = []
+    for phase in sorted(top_level, key=lambda p: -totals[p]):
+        rows.append((phase, phase))
+        rows.extend(('  ' + child[len(phase) + 1:], child) for child in sorted(totals) if child.startswith(phase + '/'))
+    rows.extend((child, child) for child in sorted(totals) if '/' in child and not child.startswith('worker/')
+                and child.split('/')[0] not in totals)
+    table = pd.DataFrame([{"phase": label, "seconds": totals[phase], "% of wall": 100 * totals[phase] / wall,
+                           "calls": counts[phase], "mean ms": 1000 * totals[phase] / max(1, counts[phase])}
+                          for label, phase in rows])
+    other = wall - sum(totals[p] for p in top_level)
+    table = pd.concat([table, pd.DataFrame([{"phase": "other", "seconds": other, "% of wall": 100 * other / wall,
+                                             "calls": 0, "mean ms": 0.0}])], ignore_index=True)
+
+    workers = pd.DataFrame([{"phase": phase, "seconds": totals[phase], "calls": counts[phase],
+                             "mean ms": 1000 * totals[phase] / max(1, counts[phase])}
+                            for phase in sorted(totals) if phase.startswith('worker/')])
+
+    latencies = [ms for r in records for ms in r["update_ms"]]
+    overall = {
+        "steps": steps,
+        "wall_s": wall,
+        "steps_per_s": steps / wall if wall > 0 else 0.0,
+        "updates": len(latencies),
+        "update_ms_p50": float(np.percentile(latencies, 50)) if latencies else None,
+        "update_ms_p95": float(np.percentile(latencies, 95)) if latencies else None,
+        "update_ms_max": max(latencies) if latencies else None,
+    }
+    return table, workers, overall
+
+
+def read_records(path):
+    """
+    the records of a metrics file, skipping empty lines and lines that do not parse
+    (a record cut off when a run was killed mid-write)
+    """
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog='python3 model_training/training_metrics.py',
+        description='Summarize where the time goes in RL training metrics files')
+    parser.add_argument('metrics', type=str, nargs='+', help='metrics jsonl file(s) written by rl_training.train')
+    args = parser.parse_args()
+
+    float_format = lambda v: "{:.2f}".format(v)
+    for path in args.metrics:
+        records = read_records(path)
+        if not records:
+            print(path + ": no records")
+            continue
+        table, workers, overall = summarize(records)
+        print("============================================================================================")
+        print(path)
+        print("steps : {steps} in {wall_s:.1f}s ({steps_per_s:.0f} env-steps/s)".format(**overall))
+        if overall["updates"]:
+            print("PPO updates : {updates} | latency p50 {update_ms_p50:.1f}ms p95 {update_ms_p95:.1f}ms "
+                  "max {update_ms_max:.1f}ms".format(**overall))
+        print("--------------------------------------------------------------------------------------------")
+        print(table.to_string(index=False, float_format=float_format))
+        if len(workers):
+            print("--------------------------------------------------------------------------------------------")
+            print("worker processes (summed over workers):")
+            print(workers.to_string(index=False, float_format=float_format))
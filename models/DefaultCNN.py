@@ -9,6 +9,9 @@ import torch.nn.functional as F
 
 class DefaultCNN(nn.Module):
 
+    # images are fed to the network at full 512x512 resolution
+    input_size = 512
+
     # Defining the Constructor
     def __init__(self, num_classes_=4):
         # In the init function, we define each layer we will use in our model
@@ -1,38 +1,127 @@
+import numpy as np
 import torch
 import torch.nn as nn
+from gameplay.observation import OBS_LAYOUT
 from torch.distributions import MultivariateNormal
 from torch.distributions import Categorical
 
 ################################## set device ##################################
-print("============================================================================================")
 # set device to cpu or cuda
-device = torch.device('cpu')
-if(torch.cuda.is_available()): 
-    device = torch.device('cuda:0') 
-    torch.cuda.empty_cache()
-    print("Device set to : " + str(torch.cuda.get_device_name(device)))
-else:
-    print("Device set to : cpu")
-print("============================================================================================")
+device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
+
+
+def print_device():
+    """
+    prints the device the models run on (called when training starts, not at import)
+    """
+    print("============================================================================================")
+    if device.type == 'cuda':
+        torch.cuda.empty_cache()
+        print("Device set to : " + str(torch.cuda.get_device_name(device)))
+    else:
+        print("Device set to : cpu")
+    print("============================================================================================")
 
 
 ################################## PPO Policy ##################################
+# keys of the observation stored in the rollout buffer
+FLAT_KEY = "observation"    # flat observation vectors laid out by gameplay.observation.OBS_LAYOUT
+PACKED_KEY = "packed"       # pre-packed policy features, see pack_observation
+PACKED_DIM = OBS_LAYOUT.feature_size
+OBS_SHAPES = {FLAT_KEY: (OBS_LAYOUT.size,)}
+PACKED_OBS_SHAPES = {PACKED_KEY: (PACKED_DIM,)}
+
+def pack_observation(observation):
+    """
+    flattens an observation dict or flat observation vector (single, or stacked along a leading axis) into the
+    float32 features BaseModel.forward builds: variables, humanoid class probs, summed storage class probs, doable actions
+    """
+    if not isinstance(observation, dict):
+        observation = OBS_LAYOUT.views(np.asarray(observation, dtype=np.float32))
+    return np.concatenate([np.asarray(observation['variables'], dtype=np.float32),
+                           np.asarray(observation['humanoid_class_probs'], dtype=np.float32),
+                           np.asarray(observation['vehicle_storage_class_probs'], dtype=np.float32).sum(-2),
+                           np.asarray(observation['doable_actions'], dtype=np.float32)], axis=-1)
+
 class RolloutBuffer:
-    def __init__(self):
-        self.actions = []
-        self.states = []
-        self.logprobs = []
-        self.rewards = []
-        self.state_values = []
-        self.is_terminals = []
-    
+    def __init__(self, capacity, num_envs=1, obs_shapes=OBS_SHAPES, action_shape=(), action_dtype=torch.long):
+        """
+        fixed-capacity rollout storage, preallocated as (capacity, num_envs, ...) tensors and written in place
+
+        capacity : number of steps stored before an update is needed
+        num_envs : number of environments stepped together (1 for a plain TrainInterface)
+        obs_shapes : shape of each observation key for a single environment
+        """
+        self.capacity = capacity
+        self.num_envs = num_envs
+        self.states = {key: torch.zeros((capacity, num_envs) + tuple(shape), dtype=torch.float32, device=device)
+                       for key, shape in obs_shapes.items()}
+        self.actions = torch.zeros((capacity, num_envs) + tuple(action_shape), dtype=action_dtype, device=device)
+        self.logprobs = torch.zeros((capacity, num_envs), dtype=torch.float32, device=device)
+        self.state_values = torch.zeros((capacity, num_envs), dtype=torch.float32, device=device)
+        self.rewards = torch.zeros((capacity, num_envs), dtype=torch.float32, device=device)
+        self.is_terminals = torch.zeros((capacity, num_envs), dtype=torch.bool, device=device)
+        self.ptr = 0
+
+    def __len__(self):
+        return self.ptr * self.num_envs
+
+    def is_full(self):
+        return self.ptr >= self.capacity
+
+    def write_states(self, states):
+        """
+        copies an observation dict (arrays of shape (num_envs, ...)) into the current slot.
+        returns the slot as a dict of tensors, ready to feed to the policy
+        """
+        if self.is_full():
+            raise ValueError("Rollout buffer is full, call PPO.update() first")
+        if not isinstance(states, dict):
+            (key,) = self.states.keys()
+            states = {key: states}
+        elif FLAT_KEY in self.states and FLAT_KEY not in states:
+            # an old-style observation dict
+            states = {FLAT_KEY: OBS_LAYOUT.pack(states)}
+        slot = {}
+        for key, buf in self.states.items():
+            buf[self.ptr].copy_(torch.as_tensor(np.asarray(states[key], dtype=np.float32)).view(buf.shape[1:]))
+            slot[key] = buf[self.ptr]
+        return slot
+
+    def write_policy_outputs(self, actions, logprobs, state_values):
+        self.actions[self.ptr] = actions.view(self.actions.shape[1:])
+        self.logprobs[self.ptr] = logprobs.view(-1)
+        self.state_values[self.ptr] = state_values.view(-1)
+
+    def add_outcome(self, rewards, is_terminals):
+        """
+        stores the rewards and terminal flags for the current slot and moves on to the next one
+        """
+        self.rewards[self.ptr] = torch.as_tensor(np.asarray(rewards, dtype=np.float32)).view(-1)
+        self.is_terminals[self.ptr] = torch.as_tensor(np.asarray(is_terminals, dtype=bool)).view(-1)
+        self.ptr += 1
+
     def clear(self):
-        del self.actions[:]
-        del self.states[:]
-        del self.logprobs[:]
-        del self.rewards[:]
-        del self.state_values[:]
-        del self.is_terminals[:]
+        self.ptr = 0
+
+    def state_dict(self):
+        return {"ptr": self.ptr,
+                "states": {key: buf.clone() for key, buf in self.states.items()},
+                "actions": self.actions.clone(),
+                "logprobs": self.logprobs.clone(),
+                "state_values": self.state_values.clone(),
+                "rewards": self.rewards.clone(),
+                "is_terminals": self.is_terminals.clone()}
+
+    def load_state_dict(self, state):
+        """
+        restores the buffer contents in place (the tensors may be shared with rollout workers)
+        """
+        for key, buf in self.states.items():
+            buf.copy_(state["states"][key])
+        for name in ("actions", "logprobs", "state_values", "rewards", "is_terminals"):
+            getattr(self, name).copy_(state[name])
+        self.ptr = state["ptr"]
 
 class BaseModel(nn.Module):
     def __init__(self,):
@@ -47,6 +136,24 @@ class BaseModel(nn.Module):
                             self.humanoid_classes+\
                             self.action_dim
     def forward(self, inputs):
+        if isinstance(inputs, dict):
+            if PACKED_KEY in inputs:
+                return inputs[PACKED_KEY]
+            if FLAT_KEY not in inputs:
+                return self._forward_dict(inputs)
+            inputs = inputs[FLAT_KEY]
+
+        # pre-packed observations (see pack_observation) are already in the concatenated layout
+        if inputs.shape[-1] == PACKED_DIM:
+            return inputs
+
+        # flat observation vectors: slice the blocks out of OBS_LAYOUT and sum the vehicle storage rows
+        sl = OBS_LAYOUT.slices
+        x_s = inputs[:, sl['vehicle_storage_class_probs']].reshape(-1, OBS_LAYOUT.capacity, OBS_LAYOUT.num_classes)
+        return torch.cat([inputs[:, sl['variables']], inputs[:, sl['humanoid_class_probs']],
+                          torch.sum(x_s, 1), inputs[:, sl['doable_actions']]], dim=1)
+
+    def _forward_dict(self, inputs):
         x_v = inputs['variables']
         x_p = inputs['humanoid_class_probs']
         x_s = inputs['vehicle_storage_class_probs']
@@ -109,6 +216,13 @@ class ActorCritic(nn.Module):
         state_val = self.critic(state)
 
         return action.detach(), action_logprob.detach(), state_val.detach()
+
+    def act_only(self, state):
+        """
+        samples actions from the actor alone (no critic, no log probs), for inference
+        """
+        action_probs = self.actor(state)
+        return Categorical(action_probs).sample()
     
     def evaluate(self, state, action):
 
@@ -133,7 +247,21 @@ class ActorCritic(nn.Module):
 
 
 class PPO:
-    def __init__(self, lr_actor, lr_critic, gamma, K_epochs, eps_clip, has_continuous_action_space, action_std_init=0.6):
+    def __init__(self, lr_actor, lr_critic, gamma, K_epochs, eps_clip, has_continuous_action_space, action_std_init=0.6,
+                 buffer_size=4000, num_envs=1, update_method='mc', gae_lambda=0.95, minibatch_size=64, target_kl=None,
+                 packed_obs=False):
+        """
+        buffer_size : rollout buffer capacity in steps (per environment)
+        num_envs : number of environments stepped together
+        packed_obs : the rollout buffer stores pre-packed observations (select_action_packed) instead of flat observation vectors
+        update_method : 'mc' runs K_epochs full-batch passes on normalized Monte Carlo returns (original),
+                        'gae' runs K_epochs passes of shuffled minibatches on generalized advantage estimates
+        gae_lambda : GAE lambda (gae only)
+        minibatch_size : minibatch size in transitions (gae only)
+        target_kl : stop the update early once the approximate KL to the old policy exceeds this (gae only)
+        """
+        if update_method not in ('mc', 'gae'):
+            raise ValueError("update_method must be 'mc' or 'gae'")
 
         self.has_continuous_action_space = has_continuous_action_space
 
@@ -143,8 +271,16 @@ class PPO:
         self.gamma = gamma
         self.eps_clip = eps_clip
         self.K_epochs = K_epochs
-        
-        self.buffer = RolloutBuffer()
+        self.update_method = update_method
+        self.gae_lambda = gae_lambda
+        self.minibatch_size = minibatch_size
+        self.target_kl = target_kl
+
+        obs_shapes = PACKED_OBS_SHAPES if packed_obs else OBS_SHAPES
+        if has_continuous_action_space:
+            self.buffer = RolloutBuffer(buffer_size, num_envs, obs_shapes, action_shape=(4,), action_dtype=torch.float32)
+        else:
+            self.buffer = RolloutBuffer(buffer_size, num_envs, obs_shapes)
 
         self.policy = ActorCritic( has_continuous_action_space, action_std_init).to(device)
         self.optimizer = torch.optim.Adam([
@@ -184,60 +320,160 @@ class PPO:
         print("--------------------------------------------------------------------------------------------")
 
     def select_action(self, state):
-        state_ = {}
-        for item in state.keys():
-            state_[item] = torch.unsqueeze(torch.Tensor(state[item]).to(device),0)
-        state = state_
-        
-        if self.has_continuous_action_space:
-            with torch.no_grad():
-                action, action_logprob, state_val = self.policy_old.act(state)
+        """
+        selects an action for a single environment's observation dict.
+        the transition is written into the current buffer slot; it is kept once PPO.buffer.add_outcome is called
+        """
+        state = self.buffer.write_states(state)
 
-            self.buffer.states.append(state)
-            self.buffer.actions.append(action)
-            self.buffer.logprobs.append(action_logprob)
-            self.buffer.state_values.append(state_val)
+        with torch.no_grad():
+            action, action_logprob, state_val = self.policy_old.act(state)
+        self.buffer.write_policy_outputs(action, action_logprob, state_val)
 
+        if self.has_continuous_action_space:
             return action.detach().cpu().numpy().flatten()
         else:
-            with torch.no_grad():
-                action, action_logprob, state_val = self.policy_old.act(state)
-            
-            self.buffer.states.append(state)
-            self.buffer.actions.append(action)
-            self.buffer.logprobs.append(action_logprob)
-            self.buffer.state_values.append(state_val)
-
             return action.item()
 
+    def select_action_batch(self, states):
+        """
+        selects one action per sub-environment from a stacked observation dict (num_envs, ...)
+        """
+        state = self.buffer.write_states(states)
+
+        with torch.no_grad():
+            action, action_logprob, state_val = self.policy_old.act(state)
+        self.buffer.write_policy_outputs(action, action_logprob, state_val)
+
+        return action.detach().cpu().numpy()
+
+    def select_action_packed(self, packed, inference=False):
+        """
+        selects actions for a batch of pre-packed observations (B, PACKED_DIM), see pack_observation,
+        or of flat observation vectors (B, OBS_LAYOUT.size).
+        returns an array of B action indices
+
+        inference : only run the actor; nothing is written to the rollout buffer and either layout is accepted.
+                    Otherwise B must be the buffer's num_envs, and pre-packed observations need a PPO built with
+                    packed_obs=True (flat vectors are packed for it; packed ones cannot be unpacked for a flat buffer)
+        """
+        packed = np.asarray(packed, dtype=np.float32)
+        if packed.shape[-1] not in (PACKED_DIM, OBS_LAYOUT.size):
+            raise ValueError("Expected observations of size {} (packed) or {} (flat), got shape {}".format(
+                PACKED_DIM, OBS_LAYOUT.size, packed.shape))
+        if inference:
+            with torch.inference_mode():
+                state = torch.as_tensor(packed, device=device).reshape(-1, packed.shape[-1])
+                return self.policy_old.act_only(state).cpu().numpy()
+
+        packed = packed.reshape(-1, packed.shape[-1])
+        if len(packed) != self.buffer.num_envs:
+            raise ValueError("Expected a batch of {} observations (one per environment), got {}".format(
+                self.buffer.num_envs, len(packed)))
+        if PACKED_KEY in self.buffer.states:
+            if packed.shape[-1] == OBS_LAYOUT.size:
+                packed = pack_observation(packed)
+            state = self.buffer.write_states({PACKED_KEY: packed})
+        elif packed.shape[-1] == OBS_LAYOUT.size:
+            state = self.buffer.write_states({FLAT_KEY: packed})
+        else:
+            raise ValueError("This PPO stores flat observation vectors of size {}; build it with packed_obs=True "
+                             "to select actions from pre-packed observations".format(OBS_LAYOUT.size))
+        with torch.no_grad():
+            action, action_logprob, state_val = self.policy_old.act(state)
+        self.buffer.write_policy_outputs(action, action_logprob, state_val)
+
+        return action.detach().cpu().numpy()
+
     def update(self):
-        # Monte Carlo estimate of returns
-        rewards = []
-        discounted_reward = 0
-        for reward, is_terminal in zip(reversed(self.buffer.rewards), reversed(self.buffer.is_terminals)):
-            if is_terminal:
-                discounted_reward = 0
-            discounted_reward = reward + (self.gamma * discounted_reward)
-            rewards.insert(0, discounted_reward)
-            
+        if self.buffer.ptr == 0:
+            return
+        if self.update_method == 'gae':
+            self._update_gae()
+        else:
+            self._update_mc()
+
+        # Copy new weights into old policy
+        self.policy_old.load_state_dict(self.policy.state_dict())
+
+        # clear buffer
+        self.buffer.clear()
+
+    def _flat_buffer(self):
+        """
+        contiguous (T * num_envs, ...) views of the filled part of the buffer
+        """
+        T = self.buffer.ptr
+        states = {key: buf[:T].reshape((-1,) + tuple(buf.shape[2:])) for key, buf in self.buffer.states.items()}
+        actions = self.buffer.actions[:T].reshape((-1,) + tuple(self.buffer.actions.shape[2:]))
+        return states, actions, self.buffer.logprobs[:T].reshape(-1), self.buffer.state_values[:T].reshape(-1)
+
+    def _update_gae(self):
+        T = self.buffer.ptr
+        rewards = self.buffer.rewards[:T]
+        values = self.buffer.state_values[:T]
+        not_terminals = (~self.buffer.is_terminals[:T]).float()
+
+        # generalized advantage estimates in one reverse scan over time, vectorized over environments.
+        # the step after the end of the buffer is bootstrapped with 0, as the Monte Carlo returns are
+        advantages = torch.zeros_like(rewards)
+        last_advantage = torch.zeros_like(rewards[0])
+        next_values = torch.zeros_like(values[0])
+        for t in reversed(range(T)):
+            delta = rewards[t] + self.gamma * next_values * not_terminals[t] - values[t]
+            last_advantage = delta + self.gamma * self.gae_lambda * not_terminals[t] * last_advantage
+            advantages[t] = last_advantage
+            next_values = values[t]
+        returns = (advantages + values).reshape(-1)
+        advantages = advantages.reshape(-1)
+        advantages = (advantages - advantages.mean()) / (advantages.std() + 1e-7)
+
+        old_states, old_actions, old_logprobs, _ = self._flat_buffer()
+        n = old_logprobs.shape[0]
+
+        for _ in range(self.K_epochs):
+            permutation = torch.randperm(n, device=device)
+            for start in range(0, n, self.minibatch_size):
+                idx = permutation[start:start + self.minibatch_size]
+                logprobs, state_values, dist_entropy = self.policy.evaluate(
+                    {key: value[idx] for key, value in old_states.items()}, old_actions[idx])
+                state_values = state_values.view(-1)
+
+                log_ratios = logprobs - old_logprobs[idx]
+                ratios = torch.exp(log_ratios)
+
+                surr1 = ratios * advantages[idx]
+                surr2 = torch.clamp(ratios, 1-self.eps_clip, 1+self.eps_clip) * advantages[idx]
+                loss = -torch.min(surr1, surr2) + 0.5 * self.MseLoss(state_values, returns[idx]) - 0.01 * dist_entropy
+
+                self.optimizer.zero_grad()
+                loss.mean().backward()
+                self.optimizer.step()
+
+                if self.target_kl is not None:
+                    # low-variance estimator of KL(old || new)
+                    with torch.no_grad():
+                        approx_kl = ((ratios - 1) - log_ratios).mean().item()
+                    if approx_kl > self.target_kl:
+                        return
+
+    def _update_mc(self):
+        T = self.buffer.ptr
+
+        # Monte Carlo estimate of returns, one column per environment
+        rewards = self.buffer.rewards[:T]
+        not_terminals = (~self.buffer.is_terminals[:T]).float()
+        returns = torch.zeros_like(rewards)
+        discounted_reward = torch.zeros_like(rewards[0])
+        for t in reversed(range(T)):
+            discounted_reward = rewards[t] + self.gamma * discounted_reward * not_terminals[t]
+            returns[t] = discounted_reward
+
         # Normalizing the rewards
-        rewards = torch.tensor(rewards, dtype=torch.float32).to(device)
+        rewards = returns.reshape(-1)
         rewards = (rewards - rewards.mean()) / (rewards.std() + 1e-7)
 
-        # convert list to tensor
-#         old_states = torch.squeeze(torch.stack(self.buffer.states, dim=0)).detach().to(device)
-#         print(self.buffer.states)
-        old_states = {"variables":[], "humanoid_class_probs":[],"vehicle_storage_class_probs": [],"doable_actions": []}
-        for i in self.buffer.states:
-            for key in old_states.keys():
-                old_states[key].append(i[key])
-        old_states_tensor = {}
-        for key in old_states.keys():
-            old_states_tensor[key] = torch.squeeze(torch.stack(old_states[key], dim=0)).detach().to(device)
-#         old_states = torch.squeeze(torch.stack(self.buffer.states, dim=0)).detach().to(device)
-        old_actions = torch.squeeze(torch.stack(self.buffer.actions, dim=0)).detach().to(device)
-        old_logprobs = torch.squeeze(torch.stack(self.buffer.logprobs, dim=0)).detach().to(device)
-        old_state_values = torch.squeeze(torch.stack(self.buffer.state_values, dim=0)).detach().to(device)
+        old_states_tensor, old_actions, old_logprobs, old_state_values = self._flat_buffer()
 
         # calculate advantages
         advantages = rewards.detach() - old_state_values.detach()
@@ -265,15 +501,27 @@ class PPO:
             self.optimizer.zero_grad()
             loss.mean().backward()
             self.optimizer.step()
-            
-        # Copy new weights into old policy
-        self.policy_old.load_state_dict(self.policy.state_dict())
 
-        # clear buffer
-        self.buffer.clear()
-    
     def save(self, checkpoint_path):
         torch.save(self.policy_old.state_dict(), checkpoint_path)
+
+    def training_state(self):
+        """
+        everything needed to resume training exactly: both policies, the optimizer state and the rollout buffer
+        """
+        return {"policy": self.policy.state_dict(),
+                "policy_old": self.policy_old.state_dict(),
+                "optimizer": self.optimizer.state_dict(),
+                "action_std": getattr(self, "action_std", None),
+                "buffer": self.buffer.state_dict()}
+
+    def load_training_state(self, state):
+        self.policy.load_state_dict(state["policy"])
+        self.policy_old.load_state_dict(state["policy_old"])
+        self.optimizer.load_state_dict(state["optimizer"])
+        if self.has_continuous_action_space and state["action_std"] is not None:
+            self.set_action_std(state["action_std"])
+        self.buffer.load_state_dict(state["buffer"])
    
     def load(self, checkpoint_path):
         self.policy_old.load_state_dict(torch.load(checkpoint_path, map_location=lambda storage, loc: storage))
@@ -0,0 +1,46 @@
+"""
+Slimmer Zombie versus Human Classifier
+- Same job as DefaultCNN, but global pooling replaces the 393k-wide fully-connected layer.
+- Works on downscaled inputs (128x128 by default), which cuts inference FLOPs by ~16x.
+"""
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+class SlimCNN(nn.Module):
+
+    # images are resized to input_size x input_size before being fed to the network
+    input_size = 128
+
+    # Defining the Constructor
+    def __init__(self, num_classes_=4):
+        super(SlimCNN, self).__init__()
+
+        # Three small convolution blocks, each doubling the number of filters
+        self.conv1 = nn.Conv2d(in_channels=3, out_channels=16, kernel_size=3, stride=1, padding=1)
+        self.bn1 = nn.BatchNorm2d(16)
+        self.conv2 = nn.Conv2d(in_channels=16, out_channels=32, kernel_size=3, stride=1, padding=1)
+        self.bn2 = nn.BatchNorm2d(32)
+        self.conv3 = nn.Conv2d(in_channels=32, out_channels=64, kernel_size=3, stride=1, padding=1)
+        self.bn3 = nn.BatchNorm2d(64)
+
+        self.pool = nn.MaxPool2d(kernel_size=2)
+
+        # Averages every feature map down to a single value, so the classifier does not depend on input size
+        self.global_pool = nn.AdaptiveAvgPool2d(1)
+
+        self.drop = nn.Dropout(p=0.2)
+
+        # 64 pooled features instead of 128 * 128 * 24
+        self.fc = nn.Linear(in_features=64, out_features=num_classes_)
+
+    def forward(self, x):
+        x = self.pool(F.relu(self.bn1(self.conv1(x))))
+        x = self.pool(F.relu(self.bn2(self.conv2(x))))
+        x = self.pool(F.relu(self.bn3(self.conv3(x))))
+
+        x = self.global_pool(x).flatten(1)
+        x = self.drop(x)
+
+        x = self.fc(x)
+        return x
@@ -0,0 +1,8 @@
+from models.DefaultCNN import DefaultCNN
+from models.SlimCNN import SlimCNN
+
+# classifier architectures selectable by name, e.g. Predictor(arch='slim')
+CLASSIFIERS = {
+    'default': DefaultCNN,
+    'slim': SlimCNN,
+}
@@ -1,16 +1,25 @@
 #!/usr/bin/env python3
 """
 Run multiple games with a single command
-Usage: python3 run_multiple_games.py [mode] [number_of_runs]
+Usage: python3 run_multiple_games.py -m llm -n 1000 -k 4
+       python3 run_multiple_games.py -n 50 -k 4 --asyncio -r doctor dictator gamer   (role sweep on one event loop)
+       (-k 0 runs every game as a separate `python3 main.py` subprocess, as before)
 """
 
 import argparse
-import sys
+import asyncio
+import os
 import subprocess
 import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+import multiprocessing
 
-def run_multiple_games(mode='llm', role='default', num_runs=5):
+SHIFT_LENGTH = 720
+CAPACITY = 10
+
+def run_multiple_games(mode='llm', role='default', num_runs=5, images=True, llm_cache=False, temperature0=False,
+                       stream=False):
     """Run multiple games and collect performance data"""
     print(f"🎮 Running {num_runs} games in {mode} mode")
     print("="*50)
@@ -24,8 +33,9 @@ def run_multiple_games(mode='llm', role='default', num_runs=5):
         try:
             # Run the game
             result = subprocess.run([
-                'python3', 'main.py', '-m', mode, '-r', role, '--images' if args.images else '--no_images',
-            ], capture_output=True, text=True, timeout=300)  # 5 minute timeout
+                'python3', 'main.py', '-m', mode, '-r', role, '--images' if images else '--no_images',
+            ] + (['--llm_cache'] if llm_cache else []) + (['--temperature0'] if temperature0 else [])
+              + (['--stream'] if stream else []), capture_output=True, text=True, timeout=300)  # 5 minute timeout
             
             if result.returncode == 0:
                 run_time = datetime.now() - run_start
@@ -54,42 +64,274 @@ def run_multiple_games(mode='llm', role='default', num_runs=5):
     print(f"\n🎯 All {num_runs} runs completed in {total_time.total_seconds():.1f}s")
     print("📊 Run 'python3 generate_graphs.py' to see performance graphs")
 
-def main():
-    """Main function"""
-    if len(sys.argv) < 2:
-        print("Usage: python3 run_multiple_games.py [mode] [number_of_runs]")
-        print("Modes: llm")
-        print("Example: python3 run_multiple_games.py llm 10")
-        return
-    
-    mode = sys.argv[1]
-    num_runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
-    
-    # Validate mode
-    valid_modes = ['llm']
-    if mode not in valid_modes:
-        print(f"❌ Invalid mode: {mode}")
-        print(f"Valid modes: {', '.join(valid_modes)}")
-        return
-    
-    # Validate number of runs
-    if num_runs < 1 or num_runs > 100:
-        print("❌ Number of runs must be between 1 and 100")
-        return
-    
-    run_multiple_games(mode, num_runs)
+
+# state of a pooled worker process: one game (data parser + scorekeeper) and one connected LLM client, reused by every game
+_worker = None
+
+def _init_worker(mode, role, images, data_fp, llm_cache=False, temperature0=False, stream=False):
+    """Load the game data and the LLM client once per worker process"""
+    global _worker
+    from endpoints.data_parser import DataParser
+    from endpoints.llm_interface import LLMInterface
+    from endpoints.response_cache import ResponseCache, default_cache_path
+    from gameplay.scorekeeper import FastScoreKeeper
+
+    data_parser = DataParser(data_fp)
+    # the scorekeeper plays every game of this worker, so it must not keep each game's action log
+    scorekeeper = FastScoreKeeper(SHIFT_LENGTH, CAPACITY, log=False)
+    response_cache = ResponseCache(default_cache_path(data_fp)) if llm_cache else None
+    llm_agent = LLMInterface(data_parser, scorekeeper, data_fp, use_images=images, role=role,
+                             response_cache=response_cache, temperature0=temperature0, stream=stream)
+    _worker = {"mode": mode, "role": role, "images": images,
+               "data_parser": data_parser, "scorekeeper": scorekeeper, "llm_agent": llm_agent}
+
+def _play_game(seed=None):
+    """Play one game on this worker's loaded client (same loop as main.py's llm mode). Returns the run summary"""
+    from gameplay.enums import ActionCost
+    from gameplay.performance_tracker import PerformanceTracker
+
+    data_parser = _worker["data_parser"]
+    scorekeeper = _worker["scorekeeper"]
+    llm_agent = _worker["llm_agent"]
+    # restore use_images, the client switches it off when an image is missing
+    llm_agent.use_images = _worker["images"]
+    if seed is not None:
+        data_parser.seed(seed)
+    data_parser.reset()
+    scorekeeper.reset()
+
+    # runs are aggregated by the parent, so nothing is loaded from or written to disk here
+    tracker = PerformanceTracker(load_history=False)
+    tracker.start_new_run(_worker["mode"], images=_worker["images"], role=_worker["role"])
+    while len(data_parser.unvisited) > 0:
+        if scorekeeper.remaining_time <= 0:
+            scorekeeper.scram()
+            break
+        humanoid = data_parser.get_random()
+        action = llm_agent.get_model_suggestion(humanoid, scorekeeper.at_capacity(), identify=False)
+        tracker.log_decision(humanoid, action, scorekeeper, timing=llm_agent.last_timing)
+
+        if action == ActionCost.SKIP:
+            scorekeeper.skip(humanoid)
+        elif action == ActionCost.SQUISH:
+            scorekeeper.squish(humanoid)
+        elif action == ActionCost.SAVE:
+            scorekeeper.save(humanoid)
+        elif action == ActionCost.SCRAM:
+            scorekeeper.scram(humanoid)
+        else:
+            raise ValueError("Invalid action suggested")
+    return tracker.end_run(scorekeeper, save=False)
+
+def run_games_pooled(mode='llm', role='default', num_runs=5, images=True, concurrency=4, seed=None,
+                     data_fp=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'),
+                     llm_cache=False, temperature0=False, stream=False):
+    """
+    Run games on `concurrency` long-lived worker processes that keep their LLM client loaded.
+    Run summaries are collected in memory and performance_history.json is written once at the end
+    """
+    from gameplay.performance_tracker import PerformanceTracker
+
+    print(f"🎮 Running {num_runs} games in {mode} mode on {concurrency} workers")
+    print("="*50)
+    start_time = datetime.now()
+
+    tracker = PerformanceTracker()
+    completed = 0
+    failed = 0
+    rewards = []
+    try:
+        with ProcessPoolExecutor(max_workers=concurrency, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(mode, role, images, data_fp, llm_cache, temperature0, stream)) as pool:
+            futures = {pool.submit(_play_game, None if seed is None else seed + i): i for i in range(num_runs)}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    run_summary = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ Run {i+1} failed with error: {e}")
+                    continue
+                if run_summary is None:
+                    failed += 1
+                    print(f"❌ Run {i+1} made no decisions")
+                    continue
+                tracker.add_run(run_summary)
+                completed += 1
+                rewards.append(run_summary["final_reward"])
+                print(f"✅ Run {i+1} done ({completed + failed}/{num_runs}): Reward={run_summary['final_reward']}, "
+                      f"Saved={run_summary['final_saved']}, Killed={run_summary['final_killed']}")
+    finally:
+        # one write for the whole sweep (also when it is interrupted)
+        if completed:
+            tracker.save_data()
+
+    total_time = datetime.now() - start_time
+    print(f"\n🎯 {completed}/{num_runs} runs completed ({failed} failed) in {total_time.total_seconds():.1f}s")
+    if rewards:
+        print(f"📊 Mean reward {sum(rewards) / len(rewards):.2f} over {len(rewards)} runs")
+    print("📊 Run 'python3 generate_graphs.py' to see performance graphs")
+
+async def _play_games_async(games, record, mode, images, data_fp, async_client, image_cache, response_cache,
+                            temperature0, stream):
+    """
+    One of the concurrent players: takes (index, role, seed) games off the queue and plays them on its own
+    DataParser and ScoreKeeper, with one LLMInterface per role. Passes each run summary (or exception) to record
+    """
+    from endpoints.data_parser import DataParser
+    from endpoints.llm_interface import LLMInterface
+    from gameplay.enums import ActionCost
+    from gameplay.performance_tracker import PerformanceTracker
+    from gameplay.scorekeeper import FastScoreKeeper
+
+    data_parser = DataParser(data_fp, cache_metadata=True)
+    # the scorekeeper plays every game of this player, so it must not keep each game's action log
+    scorekeeper = FastScoreKeeper(SHIFT_LENGTH, CAPACITY, log=False)
+    llm_agents = {}
+    while not games.empty():
+        i, role, seed = games.get_nowait()
+        try:
+            if role not in llm_agents:
+                llm_agents[role] = LLMInterface(data_parser, scorekeeper, data_fp, use_images=images, role=role,
+                                                client=async_client.client, image_cache=image_cache,
+                                                response_cache=response_cache, temperature0=temperature0,
+                                                stream=stream)
+            llm_agent = llm_agents[role]
+            # restore use_images, the client switches it off when an image is missing
+            llm_agent.use_images = images
+            if seed is not None:
+                data_parser.seed(seed)
+            data_parser.reset()
+            scorekeeper.reset()
+
+            tracker = PerformanceTracker(load_history=False)
+            tracker.start_new_run(mode, images=images, role=role)
+            while len(data_parser.unvisited) > 0:
+                if scorekeeper.remaining_time <= 0:
+                    scorekeeper.scram()
+                    break
+                humanoid = data_parser.get_random()
+                action = await llm_agent.get_model_suggestion_async(humanoid, async_client, scorekeeper.at_capacity(),
+                                                                    identify=False)
+                tracker.log_decision(humanoid, action, scorekeeper, timing=llm_agent.last_timing)
+
+                if action == ActionCost.SKIP:
+                    scorekeeper.skip(humanoid)
+                elif action == ActionCost.SQUISH:
+                    scorekeeper.squish(humanoid)
+                elif action == ActionCost.SAVE:
+                    scorekeeper.save(humanoid)
+                elif action == ActionCost.SCRAM:
+                    scorekeeper.scram(humanoid)
+                else:
+                    raise ValueError("Invalid action suggested")
+            record(i, role, tracker.end_run(scorekeeper, save=False))
+        except Exception as e:
+            record(i, role, e)
+
+async def _run_games_async(games, record, mode, images, concurrency, data_fp, llm_cache, temperature0, stream):
+    from endpoints.llm_interface import ImageCache, LLMInterface
+    from endpoints.ollama_client import AsyncOllamaClient
+    from endpoints.response_cache import ResponseCache, default_cache_path
+
+    async_client = AsyncOllamaClient(concurrency=concurrency)
+    # encoded images are shared by every game
+    image_cache = ImageCache(LLMInterface._encode_image_to_base64)
+    response_cache = ResponseCache(default_cache_path(data_fp)) if llm_cache else None
+    players = [_play_games_async(games, record, mode, images, data_fp, async_client, image_cache, response_cache,
+                                 temperature0, stream)
+               for _ in range(min(concurrency, games.qsize()))]
+    try:
+        await asyncio.gather(*players)
+    finally:
+        async_client.close()
+        if response_cache is not None:
+            print(f"LLM response cache: {response_cache.hits} hits, {response_cache.misses} misses")
+            response_cache.close()
+
+def run_games_async(mode='llm', roles=('default',), num_runs=5, images=True, concurrency=4, seed=None,
+                    data_fp=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'),
+                    llm_cache=False, temperature0=False, stream=False):
+    """
+    Play num_runs games for every role in one process: `concurrency` games run at once on an asyncio event loop
+    and share one Ollama client that keeps at most `concurrency` requests in flight.
+    Run summaries are recorded with PerformanceTracker and performance_history.json is written once at the end
+    """
+    from gameplay.performance_tracker import PerformanceTracker
+
+    roles = list(roles)
+    print(f"🎮 Running {num_runs} games per role ({', '.join(roles)}) in {mode} mode, {concurrency} at a time")
+    print("="*50)
+    start_time = datetime.now()
+
+    # game i of every role draws the same humanoids (seed + i), so roles are compared on the same shifts
+    games = asyncio.Queue()
+    for i in range(num_runs):
+        for role in roles:
+            games.put_nowait((i, role, None if seed is None else seed + i))
+    total = games.qsize()
+
+    tracker = PerformanceTracker()
+    rewards = {role: [] for role in roles}
+    counts = {"completed": 0, "failed": 0}
+
+    def record(i, role, run_summary):
+        if run_summary is None or isinstance(run_summary, Exception):
+            counts["failed"] += 1
+            print(f"❌ Run {i+1} ({role}) failed: {run_summary if run_summary is not None else 'no decisions'}")
+            return
+        tracker.add_run(run_summary)
+        counts["completed"] += 1
+        rewards[role].append(run_summary["final_reward"])
+        print(f"✅ Run {i+1} ({role}) done ({counts['completed'] + counts['failed']}/{total}): "
+              f"Reward={run_summary['final_reward']}, Saved={run_summary['final_saved']}, "
+              f"Killed={run_summary['final_killed']}")
+
+    try:
+        asyncio.run(_run_games_async(games, record, mode, images, concurrency, data_fp, llm_cache, temperature0,
+                                     stream))
+    finally:
+        # one write for the whole sweep (also when it is interrupted)
+        if counts["completed"]:
+            tracker.save_data()
+
+    total_time = datetime.now() - start_time
+    print(f"\n🎯 {counts['completed']}/{total} runs completed ({counts['failed']} failed) in {total_time.total_seconds():.1f}s")
+    for role, role_rewards in rewards.items():
+        if role_rewards:
+            print(f"📊 {role}: mean reward {sum(role_rewards) / len(role_rewards):.2f} over {len(role_rewards)} runs")
+    print("📊 Run 'python3 generate_graphs.py' to see performance graphs")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
-        prog='python3 main.py',
-        description='What the program does',
-        epilog='Text at the bottom of help')
-    parser.add_argument('-m', '--mode', type=str, default = 'user', choices = ['user','heuristic','train','infer','llm'], help='llm=multimodal LLM agent (default)')
+        prog='python3 run_multiple_games.py',
+        description='Run many games and record them in performance_logs',
+        epilog='Pooled and asyncio runs send up to K requests to Ollama at once; set OLLAMA_NUM_PARALLEL on the server to match')
+    parser.add_argument('-m', '--mode', type=str, default = 'llm', choices = ['llm'], help='llm=multimodal LLM agent (default)')
     # realtime output, not making confusion matrix
-    parser.add_argument('-r', '--role', type=str, default='default', help='Optional role/label for this run (for graphing, e.g., "doctor")')
+    parser.add_argument('-r', '--role', type=str, nargs='+', default=['default'], help='Optional role(s)/label(s) for these runs (for graphing, e.g., "doctor"); N runs are played per role')
     parser.add_argument('-n', '--num_runs', type=int, default=5, help='Optional number of runs')
+    parser.add_argument('-k', '--concurrency', type=int, default=4, help='Long-lived worker processes playing games concurrently (0 = one main.py subprocess per run)')
+    parser.add_argument('--asyncio', action='store_true', default=False, help='Play the K concurrent games on one asyncio event loop in this process instead of worker processes')
+    parser.add_argument('-s', '--seed', type=int, default=None, help='Optional seed; run i draws humanoids with seed + i (pooled and asyncio runs only)')
     parser.add_argument('--images', action='store_true', default=True, help='Use images (multimodal) for LLM agent (default: True)')
     parser.add_argument('--no_images', action='store_false', dest='images', help='Disable images (multimodal) for LLM agent')
+    parser.add_argument('--llm_cache', action='store_true', default=False, help='Reuse LLM replies to identical requests from an on-disk cache (data/llm_responses.cache.sqlite)')
+    parser.add_argument('--temperature0', action='store_true', default=False, help='Ask the LLM for deterministic (temperature 0, fixed seed) replies')
+    parser.add_argument('--stream', action='store_true', default=False, help='Stream LLM replies and stop as soon as the action word is complete')
     args = parser.parse_args()
-    run_multiple_games(args.mode, args.role, args.num_runs)
- 
\ No newline at end of file
+    if args.num_runs < 1:
+        parser.error("number of runs must be at least 1")
+    if args.asyncio:
+        if args.concurrency < 1:
+            parser.error("--asyncio needs a concurrency of at least 1")
+        run_games_async(args.mode, args.role, args.num_runs, args.images, args.concurrency, args.seed,
+                        llm_cache=args.llm_cache, temperature0=args.temperature0, stream=args.stream)
+    else:
+        for role in args.role:
+            if args.concurrency > 0:
+                run_games_pooled(args.mode, role, args.num_runs, args.images, args.concurrency, args.seed,
+                                 llm_cache=args.llm_cache, temperature0=args.temperature0, stream=args.stream)
+            else:
+                run_multiple_games(args.mode, role, args.num_runs, args.images, args.llm_cache, args.temperature0,
+                                   args.stream)
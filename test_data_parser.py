@@ -0,0 +1,58 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from endpoints import data_parser as data_parser_module
+from endpoints.data_parser import DataParser
+
+DATA_FP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+@pytest.fixture
+def data_fp(tmp_path):
+    shutil.copy(os.path.join(DATA_FP, "consolidated_metadata.csv"), str(tmp_path))
+    return str(tmp_path)
+
+
+def cache_fp(data_fp):
+    return os.path.join(data_fp, "consolidated_metadata.parsed.npz")
+
+
+def test_cached_columns_match_parsed_ones(data_fp):
+    parsed = DataParser(data_fp)
+    DataParser(data_fp, cache_metadata=True)
+    cached = DataParser(data_fp, cache_metadata=True)
+    assert cached._df is None   # served from the cache, the csv was not read
+    np.testing.assert_array_equal(cached.states, parsed.states)
+    np.testing.assert_array_equal(cached.filenames, parsed.filenames)
+    assert sorted(os.listdir(data_fp)) == ["consolidated_metadata.csv", "consolidated_metadata.parsed.npz"]
+
+
+@pytest.mark.parametrize("contents", [b"", b"PK\x03\x04 partial zip"])
+def test_corrupt_cache_is_rebuilt(data_fp, contents):
+    expected = DataParser(data_fp).states
+    with open(cache_fp(data_fp), "wb") as f:
+        f.write(contents)
+    np.testing.assert_array_equal(DataParser(data_fp, cache_metadata=True).states, expected)
+    cached = DataParser(data_fp, cache_metadata=True)
+    assert cached._df is None
+    np.testing.assert_array_equal(cached.states, expected)
+
+
+def test_cache_missing_a_column_is_rebuilt(data_fp):
+    expected = DataParser(data_fp).states
+    np.savez(cache_fp(data_fp), states=expected)
+    np.testing.assert_array_equal(DataParser(data_fp, cache_metadata=True).states, expected)
+
+
+def test_failed_write_leaves_no_cache(data_fp, monkeypatch):
+    def failing_savez(f, **arrays):
+        f.write(b"PK")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(data_parser_module.np, "savez", failing_savez)
+    with pytest.raises(OSError):
+        DataParser(data_fp, cache_metadata=True)
+    assert os.listdir(data_fp) == ["consolidated_metadata.csv"]
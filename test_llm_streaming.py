@@ -0,0 +1,123 @@
+import json
+import os
+
+import pytest
+
+from endpoints.data_parser import DataParser
+from endpoints.llm_interface import LLMInterface
+from endpoints.response_cache import ResponseCache
+from gameplay.enums import ActionCost
+from gameplay.scorekeeper import ScoreKeeper
+
+DATA_FP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+REPLIES = ["SAVE because they are healthy", "ACTION:\nSAVE them", "  squish. It is a zombie", "I think SAVE",
+           "S", "RESCUE them", "\nKILL it now", "**SKIP** corpse", "SCRAM", "maybe later"]
+
+
+class StubResponse(object):
+    """a /api/chat response that streams a reply one character per NDJSON chunk"""
+
+    def __init__(self, reply, stream):
+        self.reply = reply
+        self.stream = stream
+        self.status_code = 200
+        self.chunks_read = 0
+        self.closed = False
+
+    def json(self):
+        return {"message": {"content": self.reply}, "done": True}
+
+    def iter_lines(self):
+        for c in self.reply:
+            self.chunks_read += 1
+            yield json.dumps({"message": {"content": c}, "done": False}).encode()
+        yield json.dumps({"message": {"content": ""}, "done": True}).encode()
+
+    def close(self):
+        self.closed = True
+
+
+class StubClient(object):
+    """stands in for OllamaClient, always answering with the same reply"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.responses = []
+
+    def tags(self, **kwargs):
+        return StubResponse("", False)
+
+    def chat(self, payload, stream=False, **kwargs):
+        assert payload["stream"] == stream
+        self.responses.append(StubResponse(self.reply, stream))
+        return self.responses[-1]
+
+
+def make_interface(reply, stream, response_cache=None):
+    return LLMInterface(DataParser(DATA_FP), ScoreKeeper(720, 10), DATA_FP, use_images=False,
+                        client=StubClient(reply), stream=stream, response_cache=response_cache)
+
+
+@pytest.mark.parametrize("reply", REPLIES)
+def test_streamed_decision_matches_full_reply(reply):
+    batch = make_interface(reply, stream=False)
+    streamed = make_interface(reply, stream=True)
+    humanoid = batch.data_parser.get_random()
+    assert streamed.get_model_suggestion(humanoid) == batch.get_model_suggestion(humanoid)
+
+
+def test_stream_stops_at_action_keyword():
+    llm = make_interface("SAVE because they are healthy", stream=True)
+    llm.get_model_suggestion(llm.data_parser.get_random())
+    response = llm.client.responses[-1]
+    assert llm.last_timing["stopped_early"]
+    assert response.closed
+    assert response.chunks_read == len("SAVE ")
+
+
+def test_stream_reads_until_first_word_has_keyword():
+    # the first word is complete after "ACTION:\nSAVE ", not at the newline
+    llm = make_interface("ACTION:\nSAVE them", stream=True)
+    llm.get_model_suggestion(llm.data_parser.get_random())
+    assert llm.client.responses[-1].chunks_read == len("ACTION:\nSAVE ")
+
+
+def test_reasoning_is_read_in_full():
+    reply = "SAVE because the person is healthy and there is room"
+    llm = make_interface(reply, stream=True)
+    humanoid = llm.data_parser.get_random()
+    prompt_data = {"context": "game", "prompt": "decide"}
+    assert llm.ask_for_reasoning(humanoid, ActionCost.SAVE, prompt_data) == reply
+
+
+def test_truncated_replies_only_serve_decisions(tmp_path):
+    cache = ResponseCache(str(tmp_path / "replies.cache.sqlite"))
+    reply = "SAVE because they are healthy"
+    streamed = make_interface(reply, stream=True, response_cache=cache)
+    humanoid = streamed.data_parser.get_random()
+    assert streamed.get_model_suggestion(humanoid) == ActionCost.SAVE
+    assert len(cache) == 1
+
+    # the cut short reply is not served to the reasoning request of the same prompt, which needs the full text
+    prompt_data = {"context": "game", "prompt": "decide"}
+    assert streamed.ask_for_reasoning(humanoid, ActionCost.SAVE, prompt_data) == reply
+    assert len(cache) == 2
+    assert streamed.ask_for_reasoning(humanoid, ActionCost.SAVE, prompt_data) == reply
+    assert streamed.last_timing["cached"]
+
+
+@pytest.mark.parametrize("first_stream", [True, False])
+def test_second_streamed_game_is_served_from_cache(tmp_path, first_stream):
+    cache = ResponseCache(str(tmp_path / "replies.cache.sqlite"))
+    first = make_interface("SQUISH it, it is a zombie", stream=first_stream, response_cache=cache)
+    second = make_interface("SQUISH it, it is a zombie", stream=True, response_cache=cache)
+    humanoids = [first.data_parser.get_random() for _ in range(5)]
+    decisions = [first.get_model_suggestion(humanoid) for humanoid in humanoids]
+    cache.hits = cache.misses = 0
+
+    for humanoid, decision in zip(humanoids, decisions):
+        assert second.get_model_suggestion(humanoid) == decision
+        assert second.last_timing["cached"]
+    assert second.client.responses == []
+    assert (cache.hits, cache.misses) == (5, 0)
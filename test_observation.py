@@ -0,0 +1,44 @@
+import numpy as np
+import torch
+
+from gameplay.observation import OBS_LAYOUT
+from models.PPO import BaseModel, FLAT_KEY, PACKED_DIM, PACKED_KEY, pack_observation
+
+
+def random_dict(rng, batch):
+    return {key: rng.random((batch,) + shape, dtype=np.float32) for key, shape in OBS_LAYOUT.shapes.items()}
+
+
+def test_views_round_trip_through_pack():
+    observation_dict = random_dict(np.random.default_rng(0), 3)
+    flat = OBS_LAYOUT.pack(observation_dict)
+    assert flat.shape == (3, OBS_LAYOUT.size)
+    views = OBS_LAYOUT.views(flat)
+    for key, value in observation_dict.items():
+        np.testing.assert_array_equal(views[key], value)
+
+    # views write through to the vector
+    views["doable_actions"][:] = 0
+    OBS_LAYOUT.reset(flat)
+    np.testing.assert_array_equal(views["doable_actions"], 1)
+    assert not flat[:, :OBS_LAYOUT.slices["doable_actions"].start].any()
+
+
+def test_pack_observation_flat_matches_dict():
+    observation_dict = random_dict(np.random.default_rng(1), 5)
+    packed = pack_observation(observation_dict)
+    assert packed.shape == (5, PACKED_DIM)
+    np.testing.assert_allclose(pack_observation(OBS_LAYOUT.pack(observation_dict)), packed, rtol=1e-6)
+    # a single observation packs like one row of a batch
+    np.testing.assert_allclose(pack_observation(OBS_LAYOUT.pack(observation_dict)[0]), packed[0], rtol=1e-6)
+
+
+def test_base_model_features_agree_across_layouts():
+    observation_dict = random_dict(np.random.default_rng(2), 4)
+    model = BaseModel()
+    as_dict = model({key: torch.from_numpy(value) for key, value in observation_dict.items()})
+    flat = torch.from_numpy(OBS_LAYOUT.pack(observation_dict))
+    packed = torch.from_numpy(pack_observation(observation_dict))
+    assert as_dict.shape == (4, model.output_shape)
+    for features in (model(flat), model({FLAT_KEY: flat}), model(packed), model({PACKED_KEY: packed})):
+        torch.testing.assert_close(features, as_dict)
@@ -0,0 +1,89 @@
+import pytest
+import requests
+
+from endpoints import ollama_client
+from endpoints.ollama_client import OllamaClient
+
+
+def test_liveness_check_does_not_retry(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(ollama_client.time, "sleep", sleeps.append)
+    client = OllamaClient("http://127.0.0.1:9", retries=3)   # nothing listens on the discard port
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.tags(timeout=5, retries=0)
+    assert sleeps == []
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.tags(timeout=5)
+    assert len(sleeps) == 3
+
+
+class StubSession(object):
+    """stands in for requests.Session, answering with (or raising) the scripted outcomes in order"""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return StubResponse(outcome)
+
+    def close(self):
+        pass
+
+
+class StubResponse(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_client(monkeypatch, outcomes, retries=3):
+    sleeps = []
+    monkeypatch.setattr(ollama_client.time, "sleep", sleeps.append)
+    client = OllamaClient(retries=retries)
+    client.session = StubSession(outcomes)
+    return client, sleeps
+
+
+def test_ok_response_is_not_retried(monkeypatch):
+    client, sleeps = make_client(monkeypatch, [200])
+    assert client.chat({"model": "llava"}).status_code == 200
+    assert client.session.calls == 1
+    assert sleeps == []
+
+
+def test_retryable_status_is_retried_with_backoff(monkeypatch):
+    client, sleeps = make_client(monkeypatch, [503, 503, 200])
+    assert client.chat({"model": "llava"}).status_code == 200
+    assert client.session.calls == 3
+    assert len(sleeps) == 2
+    assert all(0 <= delay <= client.backoff * 2 ** attempt for attempt, delay in enumerate(sleeps))
+
+
+def test_last_retryable_status_is_returned(monkeypatch):
+    client, _ = make_client(monkeypatch, [503, 503], retries=1)
+    assert client.chat({"model": "llava"}).status_code == 503
+    assert client.session.calls == 2
+
+
+def test_connect_failures_are_retried(monkeypatch):
+    client, sleeps = make_client(monkeypatch, [requests.exceptions.ConnectTimeout(),
+                                               requests.exceptions.ConnectionError(), 200])
+    assert client.chat({"model": "llava"}).status_code == 200
+    assert len(sleeps) == 2
+
+
+def test_read_timeout_is_not_retried(monkeypatch):
+    client, sleeps = make_client(monkeypatch, [requests.exceptions.ReadTimeout(), 200])
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.chat({"model": "llava"})
+    assert client.session.calls == 1
+    assert sleeps == []
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+import torch
+
+from gameplay.observation import OBS_LAYOUT
+from models.PPO import PPO, PACKED_DIM, pack_observation
+
+
+def make_ppo(num_envs, packed_obs=False):
+    return PPO(0.0003, 0.001, 0.99, 1, 0.2, False, buffer_size=4, num_envs=num_envs, packed_obs=packed_obs)
+
+
+def random_observations(rng, batch):
+    obs = rng.random((batch, OBS_LAYOUT.size), dtype=np.float32)
+    obs[:, OBS_LAYOUT.slices['doable_actions']] = 1.0
+    return obs
+
+
+def test_select_action_packed_flat_input_default_ppo():
+    agent = make_ppo(num_envs=2)
+    obs = random_observations(np.random.default_rng(0), 2)
+    actions = agent.select_action_packed(obs)
+    assert actions.shape == (2,)
+    assert agent.buffer.ptr == 0
+    np.testing.assert_array_equal(agent.buffer.states['observation'][0].numpy(), obs)
+
+
+def test_select_action_packed_packs_flat_input_for_packed_buffer():
+    agent = make_ppo(num_envs=2, packed_obs=True)
+    obs = random_observations(np.random.default_rng(1), 2)
+    agent.select_action_packed(obs)
+    np.testing.assert_allclose(agent.buffer.states['packed'][0].numpy(), pack_observation(obs), rtol=1e-6)
+
+    agent.buffer.add_outcome([0, 0], [False, False])
+    agent.select_action_packed(pack_observation(obs))
+    np.testing.assert_allclose(agent.buffer.states['packed'][1].numpy(), pack_observation(obs), rtol=1e-6)
+
+
+def test_select_action_packed_rejects_packed_input_for_flat_buffer():
+    agent = make_ppo(num_envs=2)
+    with pytest.raises(ValueError, match="packed_obs=True"):
+        agent.select_action_packed(np.zeros((2, PACKED_DIM), dtype=np.float32))
+
+
+def test_select_action_packed_rejects_wrong_batch_or_size():
+    agent = make_ppo(num_envs=2)
+    with pytest.raises(ValueError, match="batch of 2"):
+        agent.select_action_packed(random_observations(np.random.default_rng(2), 3))
+    with pytest.raises(ValueError, match="size"):
+        agent.select_action_packed(np.zeros((2, 7), dtype=np.float32))
+
+
+def test_select_action_packed_inference_accepts_both_layouts():
+    agent = make_ppo(num_envs=1)
+    obs = random_observations(np.random.default_rng(3), 5)
+    torch.manual_seed(0)
+    flat_actions = agent.select_action_packed(obs, inference=True)
+    torch.manual_seed(0)
+    packed_actions = agent.select_action_packed(pack_observation(obs), inference=True)
+    np.testing.assert_array_equal(flat_actions, packed_actions)
+    assert agent.buffer.ptr == 0
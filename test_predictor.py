@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from endpoints.data_parser import DataParser
+from endpoints.heuristic_interface import Predictor
+from models import CLASSIFIERS
+
+DATA_FP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+@pytest.fixture(scope="module", params=sorted(CLASSIFIERS))
+def predictor(request, tmp_path_factory):
+    # randomly initialized weights: the two paths only have to agree, not be right
+    torch.manual_seed(0)
+    weights = str(tmp_path_factory.mktemp(request.param) / "weights.pth")
+    torch.save(CLASSIFIERS[request.param](4).state_dict(), weights)
+    predictor = Predictor(model_file=weights, arch=request.param)
+    assert predictor.is_model_loaded
+    return predictor
+
+
+@pytest.fixture(scope="module")
+def image_paths():
+    return [os.path.join(DATA_FP, fn) for fn in DataParser(DATA_FP).filenames[:4]]
+
+
+def test_batch_matches_single_images(predictor, image_paths):
+    batch = predictor.get_probs_batch(image_paths, batch_size=3)
+    for path, probs in zip(image_paths, batch):
+        with Image.open(path) as img_:
+            np.testing.assert_allclose(predictor.get_probs(img_), probs, atol=1e-5)
+        np.testing.assert_allclose(predictor.get_probs(path), probs, atol=1e-5)
+
+
+@pytest.mark.parametrize("mode", ["RGBA", "P", "L"])
+def test_non_rgb_images_are_converted_like_the_batch(predictor, image_paths, tmp_path, mode):
+    path = str(tmp_path / "image.png")
+    with Image.open(image_paths[0]) as img_:
+        img_.convert(mode).save(path)
+    (batch,) = predictor.get_probs_batch([path])
+    with Image.open(path) as img_:
+        np.testing.assert_allclose(predictor.get_probs(img_), batch, atol=1e-5)
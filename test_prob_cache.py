@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pytest
+
+from endpoints import prob_cache
+from endpoints.prob_cache import ProbabilityCache
+
+DATA_FP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+class StubPredictor(object):
+    """stands in for Predictor, giving every image the same probabilities"""
+
+    def __init__(self, probs):
+        self.probs = np.asarray(probs, dtype=np.float32)
+        self.calls = 0
+
+    def get_probs_batch(self, imgs):
+        self.calls += 1
+        return np.tile(self.probs, (len(imgs), 1))
+
+
+def make_cache(tmp_path, probs, **kwargs):
+    return ProbabilityCache(DATA_FP, cache_fp=str(tmp_path / "probs.npz"), predictor=StubPredictor(probs), **kwargs)
+
+
+def test_cache_is_built_once_and_loaded(tmp_path):
+    make_cache(tmp_path, [0.25, 0.75])
+    cache = make_cache(tmp_path, [0.5, 0.5])
+    assert cache.predictor.calls == 0
+    np.testing.assert_array_equal(cache.get_probs_idx(0), [0.25, 0.75])
+    assert os.listdir(str(tmp_path)) == ["probs.npz"]
+
+
+def test_failed_save_keeps_the_previous_cache(tmp_path, monkeypatch):
+    make_cache(tmp_path, [0.25, 0.75])
+
+    def failing_savez(f, **arrays):
+        f.write(b"partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(prob_cache.np, "savez", failing_savez)
+    with pytest.raises(OSError):
+        make_cache(tmp_path, [0.5, 0.5], rebuild=True)
+    monkeypatch.undo()
+
+    assert os.listdir(str(tmp_path)) == ["probs.npz"]
+    cache = make_cache(tmp_path, [0.5, 0.5])
+    np.testing.assert_array_equal(cache.get_probs_idx(0), [0.25, 0.75])
@@ -0,0 +1,60 @@
+import time
+
+from endpoints.response_cache import ResponseCache
+
+
+def payload(text, images=None, model="llava", options=None):
+    message = {"role": "user", "content": text}
+    if images is not None:
+        message["images"] = images
+    return {"model": model, "options": options or {"temperature": 0}, "stream": False, "messages": [message]}
+
+
+def test_key_depends_on_request_content_only():
+    key = ResponseCache.key(payload("decide", ["aGVsbG8="]))
+    assert ResponseCache.key(payload("decide", ["aGVsbG8="])) == key
+    assert ResponseCache.key(dict(payload("decide", ["aGVsbG8="]), stream=True)) == key
+    assert len({key,
+                ResponseCache.key(payload("decide", ["d29ybGQ="])),
+                ResponseCache.key(payload("decide now", ["aGVsbG8="])),
+                ResponseCache.key(payload("decide", ["aGVsbG8="], model="llama3")),
+                ResponseCache.key(payload("decide", ["aGVsbG8="], options={"temperature": 1})),
+                ResponseCache.key(payload("decide", ["aGVsbG8="]), truncated=True)}) == 6
+
+
+def test_get_falls_back_to_later_keys(tmp_path):
+    cache = ResponseCache(str(tmp_path / "replies.sqlite"))
+    cache.put("decision", "llava", "SAVE")
+    assert cache.get("full", "decision") == "SAVE"
+    assert cache.get("full") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_least_recently_used_replies_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "replies.sqlite"), max_entries=2)
+    cache.put("a", "llava", "SAVE")
+    time.sleep(0.01)
+    cache.put("b", "llava", "SKIP")
+    time.sleep(0.01)
+    assert cache.get("a") == "SAVE"   # a is now more recently used than b
+    time.sleep(0.01)
+    cache.put("c", "llava", "SQUISH")
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "SAVE"
+    assert cache.get("c") == "SQUISH"
+    assert (cache.hits, cache.misses) == (3, 1)
+    cache.close()
+
+
+def test_replies_persist_across_instances(tmp_path):
+    path = str(tmp_path / "replies.sqlite")
+    cache = ResponseCache(path)
+    cache.put("a", "llava", "SAVE")
+    cache.close()
+    cache = ResponseCache(path)
+    assert cache.get("a") == "SAVE"
+    cache.clear()
+    assert len(cache) == 0
+    cache.close()
@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from endpoints.data_parser import DataParser
+from endpoints.prob_cache import ProbabilityCache
+from endpoints.training_interface import TrainInterface, VecTrainInterface
+from gameplay.scorekeeper import ScoreKeeper
+from model_training.parallel_rollouts import RolloutWorkers
+from model_training.rl_training import latest_checkpoint, load_checkpoint, train
+from test_prob_cache import StubPredictor
+
+DATA_FP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+CONFIG = {"max_ep_len": 20, "max_training_timesteps": 600, "print_freq": 200, "log_freq": 40,
+          "save_model_freq": 10 ** 6, "checkpoint_freq": 100, "update_timestep": 50, "K_epochs": 4,
+          "random_seed": 1}
+
+
+def make_env(directory, num_envs, workers=False):
+    if workers:
+        return RolloutWorkers(num_envs, DATA_FP, prob_cache=True)
+    prob_cache = ProbabilityCache(DATA_FP, cache_fp=str(directory / "probs.npz"),
+                                  predictor=StubPredictor([0.1, 0.2, 0.3, 0.4]))
+    if num_envs > 1:
+        return VecTrainInterface([DataParser(DATA_FP) for _ in range(num_envs)],
+                                 [ScoreKeeper(720, 10) for _ in range(num_envs)], prob_cache=prob_cache)
+    return TrainInterface(None, 0, 0, DataParser(DATA_FP), ScoreKeeper(720, 10), prob_cache=prob_cache)
+
+
+def run(directory, monkeypatch, config, resume=None, num_envs=1, workers=False):
+    monkeypatch.chdir(directory)
+    train(make_env(directory, num_envs, workers), config, resume)
+    checkpoint_dir = str(directory / "model_training" / "RL-logs" / "checkpoints" / "run_0")
+    with open(str(directory / "model_training" / "RL-logs" / "PPO_RL-logs_log_0.csv")) as f:
+        # episode, timestep, reward (elapsed differs between runs)
+        log = [line.split(',')[:3] for line in f]
+    return checkpoint_dir, load_checkpoint(checkpoint_dir), log
+
+
+@pytest.mark.parametrize("num_envs", [1, 2])
+def test_resumed_run_matches_uninterrupted_run(tmp_path, monkeypatch, num_envs):
+    (tmp_path / "full").mkdir()
+    (tmp_path / "interrupted").mkdir()
+    _, full, full_log = run(tmp_path / "full", monkeypatch, CONFIG, num_envs=num_envs)
+
+    checkpoint_dir, _, _ = run(tmp_path / "interrupted", monkeypatch, dict(CONFIG, max_training_timesteps=300),
+                               num_envs=num_envs)
+    _, resumed, resumed_log = run(tmp_path / "interrupted", monkeypatch, CONFIG, resume=checkpoint_dir,
+                                  num_envs=num_envs)
+
+    assert resumed["progress"]["time_step"] == full["progress"]["time_step"]
+    assert resumed["progress"]["i_episode"] == full["progress"]["i_episode"]
+    for key, weights in full["agent"]["policy"].items():
+        torch.testing.assert_close(resumed["agent"]["policy"][key], weights, rtol=0, atol=0)
+    assert resumed_log == full_log
+
+
+@pytest.mark.parametrize("partial_row", ["\n", "12,", "12", "12,400,0.5"])
+def test_resume_skips_a_log_row_cut_off_mid_write(tmp_path, monkeypatch, partial_row):
+    (tmp_path / "full").mkdir()
+    (tmp_path / "interrupted").mkdir()
+    _, _, full_log = run(tmp_path / "full", monkeypatch, CONFIG)
+
+    checkpoint_dir, _, _ = run(tmp_path / "interrupted", monkeypatch, dict(CONFIG, max_training_timesteps=300))
+    with open(str(tmp_path / "interrupted" / "model_training" / "RL-logs" / "PPO_RL-logs_log_0.csv"), "a") as f:
+        f.write(partial_row)
+    _, _, resumed_log = run(tmp_path / "interrupted", monkeypatch, CONFIG, resume=checkpoint_dir)
+    assert resumed_log == full_log
+
+
+@pytest.mark.parametrize("num_envs, workers", [(1, False), (2, False), (2, True)])
+def test_episodes_are_cut_off_at_max_ep_len(tmp_path, monkeypatch, num_envs, workers):
+    # a shift takes more than 5 steps (at most 120 minutes each), so every episode is cut off,
+    # whatever the number of environments
+    _, checkpoint, _ = run(tmp_path, monkeypatch, dict(CONFIG, max_ep_len=5), num_envs=num_envs, workers=workers)
+    progress = checkpoint["progress"]
+    if workers:
+        ep_lens = [worker["ep_len"] for worker in checkpoint["env"]["workers"]]
+    else:
+        ep_lens = progress["current_ep_len"]
+    finished_steps = progress["time_step"] - sum(ep_lens)
+    assert progress["i_episode"] * 5 == finished_steps
+
+
+def test_only_the_latest_checkpoints_are_kept(tmp_path, monkeypatch):
+    checkpoint_dir, checkpoint, _ = run(tmp_path, monkeypatch, dict(CONFIG, keep_checkpoints=2))
+    checkpoints = sorted(name for name in os.listdir(checkpoint_dir) if name.startswith("checkpoint_"))
+    assert len(checkpoints) == 2
+    assert latest_checkpoint(checkpoint_dir).endswith(checkpoints[-1])
+    assert checkpoint["config"]["max_ep_len"] == CONFIG["max_ep_len"]
+
+    with pytest.raises(FileNotFoundError):
+        load_checkpoint(str(tmp_path))
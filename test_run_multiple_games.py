@@ -0,0 +1,63 @@
+import asyncio
+import os
+
+import run_multiple_games
+from gameplay.scorekeeper import FastScoreKeeper
+from test_llm_streaming import StubClient
+
+DATA_FP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def test_pooled_worker_does_not_keep_game_logs():
+    run_multiple_games._init_worker('llm', 'default', False, DATA_FP)
+    worker = run_multiple_games._worker
+    worker["llm_agent"].client = StubClient("SAVE them")
+    scorekeeper = worker["scorekeeper"]
+    assert isinstance(scorekeeper, FastScoreKeeper)
+
+    for seed in range(3):
+        run_summary = run_multiple_games._play_game(seed)
+        assert run_summary["total_decisions"] > 0
+    assert len(scorekeeper.all_logs) == 0
+    assert len(scorekeeper.logger) == 0
+
+
+class StubAsyncClient(object):
+    """stands in for AsyncOllamaClient, running calls inline"""
+
+    def __init__(self, reply):
+        self.client = StubClient(reply)
+
+    async def call(self, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    async def chat(self, payload, **kwargs):
+        return self.client.chat(payload, **kwargs)
+
+
+def test_async_player_does_not_keep_game_logs(monkeypatch):
+    from endpoints.llm_interface import ImageCache, LLMInterface
+
+    scorekeepers = []
+    fast_init = FastScoreKeeper.__init__
+
+    def recording_init(self, *args, **kwargs):
+        fast_init(self, *args, **kwargs)
+        scorekeepers.append(self)
+
+    monkeypatch.setattr(FastScoreKeeper, '__init__', recording_init)
+
+    games = asyncio.Queue()
+    for i in range(3):
+        for role in ('default', 'doctor'):
+            games.put_nowait((i, role, i))
+    results = []
+    asyncio.run(run_multiple_games._play_games_async(
+        games, lambda i, role, run_summary: results.append(run_summary), 'llm', False, DATA_FP,
+        StubAsyncClient("SKIP it"), ImageCache(LLMInterface._encode_image_to_base64), None, False, False))
+
+    assert len(results) == 6
+    assert all(isinstance(run_summary, dict) for run_summary in results)
+    (scorekeeper,) = scorekeepers
+    assert len(scorekeeper.all_logs) == 0
+    assert len(scorekeeper.logger) == 0
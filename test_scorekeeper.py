@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+import pytest
+
+from endpoints.data_parser import DataParser
+from gameplay.scorekeeper import FastScoreKeeper, ScoreKeeper
+
+DATA_FP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def assert_same_state(fast, reference):
+    assert fast.remaining_time == reference.remaining_time
+    assert fast.ambulance == reference.ambulance
+    assert fast.scorekeeper == reference.scorekeeper
+    assert fast.get_cumulative_reward() == reference.get_cumulative_reward()
+    assert fast.get_current_capacity() == reference.get_current_capacity()
+    assert fast.at_capacity() == reference.at_capacity()
+    assert tuple(fast.available_action_space()) == tuple(reference.available_action_space())
+
+
+@pytest.mark.parametrize("log", [True, False])
+def test_fast_scorekeeper_matches_scorekeeper(log):
+    data_parser = DataParser(DATA_FP)
+    rng = np.random.default_rng(0)
+    fast = FastScoreKeeper(720, 10, log=log)
+    reference = ScoreKeeper(720, 10)
+    for episode in range(20):
+        data_parser.reset()
+        while reference.remaining_time > 0:
+            humanoid = data_parser.get_random()
+            action = int(rng.integers(0, 4))
+            assert fast.map_do_action(action, humanoid) == reference.map_do_action(action, humanoid)
+            assert_same_state(fast, reference)
+        # actions past the end of the shift are refused (scram still runs)
+        assert fast.map_do_action(1, humanoid) == reference.map_do_action(1, humanoid)
+        assert fast.get_final_score() == reference.get_final_score()
+        assert fast.logger == (reference.logger if log else [])
+        fast.reset()
+        reference.reset()
+        assert_same_state(fast, reference)
+    assert len(fast.all_logs) == (len(reference.all_logs) if log else 0)
+
+
+def test_fast_scorekeeper_rejects_unknown_actions():
+    fast = FastScoreKeeper(720, 10)
+    with pytest.raises(ValueError):
+        fast.map_do_action(4, None)
@@ -0,0 +1,64 @@
+import json
+
+from gameplay.phase_timer import PhaseTimer
+from model_training.training_metrics import MetricsWriter, read_records, summarize
+
+
+def write_run(path, time_steps):
+    writer = MetricsWriter(str(path), PhaseTimer())
+    for t in time_steps:
+        writer.write(t, t // 10, float(t))
+    writer.close()
+
+
+def test_resume_keeps_records_up_to_checkpoint(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    write_run(path, [100, 200, 300])
+    writer = MetricsWriter(str(path), PhaseTimer(), time_step=200, resume=True)
+    writer.write(250, 25, 250.0)
+    writer.close()
+    assert [r["time_step"] for r in read_records(str(path))] == [100, 200, 250]
+
+
+def test_resume_skips_empty_and_truncated_lines(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    write_run(path, [100, 200])
+    with open(path, "a") as f:
+        f.write("\n")
+        f.write(json.dumps({"time_step": 300})[:7])   # killed mid-write
+    writer = MetricsWriter(str(path), PhaseTimer(), time_step=300, resume=True)
+    writer.write(300, 30, 300.0)
+    writer.close()
+    assert [r["time_step"] for r in read_records(str(path))] == [100, 200, 300]
+
+
+def record(phases, interval_s=10.0, steps=100):
+    return {"interval_s": interval_s, "steps": steps, "update_ms": [],
+            "phases": {phase: {"seconds": seconds, "count": count} for phase, (seconds, count) in phases.items()}}
+
+
+def test_nested_phases_are_recorded_under_the_phase_they_ran_in():
+    timer = PhaseTimer()
+    with timer.time('env_reset'):
+        with timer.time('image_load'):
+            pass
+    with timer.time('env_step'):
+        with timer.time('image_load'):
+            pass
+        with timer.time('cnn_probs'):
+            pass
+    with timer.time('image_load'):
+        pass
+    assert sorted(timer.snapshot()) == ['env_reset', 'env_reset/image_load', 'env_step', 'env_step/cnn_probs',
+                                        'env_step/image_load', 'image_load']
+
+
+def test_summary_breaks_phases_down_by_parent():
+    table, _, _ = summarize([record({'env_reset': (2.0, 1), 'env_reset/image_load': (1.5, 1),
+                                     'env_step': (5.0, 100), 'env_step/image_load': (3.0, 100),
+                                     'ppo_update': (1.0, 1)})])
+    seconds = dict(zip(table["phase"], table["seconds"]))
+    assert list(table["phase"]) == ['env_step', '  image_load', 'env_reset', '  image_load', 'ppo_update', 'other']
+    assert table["seconds"].tolist()[:4] == [5.0, 3.0, 2.0, 1.5]
+    # nested time is part of its parent, not counted again
+    assert seconds['other'] == 10.0 - 2.0 - 5.0 - 1.0
@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+import pytest
+
+from endpoints.data_parser import DataParser
+from gameplay.humanoid import Humanoid
+from gameplay.scorekeeper import ScoreKeeper
+from gameplay.vec_simulator import VecGameSimulator
+
+DATA_FP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def check_parity(states, num_episodes=64, num_steps=150, seed=0, shift_len=720, auto_reset=False):
+    """
+    replays random action traces through VecGameSimulator and one ScoreKeeper per episode,
+    raising AssertionError on the first mismatch.
+    An episode is expected to end when its shift is over or every humanoid has been drawn (each one once);
+    with auto_reset the ScoreKeeper is reset too and the next episode is compared from its start.
+    returns how many episodes ended by running out of time and by running out of humanoids
+    """
+    sim = VecGameSimulator(states, num_episodes, shift_len=shift_len, seed=seed, auto_reset=auto_reset)
+    keepers = [ScoreKeeper(sim.shift_len, sim.capacity) for _ in range(num_episodes)]
+    visited = [set() for _ in range(num_episodes)]
+    finished = np.zeros(num_episodes, dtype=bool)
+    ended = {"time": 0, "humanoids": 0}
+    rng = np.random.default_rng(seed + 1)
+    for step in range(num_steps):
+        actions = rng.integers(0, 4, num_episodes)
+        current_index = sim.current_index
+        current_state = sim.current_state
+        previous_reward = [keeper.get_cumulative_reward() for keeper in keepers]
+        expected = [keeper.map_do_action(int(a), Humanoid(fp='', state=int(s)))
+                    for keeper, a, s in zip(keepers, actions, current_state)]
+        obs, rewards, dones, executed = sim.step(actions)
+        for b, keeper in enumerate(keepers):
+            if finished[b]:
+                continue
+            assert current_index[b] not in visited[b], "step {} episode {}: humanoid drawn twice".format(step, b)
+            assert executed[b] == expected[b], "step {} episode {}: executed".format(step, b)
+            expected_reward = keeper.get_cumulative_reward() - previous_reward[b] if expected[b] \
+                else -sim.invalid_action_penalty
+            assert rewards[b] == expected_reward, "step {} episode {}: reward".format(step, b)
+            if expected[b]:
+                visited[b].add(current_index[b])
+
+            out_of_time = keeper.remaining_time <= 0
+            out_of_humanoids = len(visited[b]) == len(sim.states)
+            assert dones[b] == (out_of_time or out_of_humanoids), "step {} episode {}: done".format(step, b)
+            if dones[b]:
+                ended["time" if out_of_time else "humanoids"] += 1
+                if auto_reset:
+                    keeper.reset()
+                    visited[b].clear()
+
+            ambulance = keeper.ambulance
+            assert sim.remaining_time[b] == keeper.remaining_time, "step {} episode {}: remaining_time".format(step, b)
+            assert list(sim.ambulance[b]) == [ambulance["zombie"], ambulance["injured"], ambulance["healthy"]], \
+                "step {} episode {}: ambulance".format(step, b)
+            assert sim.killed[b] == keeper.scorekeeper["killed"], "step {} episode {}: killed".format(step, b)
+            assert sim.saved[b] == keeper.scorekeeper["saved"], "step {} episode {}: saved".format(step, b)
+            assert list(obs["doable_actions"][b]) == list(keeper.available_action_space()), \
+                "step {} episode {}: action mask".format(step, b)
+            # without auto_reset a finished episode stays finished
+            finished[b] = dones[b] and not auto_reset
+    return ended
+
+
+@pytest.fixture(scope="module")
+def states():
+    return DataParser(DATA_FP).states
+
+
+def test_parity_until_time_runs_out(states):
+    ended = check_parity(states, num_episodes=32, num_steps=150)
+    assert ended["time"] == 32
+
+
+@pytest.mark.parametrize("auto_reset", [False, True])
+def test_parity_through_exhaustion_and_reset(states, auto_reset):
+    # a 12-humanoid dataset runs out within a shift in most episodes, so both done paths are reached
+    ended = check_parity(states[:12], num_episodes=32, num_steps=300, auto_reset=auto_reset)
+    assert ended["humanoids"] > 0
+    assert ended["time"] > 0
+    if auto_reset:
+        # every episode finished several times and was compared again from the start
+        assert ended["humanoids"] + ended["time"] > 3 * 32
+
+
+def test_reset_draws_a_fresh_permutation(states):
+    sim = VecGameSimulator(states[:12], 4, seed=0, auto_reset=True)
+    for _ in range(200):
+        sim.step(np.full(4, 1))   # squish is always executable while there is time
+        for order in sim.order:
+            assert sorted(order) == list(range(12))